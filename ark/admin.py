@@ -1,8 +1,21 @@
 """Django Admin models for Arklet."""
 
-from django.contrib import admin
+import json
+from typing import Optional
 
+from django.contrib import admin, messages
+from django.contrib.admin.views.main import ChangeList
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+from ark.cache import key_cache
 from ark.models import Ark, Key, Naan, Shoulder, User
+from ark.search import search_arks
+
+# Query parameters of the Ark changelist's keyset pagination
+AFTER_VAR = "after"
+BEFORE_VAR = "before"
 
 
 @admin.register(User)
@@ -21,26 +34,162 @@ class NaanAdmin(admin.ModelAdmin):
 class ShoulderAdmin(admin.ModelAdmin):
     """Django Admin model for ARK shoulders."""
 
-    list_display = ["shoulder", "name", "naan"]
+    list_display = ["shoulder", "name", "naan", "minting_mode"]
+    readonly_fields = ["counter"]
+
+
+def estimated_count(queryset) -> Optional[int]:
+    """Ask the Postgres planner roughly how many rows a queryset would return.
+
+    Returns None on other databases, or if the table was never analyzed.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != "postgresql":
+        return None
+    with connection.cursor() as cursor:
+        if not queryset.query.where:
+            cursor.execute(
+                "SELECT reltuples FROM pg_class WHERE oid = %s::regclass",
+                [queryset.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+            estimate = row[0] if row else -1
+        else:
+            sql, params = queryset.query.sql_with_params()
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+            plan = cursor.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            estimate = plan[0]["Plan"]["Plan Rows"]
+    return int(estimate) if estimate >= 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """A paginator that counts large results with planner estimates, not COUNT(*)."""
+
+    # Smaller results are counted exactly
+    exact_count_below = 10_000
+
+    estimated = False
+
+    @cached_property
+    def count(self):
+        estimate = estimated_count(self.object_list)
+        if estimate is None or estimate < self.exact_count_below:
+            return super().count
+        self.estimated = True
+        return estimate
+
+
+class KeysetChangeList(ChangeList):
+    """A changelist that pages through ARKs by ARK instead of with OFFSET.
+
+    ?after=<ark> shows the page following that ARK and ?before=<ark> the page
+    preceding it, so every page costs one index range scan however deep it is.
+    """
+
+    def __init__(self, request, *args, **kwargs):
+        # Keyset positions aren't field lookups, keep them away from the filters.
+        request.GET = request.GET.copy()
+        self.after = request.GET.pop(AFTER_VAR, [""])[-1]
+        self.before = request.GET.pop(BEFORE_VAR, [""])[-1]
+        self.next_url = self.previous_url = None
+        super().__init__(request, *args, **kwargs)
+
+    def get_results(self, request):
+        super().get_results(request)
+        if not self.multi_page or (self.show_all and self.can_show_all):
+            return
+        per_page = self.list_per_page
+        if self.before:
+            arks = self.queryset.filter(ark__lt=self.before).order_by("-ark")
+            page = list(arks[: per_page + 1])
+            has_previous, has_next = len(page) > per_page, True
+            page = page[:per_page][::-1]
+        else:
+            arks = self.queryset.filter(ark__gt=self.after).order_by("ark")
+            page = list(arks[: per_page + 1])
+            has_previous, has_next = bool(self.after), len(page) > per_page
+            page = page[:per_page]
+        self.result_list = page
+        if page and has_next:
+            self.next_url = self.get_query_string({AFTER_VAR: page[-1].ark})
+        if page and has_previous:
+            self.previous_url = self.get_query_string({BEFORE_VAR: page[0].ark})
+
+
+class ShoulderListFilter(admin.SimpleListFilter):
+    """Filter ARKs by the shoulders in the Shoulder table.
+
+    The stock filter for the shoulder field would find them with SELECT DISTINCT over
+    every ARK.
+    """
+
+    title = "shoulder"
+    parameter_name = "shoulder"
+
+    def lookups(self, request, model_admin):
+        shoulders = Shoulder.objects.order_by("shoulder").values_list(
+            "shoulder", flat=True
+        )
+        return [(shoulder, shoulder) for shoulder in dict.fromkeys(shoulders)]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(shoulder=self.value())
+        return queryset
 
 
 @admin.register(Ark)
 class ArkAdmin(admin.ModelAdmin):
     """Django Admin model for ARKs.
 
-    In practice, stock Django Admin doesn't work well for large randomly sorted tables.
-    This view will tend to take a long time to load as a full table count query is run.
+    Stock Django Admin doesn't work well for large randomly sorted tables, as it counts
+    every row and pages with OFFSET. This changelist estimates counts with the Postgres
+    planner and pages through ARKs in ARK order with keyset pagination instead, so only
+    next and previous links are shown. Filters use the (naan, shoulder, ark) index,
+    searches the indexes described in ark.search.
     """
 
     list_display = ["ark", "url"]
+    list_filter = ["naan", ShoulderListFilter]
+    search_fields = ["ark", "url"]
+    search_help_text = "An ARK prefix such as ark:/13960/t2bc, or part of a URL."
+    readonly_fields = ["updated_at"]
+    ordering = ["ark"]
+    sortable_by = []
     show_full_result_count = False
+    paginator = EstimatedCountPaginator
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
+
+    def get_search_results(self, request, queryset, search_term):
+        # Stock search ORs icontains over every field, which no index can serve.
+        return search_arks(queryset, search_term), False
 
 
 @admin.register(Key)
 class KeyAdmin(admin.ModelAdmin):
     """Django Admin model for managing Arklet access keys.
 
-    These access keys are used to mint and bind ARKs via the Arklet API.
+    These access keys are used to mint and bind ARKs via the Arklet API. Only a hash
+    of each key is stored, so the key is shown once, when it is created.
     """
 
-    list_display = ["key", "naan", "active"]
+    list_display = ["__str__", "naan", "active"]
+    readonly_fields = ["prefix"]
+    actions = ["deactivate"]
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if not change:
+            messages.warning(
+                request,
+                f"The new access key is {obj.key}. Copy it now, it won't be shown again.",
+            )
+
+    @admin.action(description="Deactivate selected keys")
+    def deactivate(self, request, queryset):
+        queryset.update(active=False)
+        key_cache.clear()  # queryset.update() doesn't send post_save
@@ -1,6 +1,17 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class ArkConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "ark"
+
+    def ready(self):
+        from ark import signals  # noqa: F401 pylint: disable=import-outside-toplevel
+
+        interval = getattr(settings, "ARKLET_CACHE_STATS_INTERVAL", 0)
+        if interval:
+            # pylint: disable=import-outside-toplevel
+            from ark.cache import start_logging_cache_stats
+
+            start_logging_cache_stats(interval)
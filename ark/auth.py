@@ -0,0 +1,38 @@
+"""Authenticate Arklet API requests by their access key.
+
+Known keys are cached per worker in ark.cache.key_cache, by hash, so authorized write
+requests don't need an extra query. Key and Naan signals clear the cache. Keys are
+read from the primary database, as a read replica that lags behind would get new keys
+cached as unknown, and deactivated ones as active, until the cache expires.
+"""
+
+import hmac
+from typing import Optional, Tuple
+
+from django.db import DEFAULT_DB_ALIAS
+
+from ark.cache import key_cache
+from ark.models import Key, Naan
+from ark.utils import hash_key, key_prefix, normalize_key
+
+
+def authenticate(key: str) -> Tuple[Optional[Naan], bool]:
+    """Find the NAAN an access key belongs to and whether the key is active.
+
+    Returns (None, False) for unknown keys and raises ValueError for malformed ones.
+    """
+    key = normalize_key(key)
+    key_hash = hash_key(key)
+    cached = key_cache.get(key_hash)
+    if cached is None:
+        cached = _authenticate_uncached(key, key_hash)
+        key_cache.set(key_hash, cached)
+    return cached
+
+
+def _authenticate_uncached(key: str, key_hash: str) -> Tuple[Optional[Naan], bool]:
+    keys = Key.objects.using(DEFAULT_DB_ALIAS).select_related("naan")
+    for candidate in keys.filter(prefix=key_prefix(key)):
+        if hmac.compare_digest(candidate.key_hash, key_hash):
+            return candidate.naan, candidate.active
+    return None, False
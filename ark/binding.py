@@ -0,0 +1,100 @@
+"""Bind URLs, metadata and commitments to many existing ARKs at once.
+
+update_ark does a SELECT and a full-row UPDATE per ARK. bind_arks checks a whole chunk
+of ARKs against the caller's NAAN with one query and rebinds them with bulk UPDATEs.
+"""
+
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from django.db import transaction
+from django.utils import timezone
+
+from ark import resolver
+from ark.forms import UpdateArkForm
+from ark.models import Ark, Naan
+from ark.purge import purge
+
+CHUNK_SIZE = 500
+
+# Per-ARK binding results
+UPDATED = "updated"
+NOT_FOUND = "not_found"
+FORBIDDEN = "forbidden"
+INVALID = "invalid"
+
+
+def bind_arks(naan: Naan, unsafe_update_requests: Iterable) -> Iterator[Dict]:
+    """Apply update requests in chunks, yielding one result per request in order.
+
+    Requests are validated with UpdateArkForm and can be consumed lazily, so a
+    stream of millions of requests only ever holds one chunk in memory.
+    """
+    chunk: List = []
+    for unsafe_update_request in unsafe_update_requests:
+        chunk.append(unsafe_update_request)
+        if len(chunk) >= CHUNK_SIZE:
+            yield from _bind_chunk(naan, chunk)
+            chunk = []
+    if chunk:
+        yield from _bind_chunk(naan, chunk)
+
+
+def _bind_chunk(naan: Naan, unsafe_update_requests: List) -> List[Dict]:
+    results: List[Dict] = []
+    # results still waiting to learn whether their ARK exists
+    pending: List[Tuple[Dict, str]] = []
+    arks_to_update: Dict[str, Ark] = {}
+    now = timezone.now()
+    for unsafe_update_request in unsafe_update_requests:
+        update_request = (
+            UpdateArkForm(unsafe_update_request)
+            if isinstance(unsafe_update_request, dict)
+            else None
+        )
+        if update_request is None or not update_request.is_valid():
+            results.append(_invalid(unsafe_update_request, update_request))
+            continue
+        result = {"ark": update_request.cleaned_data["ark"], "status": FORBIDDEN}
+        results.append(result)
+        if update_request.parsed_ark.naan != naan.naan:
+            continue
+        key = update_request.parsed_ark.qualified_key
+        # Later requests for the same ARK win, as they would one at a time.
+        arks_to_update.pop(key, None)
+        arks_to_update[key] = Ark(
+            ark=key,
+            url=update_request.cleaned_data["url"],
+            metadata=update_request.cleaned_data["metadata"],
+            commitment=update_request.cleaned_data["commitment"],
+            updated_at=now,  # bulk_update() doesn't apply auto_now
+        )
+        pending.append((result, key))
+
+    # ARK -> URL bound before this chunk
+    existing = dict(
+        Ark.objects.filter(naan=naan, ark__in=list(arks_to_update)).values_list(
+            "ark", "url"
+        )
+    )
+    Ark.objects.bulk_update(
+        [ark for key, ark in arks_to_update.items() if key in existing],
+        ["url", "metadata", "commitment", "updated_at"],
+    )
+    resolver.invalidate(existing)
+    rebound = [key for key, url in existing.items() if arks_to_update[key].url != url]
+    transaction.on_commit(lambda: purge(rebound))
+
+    for result, key in pending:
+        result["status"] = UPDATED if key in existing else NOT_FOUND
+    return results
+
+
+def _invalid(unsafe_update_request, update_request: Optional[UpdateArkForm]) -> Dict:
+    result = {"status": INVALID}
+    if isinstance(unsafe_update_request, dict) and "ark" in unsafe_update_request:
+        result["ark"] = unsafe_update_request["ark"]
+    if update_request is not None:
+        result["errors"] = update_request.errors
+    else:
+        result["errors"] = {"__all__": ["update requests must be JSON objects"]}
+    return result
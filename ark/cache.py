@@ -0,0 +1,387 @@
+"""In-process caches that keep Arklet's hot paths off the database.
+
+Set ARKLET_CACHE_STATS_INTERVAL to have every worker log its caches' counters to the
+"ark.cache" logger at INFO level, for sizing the caches against real traffic.
+"""
+
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, Hashable, Iterable, Optional, Tuple
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class LRUCache:
+    """A bounded, thread-safe least-recently-used cache with an optional TTL.
+
+    Each worker process gets its own copy, so entries can be stale for up to `ttl`
+    seconds in workers that did not see the write that invalidated them. A maxsize
+    of 0 disables the cache and a ttl of 0 keeps entries until they are evicted.
+    """
+
+    def __init__(self, maxsize: int, ttl: float = 0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            try:
+                expires, value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            if expires and expires <= time.monotonic():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        if self.maxsize <= 0:
+            return
+        expires = time.monotonic() + self.ttl if self.ttl else 0
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def invalidate_many(self, keys: Iterable[Hashable]) -> None:
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Optional[float]]:
+        """Return counters suitable for sizing the cache against real traffic."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_ratio": self.hits / lookups if lookups else None,
+            }
+
+
+class SharedMemoryCache:
+    """A fixed-size hash table in a memory-mapped file, shared by every process on a host.
+
+    All WSGI workers that open the same path share one copy of the cached entries.
+    Keys are strings and values are tuples of strings. The table is 4-way set
+    associative: a key hashes to a bucket of 4 slots and a full bucket evicts one
+    of them. Entries that don't fit in a slot are simply not cached.
+
+    Readers never lock. Each slot carries a sequence number that writers make odd
+    while they write it, so a reader that races a writer sees a miss rather than a
+    torn entry. Writers serialize on a thread lock and an flock of the backing file.
+
+    Entries expire `ttl` seconds after they were set, by the wall clock as processes
+    don't share a monotonic one, and expired slots are reused first. The TTL bounds
+    how long writes this host didn't see, from other nodes, bulk loads or
+    queryset.update(), can leave an entry stale. A ttl of 0 keeps entries until they
+    are evicted.
+
+    invalidate() frees the key's slot by marking it with generation 0, which is never
+    current. The header holds a generation counter: entries are only valid for the
+    generation they were written in, so clear() bumps it and thereby drops every
+    entry in every process at once, for changes such as a NAAN's URL that affect
+    many ARKs. invalidate_many() also clears when given more keys than there are
+    slots.
+    """
+
+    MAGIC = b"ARKLETC2"
+    WAYS = 4
+    # magic, slot count, slot size, generation
+    HEADER = struct.Struct("<8sIIQ")
+    HEADER_SIZE = 64
+    # sequence, generation, key hash, expiry (0 for none), key length, value length
+    SLOT_HEADER = struct.Struct("<IQQdHH")
+
+    def __init__(self, path: str, slots: int, slot_size: int = 512, ttl: float = 0):
+        self.path = path
+        self.ttl = ttl
+        self.nbuckets = max(1, slots // self.WAYS)
+        self.slot_size = slot_size
+        self.size = self.HEADER_SIZE + self.nbuckets * self.WAYS * slot_size
+        self._lock = threading.Lock()
+        self._pid: Optional[int] = None
+        self._fd = -1
+        self._mm: Optional[mmap.mmap] = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _map(self) -> mmap.mmap:
+        # flock locks belong to the open file description, which forked workers would
+        # share with their parent, so every process opens the file for itself.
+        if self._pid == os.getpid() and self._mm is not None:
+            return self._mm
+        with self._lock:
+            if self._pid != os.getpid() or self._mm is None:
+                fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+                with _flocked(fd):
+                    header = os.pread(fd, self.HEADER.size, 0)
+                    expected = (self.MAGIC, self.nbuckets * self.WAYS, self.slot_size)
+                    if (
+                        len(header) < self.HEADER.size
+                        or self.HEADER.unpack(header)[:3] != expected
+                        or os.fstat(fd).st_size != self.size
+                    ):
+                        os.ftruncate(fd, 0)
+                        os.ftruncate(fd, self.size)
+                        os.pwrite(fd, self.HEADER.pack(*expected, 1), 0)
+                self._mm = mmap.mmap(fd, self.size)
+                self._fd = fd
+                self._pid = os.getpid()
+        return self._mm
+
+    @property
+    def generation(self) -> int:
+        return self.HEADER.unpack_from(self._map(), 0)[3]
+
+    def _slots(self, key_hash: int):
+        bucket = key_hash % self.nbuckets
+        first = self.HEADER_SIZE + bucket * self.WAYS * self.slot_size
+        return range(first, first + self.WAYS * self.slot_size, self.slot_size)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        mm = self._map()
+        generation = self.generation
+        key_bytes = key.encode()
+        key_hash = _hash(key_bytes)
+        for offset in self._slots(key_hash):
+            seq, gen, h, expires, key_len, value_len = self.SLOT_HEADER.unpack_from(
+                mm, offset
+            )
+            if seq % 2 or gen != generation or h != key_hash:
+                continue
+            start = offset + self.SLOT_HEADER.size
+            stored_key = mm[start : start + key_len]
+            value = mm[start + key_len : start + key_len + value_len]
+            if self.SLOT_HEADER.unpack_from(mm, offset)[0] != seq:
+                continue  # a writer got here first
+            if stored_key == key_bytes:
+                if expires and expires <= time.time():
+                    self.expirations += 1
+                    break
+                self.hits += 1
+                return tuple(value.decode().split("\0"))
+        self.misses += 1
+        return default
+
+    def set(self, key: str, value: Tuple[str, ...]) -> None:
+        key_bytes = key.encode()
+        value_bytes = "\0".join(value).encode()
+        if self.SLOT_HEADER.size + len(key_bytes) + len(value_bytes) > self.slot_size:
+            return
+        key_hash = _hash(key_bytes)
+        mm = self._map()
+        now = time.time()
+        with self._lock, _flocked(self._fd):
+            generation = self.generation
+            slots = self._slots(key_hash)
+            target = None
+            for offset in slots:
+                _, gen, h, expires, _, _ = self.SLOT_HEADER.unpack_from(mm, offset)
+                if gen == generation and h == key_hash:
+                    target = offset
+                    break
+                if target is None and (gen != generation or 0 < expires <= now):
+                    target = offset
+            if target is None:
+                target = slots[(key_hash >> 32) % self.WAYS]
+                self.evictions += 1
+            seq = self.SLOT_HEADER.unpack_from(mm, target)[0]
+            struct.pack_into("<I", mm, target, seq + 1)
+            start = target + self.SLOT_HEADER.size
+            mm[start : start + len(key_bytes) + len(value_bytes)] = (
+                key_bytes + value_bytes
+            )
+            self.SLOT_HEADER.pack_into(
+                mm,
+                target,
+                seq + 2,
+                generation,
+                key_hash,
+                now + self.ttl if self.ttl else 0,
+                len(key_bytes),
+                len(value_bytes),
+            )
+
+    def invalidate(self, key: str) -> None:
+        self.invalidate_many([key])
+
+    def invalidate_many(self, keys: Iterable[str]) -> None:
+        keys = list(keys)
+        if len(keys) > self.nbuckets * self.WAYS:
+            self.clear()
+            return
+        mm = self._map()
+        with self._lock, _flocked(self._fd):
+            generation = self.generation
+            for key in keys:
+                key_bytes = key.encode()
+                key_hash = _hash(key_bytes)
+                for offset in self._slots(key_hash):
+                    seq, gen, h, _, key_len, _ = self.SLOT_HEADER.unpack_from(
+                        mm, offset
+                    )
+                    start = offset + self.SLOT_HEADER.size
+                    if (
+                        gen == generation
+                        and h == key_hash
+                        and mm[start : start + key_len] == key_bytes
+                    ):
+                        # Bump the sequence so that racing readers retry as a miss
+                        self.SLOT_HEADER.pack_into(mm, offset, seq + 2, 0, 0, 0, 0, 0)
+
+    def clear(self) -> None:
+        mm = self._map()
+        with self._lock, _flocked(self._fd):
+            self.HEADER.pack_into(
+                mm,
+                0,
+                self.MAGIC,
+                self.nbuckets * self.WAYS,
+                self.slot_size,
+                self.generation + 1,
+            )
+
+    def stats(self) -> Dict[str, Optional[float]]:
+        """Return this process's counters and the shared generation."""
+        lookups = self.hits + self.misses
+        return {
+            "path": self.path,
+            "slots": self.nbuckets * self.WAYS,
+            "ttl": self.ttl,
+            "generation": self.generation,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_ratio": self.hits / lookups if lookups else None,
+        }
+
+
+@contextmanager
+def _flocked(fd: int):
+    """Hold an exclusive flock on a file descriptor."""
+    import fcntl  # pylint: disable=import-outside-toplevel # POSIX only
+
+    fcntl.flock(fd, fcntl.LOCK_EX)
+    try:
+        yield
+    finally:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+
+
+def _hash(key: bytes) -> int:
+    # Python's hash() is randomized per process, which would defeat sharing.
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little")
+
+
+# ARK ("naan/assigned_name") -> ark.resolver.Resolution fields
+resolve_cache: Any
+if getattr(settings, "ARKLET_RESOLVE_SHARED_CACHE_PATH", ""):
+    resolve_cache = SharedMemoryCache(
+        path=settings.ARKLET_RESOLVE_SHARED_CACHE_PATH,
+        slots=getattr(settings, "ARKLET_RESOLVE_SHARED_CACHE_SLOTS", 65_536),
+        ttl=getattr(settings, "ARKLET_RESOLVE_CACHE_TTL", 300),
+    )
+else:
+    resolve_cache = LRUCache(
+        maxsize=getattr(settings, "ARKLET_RESOLVE_CACHE_SIZE", 10_000),
+        ttl=getattr(settings, "ARKLET_RESOLVE_CACHE_TTL", 300),
+    )
+
+# (NAAN, shoulder string) -> (ark.models.Shoulder or None,)
+shoulder_cache = LRUCache(maxsize=1_000, ttl=60)
+
+# access key hash -> (ark.models.Naan or None, active)
+key_cache = LRUCache(maxsize=1_000, ttl=getattr(settings, "ARKLET_KEY_CACHE_TTL", 60))
+
+# Authorization header hash -> True, for keys whose requests wrote to the primary
+# database recently, see ark.replicas
+replica_pin_cache = LRUCache(
+    maxsize=10_000, ttl=getattr(settings, "ARKLET_REPLICA_PIN_SECONDS", 10)
+)
+
+
+def cache_stats() -> Dict[str, Dict[str, Any]]:
+    """The counters of every cache in this process, by cache name."""
+    return {
+        "resolve": resolve_cache.stats(),
+        "shoulder": shoulder_cache.stats(),
+        "key": key_cache.stats(),
+        "replica_pin": replica_pin_cache.stats(),
+    }
+
+
+def log_cache_stats() -> None:
+    for name, stats in cache_stats().items():
+        logger.info(
+            "%s cache stats for process %d: %s", name, os.getpid(), json.dumps(stats)
+        )
+
+
+def start_logging_cache_stats(interval: float) -> threading.Event:
+    """Log cache stats every interval seconds, in this process and any forked from it.
+
+    Forked workers, e.g. of a preloading gunicorn, don't inherit the logging thread,
+    so they start their own. Set the returned event to stop logging.
+    """
+    stop = threading.Event()
+
+    def start():
+        threading.Thread(
+            target=_log_cache_stats_every,
+            args=(interval, stop),
+            name="arklet-cache-stats",
+            daemon=True,
+        ).start()
+
+    start()
+    if hasattr(os, "register_at_fork"):
+        os.register_at_fork(after_in_child=start)
+    return stop
+
+
+def _log_cache_stats_every(interval: float, stop: threading.Event) -> None:
+    while not stop.wait(interval):
+        try:
+            log_cache_stats()
+        except Exception:  # pylint: disable=broad-except
+            logger.exception("Couldn't log cache stats")
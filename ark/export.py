@@ -0,0 +1,76 @@
+"""Read every ARK in primary key order without holding the table in memory.
+
+Server-side cursors are disabled for pgbouncer (see DISABLE_SERVER_SIDE_CURSORS in
+settings), so QuerySet.iterator() would fetch the whole result at once. Instead ARKs
+are read a page at a time with keyset pagination, each page starting after the last
+ARK of the one before. That is also what makes exports resumable.
+
+Exports can be limited to the ARKs that changed since a given time, for partners who
+keep a copy in sync.
+"""
+
+import datetime
+import json
+from typing import Dict, Iterator, List, Optional
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.dateparse import parse_date, parse_datetime
+
+from ark.models import Ark
+
+EXPORT_FIELDS = [
+    "ark",
+    "naan",
+    "shoulder",
+    "assigned_name",
+    "url",
+    "metadata",
+    "commitment",
+    "updated_at",
+]
+PAGE_SIZE = 1_000
+
+
+def export_pages(
+    naan: Optional[int] = None,
+    shoulder: Optional[str] = None,
+    after: str = "",
+    page_size: int = PAGE_SIZE,
+    since: Optional[datetime.datetime] = None,
+) -> Iterator[List[Dict]]:
+    """Yield pages of ARKs as dicts of EXPORT_FIELDS, ordered by ARK.
+
+    Only ARKs after the given ARK are exported, so passing the last ARK of a previous
+    export continues it. With since, only ARKs updated at or after that time are.
+    """
+    arks = Ark.objects.order_by("ark")
+    if naan is not None:
+        arks = arks.filter(naan_id=naan)
+    if shoulder is not None:
+        arks = arks.filter(shoulder=shoulder)
+    if since is not None:
+        arks = arks.filter(updated_at__gte=since)
+    while True:
+        page = list(arks.filter(ark__gt=after).values(*EXPORT_FIELDS)[:page_size])
+        if not page:
+            return
+        yield page
+        after = page[-1]["ark"]
+
+
+def parse_since(value: str) -> datetime.datetime:
+    """Parse an ISO 8601 date or date and time, in UTC unless it has an offset."""
+    since = parse_datetime(value)
+    if since is None:
+        date = parse_date(value)
+        if date is None:
+            raise ValueError(f"Not an ISO 8601 date or date and time: {value}")
+        since = datetime.datetime.combine(date, datetime.time())
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=datetime.timezone.utc)
+    return since
+
+
+def ndjson(page: List[Dict]) -> str:
+    """Format exported ARKs as JSON lines."""
+    return "".join(json.dumps(row, cls=DjangoJSONEncoder) + "\n" for row in page)
@@ -1,7 +1,8 @@
 from django import forms
 from django.core.exceptions import ValidationError
 
-from ark.utils import parse_ark
+from ark.parsing import ParsedArk, parse
+from ark.utils import metadata_from_text
 
 
 def validate_shoulder(shoulder: str):
@@ -9,23 +10,61 @@ def validate_shoulder(shoulder: str):
         raise ValidationError("Shoulders must start with a forward slash")
 
 
-def validate_ark(ark: str):
+def clean_ark(ark: str) -> ParsedArk:
     try:
-        parse_ark(ark)
+        return parse(ark)
     except ValueError as e:
         raise ValidationError(f"Invalid ARK: {e}")
 
 
+class MetadataField(forms.Field):
+    """ARK metadata, either a JSON object or text structured by metadata_from_text."""
+
+    def to_python(self, value):
+        if value is None:
+            return {}
+        if isinstance(value, str):
+            return metadata_from_text(value)
+        if not isinstance(value, dict):
+            raise ValidationError("Metadata must be an object or text")
+        return value
+
+
 class MintArkForm(forms.Form):
     naan = forms.IntegerField()
     shoulder = forms.CharField(validators=[validate_shoulder])
     url = forms.URLField(required=False)
-    metadata = forms.CharField(required=False)
+    metadata = MetadataField(required=False)
     commitment = forms.CharField(required=False)
 
 
+class MintArkBatchForm(MintArkForm):
+    count = forms.IntegerField(min_value=1)
+
+
 class UpdateArkForm(forms.Form):
-    ark = forms.CharField(validators=[validate_ark])
+    ark = forms.CharField()
     url = forms.URLField(required=False)
-    metadata = forms.CharField(required=False)
+    metadata = MetadataField(required=False)
     commitment = forms.CharField(required=False)
+
+    parsed_ark: ParsedArk
+
+    def clean_ark(self):
+        # Parsed once here, for the views to use
+        self.parsed_ark = clean_ark(self.cleaned_data["ark"])
+        return self.cleaned_data["ark"]
+
+
+class PageForm(forms.Form):
+    limit = forms.IntegerField(min_value=1, max_value=1_000, required=False)
+    after = forms.CharField(required=False)
+
+
+class SearchArksForm(PageForm):
+    q = forms.CharField()
+
+
+class QueryArksForm(PageForm):
+    key = forms.CharField(max_length=100)
+    value = forms.CharField(strip=False)
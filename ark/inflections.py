@@ -0,0 +1,109 @@
+"""ARK inflections: requests that ask for a description of an ARK instead of its target.
+
+Following the ARK spec, "?" asks for a brief description, the ERC kernel elements
+who, what, when and where, and "??" or "?info" for everything known about the ARK,
+including its maintenance commitment. Descriptions are ERC records, or JSON for
+clients that accept application/json.
+
+A lone "?" leaves an empty query string, so it can only be told apart from a plain
+resolve where the server passes on the raw request URI, as gunicorn (RAW_URI), uWSGI
+and mod_wsgi (REQUEST_URI) do.
+"""
+
+import datetime
+import json
+from typing import Dict, Optional
+
+from django.utils.http import http_date
+
+BRIEF = "brief"
+FULL = "full"
+
+ERC = "text/plain; charset=utf-8"
+JSON = "application/json"
+
+KERNEL = ("who", "what", "when", "where")
+UNAVAILABLE = "(:unav)"  # ERC's code for a missing value
+
+
+def inflection(request) -> Optional[str]:
+    """Which description, if any, the request asks for."""
+    query = request.META.get("QUERY_STRING", "")
+    if query in ("?", "info"):
+        return FULL
+    if query:
+        return None
+    raw_uri = request.META.get("RAW_URI") or request.META.get("REQUEST_URI") or ""
+    return BRIEF if raw_uri.endswith("?") else None
+
+
+def content_type(request) -> str:
+    return JSON if JSON in request.headers.get("Accept", "") else ERC
+
+
+def etag(updated_at: datetime.datetime, kind: str, media_type: str) -> str:
+    """A strong ETag for a description, which only changes when the ARK does."""
+    version = int(updated_at.timestamp() * 1_000_000)
+    media = "json" if media_type == JSON else "erc"
+    return f'"{version:x}-{kind}-{media}"'
+
+
+def last_modified(updated_at: datetime.datetime) -> str:
+    return http_date(updated_at.timestamp())
+
+
+def describe(
+    ark: str, record: Dict, kind: str, media_type: str, qualifier: str = ""
+) -> str:
+    """Describe an ARK given as "naan/name" from its url, metadata and commitment.
+
+    A qualifier, e.g. "/page/5" of a request for ark:/13960/t2abc/page/5, is reported
+    alongside the description of the ARK it qualifies.
+    """
+    if media_type == JSON:
+        return json.dumps(_json(ark, record, kind, qualifier))
+    return _erc(ark, record, kind, qualifier)
+
+
+def _json(ark: str, record: Dict, kind: str, qualifier: str) -> Dict:
+    metadata = record["metadata"]
+    if kind == BRIEF:
+        description = {
+            "ark": f"ark:/{ark}",
+            "metadata": {key: metadata[key] for key in KERNEL if key in metadata},
+        }
+    else:
+        description = {
+            "ark": f"ark:/{ark}",
+            "target": record["url"],
+            "metadata": metadata,
+            "commitment": record["commitment"],
+        }
+    if qualifier:
+        description["qualifier"] = qualifier
+    return description
+
+
+def _erc(ark: str, record: Dict, kind: str, qualifier: str) -> str:
+    metadata = dict(record["metadata"])
+    metadata.setdefault("where", f"ark:/{ark}")
+    lines = ["erc:"]
+    lines.extend(_anvl(key, metadata.get(key, UNAVAILABLE)) for key in KERNEL)
+    if qualifier:
+        lines.append(_anvl("qualifier", qualifier))
+    if kind == FULL:
+        lines.extend(
+            _anvl(key, value) for key, value in metadata.items() if key not in KERNEL
+        )
+        if record["url"]:
+            lines.append(_anvl("target", record["url"]))
+        if record["commitment"]:
+            lines.extend(["erc-support:", _anvl("what", record["commitment"])])
+    return "\n".join(lines) + "\n"
+
+
+def _anvl(label: str, value) -> str:
+    if not isinstance(value, str):
+        value = json.dumps(value)
+    # Values continue over lines that start with whitespace
+    return f"{label}: " + "\n ".join(value.splitlines() or [""])
@@ -0,0 +1,163 @@
+"""Django Admin command to export ARKs to JSON lines or CSV, optionally gzipped.
+
+ARKs are read with keyset pagination (see ark.export) and written as they're read, so
+memory use doesn't grow with the table. With --cursor, progress is saved to a cursor
+file every --checkpoint-pages pages; rerunning the same command resumes from the last
+checkpoint, truncating anything written after it. Delete the cursor file to start a
+new export.
+
+Gzipped exports start a new gzip member at every checkpoint, which gzip and other
+tools read back as one stream.
+"""
+
+import csv
+import datetime
+import gzip
+import io
+import json
+import os
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+
+from ark.export import EXPORT_FIELDS, PAGE_SIZE, export_pages, ndjson, parse_since
+
+JSONL = "jsonl"
+CSV = "csv"
+
+
+class Command(BaseCommand):
+    """Export ARKs to a file."""
+
+    help = "Export ARKs as JSON lines or CSV"
+
+    def add_arguments(self, parser):
+        parser.add_argument("output", help="File to write, or - for stdout")
+        parser.add_argument("--format", choices=[JSONL, CSV], default=None)
+        parser.add_argument(
+            "--gzip", action="store_true", help="Compress, the default for .gz files"
+        )
+        parser.add_argument("--naan", type=int, help="Only export this NAAN's ARKs")
+        parser.add_argument("--shoulder", type=str, help="Only export this shoulder")
+        parser.add_argument(
+            "--since",
+            type=str,
+            help="Only export ARKs updated since this ISO 8601 date or time, UTC if "
+            "it has no offset",
+        )
+        parser.add_argument("--page-size", type=int, default=PAGE_SIZE)
+        parser.add_argument("--cursor", help="Cursor file to save progress to")
+        parser.add_argument("--checkpoint-pages", type=int, default=100)
+
+    def handle(self, *args, **options):
+        output = options["output"]
+        to_stdout = output == "-"
+        name = output[:-3] if output.endswith(".gz") else output
+        export_format = options["format"] or (CSV if name.endswith(".csv") else JSONL)
+        compress = options["gzip"] or output.endswith(".gz")
+        try:
+            since = parse_since(options["since"]) if options["since"] else None
+        except ValueError as e:
+            raise CommandError(e)
+        filters = {
+            "naan": options["naan"],
+            "shoulder": options["shoulder"],
+            "since": since.isoformat() if since else None,
+            "format": export_format,
+            "gzip": compress,
+        }
+        cursor_path = options["cursor"]
+        if cursor_path and to_stdout:
+            raise CommandError("Can't resume exports to stdout, drop --cursor")
+
+        cursor = {"after": "", "bytes": 0, "rows": 0, **filters}
+        if cursor_path and os.path.exists(cursor_path):
+            with open(cursor_path) as f:
+                cursor = json.load(f)
+            if any(cursor.get(key) != value for key, value in filters.items()):
+                raise CommandError(
+                    f"{cursor_path} is for an export with different options"
+                )
+
+        if to_stdout:
+            out = sys.stdout.buffer
+        elif cursor["bytes"]:
+            out = open(output, "r+b")
+            out.truncate(cursor["bytes"])
+            out.seek(cursor["bytes"])
+        else:
+            out = open(output, "wb")
+
+        rows = cursor["rows"]
+        try:
+            pages = export_pages(
+                naan=options["naan"],
+                shoulder=options["shoulder"],
+                after=cursor["after"],
+                page_size=options["page_size"],
+                since=since,
+            )
+            stream = gzip.GzipFile(fileobj=out, mode="wb") if compress else out
+            if export_format == CSV and not cursor["bytes"]:
+                stream.write(_csv_lines([EXPORT_FIELDS]))
+            for page_number, page in enumerate(pages, start=1):
+                stream.write(_encode(page, export_format))
+                rows += len(page)
+                if cursor_path and page_number % options["checkpoint_pages"] == 0:
+                    stream = self._checkpoint(
+                        stream, out, compress, cursor_path, cursor, page[-1], rows
+                    )
+                    self.stderr.write(f"{rows} ARKs exported")
+            if stream is not out:
+                stream.close()  # finish the last gzip member
+            out.flush()
+            if cursor_path and rows > cursor["rows"]:
+                cursor.update(after=page[-1]["ark"], bytes=out.tell(), rows=rows)
+                _save_cursor(cursor_path, cursor)
+        finally:
+            if not to_stdout:
+                out.close()
+
+        self.stderr.write(self.style.SUCCESS(f"Exported {rows} ARKs"))
+
+    @staticmethod
+    def _checkpoint(stream, out, compress, cursor_path, cursor, last, rows):
+        """Make everything written so far durable and record it in the cursor file."""
+        if compress:
+            stream.close()  # ends the gzip member, leaving out open
+        out.flush()
+        os.fsync(out.fileno())
+        cursor.update(after=last["ark"], bytes=out.tell(), rows=rows)
+        _save_cursor(cursor_path, cursor)
+        return gzip.GzipFile(fileobj=out, mode="wb") if compress else out
+
+
+def _encode(page, export_format) -> bytes:
+    if export_format == CSV:
+        return _csv_lines(
+            [_csv_value(row[field]) for field in EXPORT_FIELDS] for row in page
+        )
+    return ndjson(page).encode("utf-8")
+
+
+def _csv_value(value):
+    # Metadata is JSON, which CSV cells hold as JSON text
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    if isinstance(value, datetime.datetime):
+        return DjangoJSONEncoder().default(value)  # as in JSON lines exports
+    return value
+
+
+def _csv_lines(rows) -> bytes:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue().encode("utf-8")
+
+
+def _save_cursor(path, cursor) -> None:
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(cursor, f)
+    os.replace(tmp_path, path)
@@ -1,13 +1,29 @@
 """Django Admin command to mint ARKs in bulk.
 
-This command was created to populate a test database for load testing. It only mints
-ARKs, it doesn't bind URLs to them.
+This command was created to populate a test database for load testing. It mints
+check-digited ARKs in batches, skipping any that already exist and minting more to
+make up for them, and can bind synthetic URLs and metadata to them.
+
+With --workers, batches are minted by several processes at once. Each batch in flight
+draws the first character of its NOIDs from its own slice of the alphabet, so
+concurrent batches can't collide with each other.
 """
 
-from django.core.management.base import BaseCommand
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Tuple
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, connections, transaction
 
+from ark.minting import MAX_MINT_ATTEMPTS, NOID_LENGTH, existing_arks
 from ark.models import Ark, Naan
-from ark.utils import generate_noid
+from ark.utils import (
+    BETANUMERIC,
+    generate_noids,
+    metadata_from_text,
+    noid_check_digit,
+)
 
 
 class Command(BaseCommand):
@@ -19,19 +35,170 @@ class Command(BaseCommand):
         parser.add_argument("ark_count", type=int)
         parser.add_argument("naan", type=int)
         parser.add_argument("shoulder", type=str)
+        parser.add_argument("--batch-size", type=int, default=10_000)
+        parser.add_argument(
+            "--workers", type=int, default=1, help="Processes minting in parallel"
+        )
+        parser.add_argument("--noid-length", type=int, default=NOID_LENGTH)
+        parser.add_argument(
+            "--url-template",
+            default="",
+            help="Bind URLs such as https://example.org/{assigned_name}, "
+            "also accepts {ark}, {naan} and {shoulder}",
+        )
+        parser.add_argument(
+            "--metadata-template",
+            default="",
+            help="Bind metadata, as --url-template, e.g. 'who: Example\nwhat: {ark}'",
+        )
 
     def handle(self, *args, **options):
         ark_count = options["ark_count"]
         naan_id = options["naan"]
-        naan = Naan.objects.get(pk=options["naan"])
         shoulder = options["shoulder"]
+        batch_size = options["batch_size"]
+        workers = options["workers"]
+        if not Naan.objects.filter(pk=naan_id).exists():
+            raise CommandError(f"NAAN {naan_id} does not exist")
+        if not 1 <= workers <= len(BETANUMERIC):
+            raise CommandError(f"--workers must be between 1 and {len(BETANUMERIC)}")
+        if batch_size < 1:
+            raise CommandError("--batch-size must be positive")
+        if options["noid_length"] < 1:
+            raise CommandError("--noid-length must be positive")
 
-        Ark.objects.bulk_create(
-            Ark(
-                ark=f"{naan_id}{shoulder}{generate_noid(20)}",
-                naan=naan,
-                shoulder=shoulder,
+        def mint_args(slot: int, count: int) -> tuple:
+            return (
+                naan_id,
+                shoulder,
+                count,
+                options["noid_length"],
+                BETANUMERIC[slot::workers],
+                options["url_template"],
+                options["metadata_template"],
+            )
+
+        minted, collisions, fruitless = 0, 0, 0
+        start = time.perf_counter()
+
+        def report(batch_minted: int, batch_collisions: int) -> None:
+            nonlocal minted, collisions, fruitless
+            minted += batch_minted
+            collisions += batch_collisions
+            fruitless = 0 if batch_minted else fruitless + 1
+            rate = minted / (time.perf_counter() - start)
+            self.stdout.write(
+                f"{minted}/{ark_count} ARKs, {rate:.0f}/s, {collisions} collision(s)"
+            )
+            if fruitless >= MAX_MINT_ATTEMPTS:
+                raise CommandError(
+                    f"Gave up after {fruitless} batches without a new ARK, "
+                    f"is the shoulder full?"
+                )
+
+        if workers == 1:
+            while minted < ark_count:
+                report(*mint_batch(*mint_args(0, min(batch_size, ark_count - minted))))
+        else:
+            # Forked workers mustn't share the parent's database connections.
+            connections.close_all()
+            with ProcessPoolExecutor(workers) as pool:
+                in_flight = {}  # future -> (slot, ARKs requested)
+                requested = 0
+                while minted < ark_count:
+                    busy = {slot for slot, _ in in_flight.values()}
+                    for slot in sorted(set(range(workers)) - busy):
+                        count = min(batch_size, ark_count - requested)
+                        if count <= 0:
+                            break
+                        future = pool.submit(mint_batch, *mint_args(slot, count))
+                        in_flight[future] = (slot, count)
+                        requested += count
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        _, count = in_flight.pop(future)
+                        batch_minted, batch_collisions = future.result()
+                        requested -= count - batch_minted  # top up what was lost
+                        report(batch_minted, batch_collisions)
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Successfully minted {minted} ARKs in {elapsed:.1f}s "
+                f"({minted / elapsed:.0f}/s) after {collisions} collision(s)"
             )
-            for _ in range(ark_count)
         )
-        self.stdout.write(self.style.SUCCESS(f"Successfully minted {ark_count} ARKs"))
+
+
+def mint_batch(
+    naan_id: int,
+    shoulder: str,
+    count: int,
+    noid_length: int,
+    first_chars: str = BETANUMERIC,
+    url_template: str = "",
+    metadata_template: str = "",
+) -> Tuple[int, int]:
+    """Insert up to count new ARKs, returning how many were minted and how many collided.
+
+    ARKs that already exist are skipped rather than replaced, so fewer than count
+    may be minted, and only ARKs actually inserted are counted. Runs in worker
+    processes when minting in parallel.
+    """
+    candidates = {}
+    for noid in generate_noids(count, noid_length, first_chars):
+        base_ark_string = f"{naan_id}{shoulder}{noid}"
+        check_digit = noid_check_digit(base_ark_string)
+        candidates[f"{base_ark_string}{check_digit}"] = f"{noid}{check_digit}"
+    for _ in range(MAX_MINT_ATTEMPTS):
+        for ark_string in existing_arks(list(candidates)):
+            del candidates[ark_string]
+        new_arks = [
+            _new_ark(
+                naan_id,
+                shoulder,
+                ark_string,
+                assigned_name,
+                url_template,
+                metadata_template,
+            )
+            for ark_string, assigned_name in candidates.items()
+        ]
+        try:
+            with transaction.atomic():
+                Ark.objects.bulk_create(new_arks, batch_size=1_000)
+        except IntegrityError:
+            # Another minter created some of them since we checked, check again
+            continue
+        return len(new_arks), count - len(new_arks)
+    return 0, count
+
+
+def _new_ark(
+    naan_id: int,
+    shoulder: str,
+    ark_string: str,
+    assigned_name: str,
+    url_template: str,
+    metadata_template: str,
+) -> Ark:
+    return Ark(
+        ark=ark_string,
+        naan_id=naan_id,
+        shoulder=shoulder,
+        assigned_name=assigned_name,
+        url=_format(url_template, naan_id, shoulder, ark_string, assigned_name),
+        metadata=metadata_from_text(
+            _format(metadata_template, naan_id, shoulder, ark_string, assigned_name)
+        ),
+    )
+
+
+def _format(
+    template: str, naan: int, shoulder: str, ark: str, assigned_name: str
+) -> str:
+    if not template:
+        return ""
+    return template.format(
+        naan=naan, shoulder=shoulder, ark=f"ark:/{ark}", assigned_name=assigned_name
+    )
@@ -0,0 +1,60 @@
+"""Django Admin command to top up the pools of pre-minted ARKs.
+
+Shoulders in pool minting mode mint by claiming ARKs from the PoolArk table. Run this
+command periodically (e.g. from cron) to refill pools that fell below the low-water
+mark, or with --status to report pool depths for alerting.
+"""
+
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ark.minting import pool_depths, pool_low_water, pool_target, replenish_pool
+from ark.models import Shoulder
+
+
+class Command(BaseCommand):
+    """Refill the ARK pools of pool minting shoulders."""
+
+    help = "Refill ARK pools that fell below the low-water mark"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--naan", type=int, help="Only refill this NAAN's pools")
+        parser.add_argument("--shoulder", type=str, help="Only refill this shoulder")
+        parser.add_argument("--low-water", type=int, default=None)
+        parser.add_argument("--target", type=int, default=None)
+        parser.add_argument(
+            "--status",
+            action="store_true",
+            help="Print pool depths as JSON and exit with status 1 if any pool is "
+            "below the low-water mark",
+        )
+
+    def handle(self, *args, **options):
+        low_water = options["low_water"] or pool_low_water()
+        target = options["target"] or pool_target()
+
+        if options["status"]:
+            depths = pool_depths()
+            for depth in depths:
+                depth["low_water"] = low_water
+                self.stdout.write(json.dumps(depth))
+            if any(depth["depth"] < low_water for depth in depths):
+                raise CommandError("ARK pool below low-water mark", returncode=1)
+            return
+
+        shoulders = Shoulder.objects.filter(minting_mode=Shoulder.POOL)
+        if options["naan"] is not None:
+            shoulders = shoulders.filter(naan_id=options["naan"])
+        if options["shoulder"] is not None:
+            shoulders = shoulders.filter(shoulder=options["shoulder"])
+        depths = {(d["naan"], d["shoulder"]): d["depth"] for d in pool_depths()}
+
+        for shoulder in shoulders:
+            depth = depths.get((shoulder.naan_id, shoulder.shoulder), 0)
+            if depth >= low_water:
+                continue
+            added = replenish_pool(shoulder, target)
+            self.stdout.write(
+                self.style.SUCCESS(f"Added {added} ARKs to the pool for {shoulder}")
+            )
@@ -0,0 +1,41 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ark", "0003_set_defaults_in_db"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="shoulder",
+            name="counter",
+            field=models.PositiveBigIntegerField(
+                default=0,
+                editable=False,
+                help_text="Next sequence number to reserve for sequential minting.",
+            ),
+        ),
+        migrations.AddField(
+            model_name="shoulder",
+            name="minting_mode",
+            field=models.CharField(
+                choices=[
+                    ("random", "Random NOIDs"),
+                    ("sequential", "Sequential NOIDs following the template"),
+                ],
+                default="random",
+                max_length=20,
+            ),
+        ),
+        migrations.AddField(
+            model_name="shoulder",
+            name="template",
+            field=models.CharField(
+                default="eedeedk",
+                help_text='Noid-style mask for sequential minting, e.g. "eedeedk": d digit, e betanumeric, trailing k check character.',
+                max_length=50,
+            ),
+        ),
+    ]
@@ -0,0 +1,57 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ark", "0004_shoulder_sequential_minting"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="shoulder",
+            name="minting_mode",
+            field=models.CharField(
+                choices=[
+                    ("random", "Random NOIDs"),
+                    ("sequential", "Sequential NOIDs following the template"),
+                    ("pool", "Random NOIDs claimed from a pre-minted pool"),
+                ],
+                default="random",
+                max_length=20,
+            ),
+        ),
+        migrations.CreateModel(
+            name="PoolArk",
+            fields=[
+                (
+                    "ark",
+                    models.CharField(
+                        editable=False,
+                        max_length=200,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                ("shoulder", models.CharField(editable=False, max_length=50)),
+                ("assigned_name", models.CharField(editable=False, max_length=100)),
+                (
+                    "naan",
+                    models.ForeignKey(
+                        editable=False,
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        to="ark.naan",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["naan", "shoulder"],
+                        name="ark_poolark_naan_id_be7e4e_idx",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,54 @@
+import hashlib
+import uuid
+
+from django.db import migrations, models
+
+
+def hash_existing_keys(apps, schema_editor):
+    """Replace each clear-text key with its hash and give it a new random id.
+
+    Existing keys keep working. Their clear-text values can't be recovered.
+    """
+    Key = apps.get_model("ark", "Key")
+    for key in Key.objects.all():
+        clear_key = str(key.id)
+        Key.objects.create(
+            id=uuid.uuid4(),
+            prefix=clear_key[:8],
+            key_hash=hashlib.sha256(clear_key.encode()).hexdigest(),
+            naan_id=key.naan_id,
+            active=key.active,
+        )
+        key.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ark", "0005_ark_pool"),
+    ]
+
+    operations = [
+        migrations.RenameField(
+            model_name="key",
+            old_name="key",
+            new_name="id",
+        ),
+        migrations.AddField(
+            model_name="key",
+            name="key_hash",
+            field=models.CharField(default="", editable=False, max_length=64),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name="key",
+            name="prefix",
+            field=models.CharField(
+                db_index=True, default="", editable=False, max_length=8
+            ),
+            preserve_default=False,
+        ),
+        # Hashed keys can't be turned back into clear-text ones. Migrating back leaves
+        # each key's random id as its value, so keys must be reissued afterwards.
+        migrations.RunPython(hash_existing_keys, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+from django.db import migrations, models
+
+INDEX = models.Index(
+    fields=["naan", "shoulder", "ark"], name="ark_ark_naan_shoulder_ark_idx"
+)
+
+
+def add_index(apps, schema_editor):
+    Ark = apps.get_model("ark", "Ark")
+    if schema_editor.connection.vendor == "postgresql":
+        # Don't block writes to a large Ark table while the index builds
+        schema_editor.add_index(Ark, INDEX, concurrently=True)
+    else:
+        schema_editor.add_index(Ark, INDEX)
+
+
+def remove_index(apps, schema_editor):
+    Ark = apps.get_model("ark", "Ark")
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.remove_index(Ark, INDEX, concurrently=True)
+    else:
+        schema_editor.remove_index(Ark, INDEX)
+
+
+class Migration(migrations.Migration):
+    atomic = False  # CREATE INDEX CONCURRENTLY can't run inside a transaction
+
+    dependencies = [
+        ("ark", "0006_hash_access_keys"),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[migrations.AddIndex(model_name="ark", index=INDEX)],
+            database_operations=[migrations.RunPython(add_index, remove_index)],
+        ),
+    ]
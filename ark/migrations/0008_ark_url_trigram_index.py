@@ -0,0 +1,33 @@
+from django.db import migrations
+
+
+def add_index(apps, schema_editor):
+    # ARK prefix searches already use the varchar_pattern_ops "_like" index that
+    # Django creates for the ark primary key. Substring searches on URLs need pg_trgm,
+    # over the UPPER() that Django's icontains lookup compares on Postgres. Elsewhere,
+    # e.g. on SQLite, URL searches scan the table.
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    schema_editor.execute(
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ark_ark_url_trgm_idx "
+        "ON ark_ark USING gin (UPPER(url::text) gin_trgm_ops)"
+    )
+
+
+def remove_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("DROP INDEX CONCURRENTLY IF EXISTS ark_ark_url_trgm_idx")
+
+
+class Migration(migrations.Migration):
+    atomic = False  # CREATE INDEX CONCURRENTLY can't run inside a transaction
+
+    dependencies = [
+        ("ark", "0007_ark_naan_shoulder_index"),
+    ]
+
+    operations = [
+        migrations.RunPython(add_index, remove_index),
+    ]
@@ -0,0 +1,108 @@
+import json
+
+from django.db import migrations, models, transaction
+
+ERC_ELEMENTS = ("who", "what", "when", "where")
+BATCH_SIZE = 1_000
+
+
+def metadata_from_text(text):
+    """A frozen copy of ark.utils.metadata_from_text."""
+    text = text.strip()
+    if not text:
+        return {}
+    try:
+        value = json.loads(text)
+    except json.JSONDecodeError:
+        value = None
+    if isinstance(value, dict):
+        return value
+    lines = text.splitlines()
+    if lines[0].strip().lower() == "erc:":
+        lines = lines[1:]
+    elements = {}
+    for line in lines:
+        label, colon, value = line.partition(":")
+        label = label.strip().lower()
+        if not colon or label not in ERC_ELEMENTS or label in elements:
+            return {"what": text}
+        elements[label] = value.strip()
+    return elements or {"what": text}
+
+
+def _convert(apps, source, target, convert, unconverted):
+    """Fill target from source, in keyset batches of the ARKs that need it.
+
+    Each batch commits on its own so the table isn't held in one long transaction.
+    Rows whose source is the unconverted value keep target's default.
+    """
+    Ark = apps.get_model("ark", "Ark")
+    arks = Ark.objects.exclude(**{source: unconverted}).order_by("ark")
+    after = ""
+    while True:
+        batch = list(arks.filter(ark__gt=after).only("ark", source)[:BATCH_SIZE])
+        if not batch:
+            return
+        for ark in batch:
+            setattr(ark, target, convert(getattr(ark, source)))
+        with transaction.atomic():
+            Ark.objects.bulk_update(batch, [target])
+        after = batch[-1].ark
+
+
+def text_to_json(apps, schema_editor):
+    _convert(apps, "metadata", "metadata_json", metadata_from_text, "")
+
+
+def json_to_text(apps, schema_editor):
+    _convert(apps, "metadata_json", "metadata", json.dumps, {})
+    _set_default_in_db(schema_editor, "''")
+
+
+def set_default_in_db(apps, schema_editor):
+    # As 0003 did for the text column, so that raw SQL imports get empty metadata
+    _set_default_in_db(schema_editor, "'{}'::jsonb")
+
+
+def drop_default_in_db(apps, schema_editor):
+    _set_default_in_db(schema_editor, None)
+
+
+def _set_default_in_db(schema_editor, default):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    action = "DROP DEFAULT" if default is None else f"SET DEFAULT {default}"
+    schema_editor.execute(f"ALTER TABLE ark_ark ALTER COLUMN metadata {action}")
+
+
+class Migration(migrations.Migration):
+    """Store ARK metadata as JSON.
+
+    Text metadata is parsed as a JSON object or an ERC record where it is one, and
+    kept as the ERC "what" element otherwise. Reversing stores the JSON as text.
+    """
+
+    atomic = False  # Convert in batches rather than one transaction over every ARK
+
+    dependencies = [
+        ("ark", "0008_ark_url_trigram_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="ark",
+            name="metadata_json",
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.RunPython(text_to_json, json_to_text),
+        migrations.RemoveField(
+            model_name="ark",
+            name="metadata",
+        ),
+        migrations.RenameField(
+            model_name="ark",
+            old_name="metadata_json",
+            new_name="metadata",
+        ),
+        migrations.RunPython(set_default_in_db, drop_default_in_db),
+    ]
@@ -0,0 +1,30 @@
+from django.db import migrations
+
+
+def add_index(apps, schema_editor):
+    # Metadata queries use jsonb containment (@>), which jsonb_path_ops indexes more
+    # compactly than the default jsonb_ops. Other databases scan the table.
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ark_ark_metadata_gin_idx "
+        "ON ark_ark USING gin (metadata jsonb_path_ops)"
+    )
+
+
+def remove_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("DROP INDEX CONCURRENTLY IF EXISTS ark_ark_metadata_gin_idx")
+
+
+class Migration(migrations.Migration):
+    atomic = False  # CREATE INDEX CONCURRENTLY can't run inside a transaction
+
+    dependencies = [
+        ("ark", "0009_ark_metadata_json"),
+    ]
+
+    operations = [
+        migrations.RunPython(add_index, remove_index),
+    ]
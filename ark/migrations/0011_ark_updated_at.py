@@ -0,0 +1,65 @@
+import django.utils.timezone
+from django.db import migrations, models
+
+INDEX = models.Index(fields=["naan", "updated_at"], name="ark_ark_naan_updated_idx")
+
+
+def set_default_in_db(apps, schema_editor):
+    # So that ARKs inserted with raw SQL, e.g. by ark_import, get a timestamp too
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(
+            "ALTER TABLE ark_ark ALTER COLUMN updated_at SET DEFAULT now()"
+        )
+
+
+def drop_default_in_db(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(
+            "ALTER TABLE ark_ark ALTER COLUMN updated_at DROP DEFAULT"
+        )
+
+
+def add_index(apps, schema_editor):
+    Ark = apps.get_model("ark", "Ark")
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.add_index(Ark, INDEX, concurrently=True)
+    else:
+        schema_editor.add_index(Ark, INDEX)
+
+
+def remove_index(apps, schema_editor):
+    Ark = apps.get_model("ark", "Ark")
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.remove_index(Ark, INDEX, concurrently=True)
+    else:
+        schema_editor.remove_index(Ark, INDEX)
+
+
+class Migration(migrations.Migration):
+    """Timestamp ARK changes.
+
+    Existing ARKs are stamped with the time of the migration. The constant default
+    doesn't rewrite the table on Postgres 11 and later.
+    """
+
+    atomic = False  # CREATE INDEX CONCURRENTLY can't run inside a transaction
+
+    dependencies = [
+        ("ark", "0010_ark_metadata_gin_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="ark",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True, default=django.utils.timezone.now
+            ),
+            preserve_default=False,
+        ),
+        migrations.RunPython(set_default_in_db, drop_default_in_db),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[migrations.AddIndex(model_name="ark", index=INDEX)],
+            database_operations=[migrations.RunPython(add_index, remove_index)],
+        ),
+    ]
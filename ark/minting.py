@@ -0,0 +1,371 @@
+"""Mint ARKs in bulk.
+
+mint_ark mints one ARK per request. For backfills, mint_arks mints many ARKs with a
+handful of multi-row INSERTs, only regenerating the NOIDs that collided.
+
+Shoulders in sequential minting mode map a per-shoulder counter through their NOID
+template instead of drawing random NOIDs. Each worker reserves a block of counter
+values with one UPDATE and hands them out from memory, so sequential minting doesn't
+collide and only writes to the Shoulder table once per block.
+
+Shoulders in pool minting mode claim ARKs that were minted ahead of time into the
+PoolArk table, checked for uniqueness when the pool was replenished, so minting them
+takes one DELETE and one INSERT on Postgres. Pooled ARKs created since are caught by
+the unique key and minted again.
+"""
+
+import logging
+import threading
+from collections import defaultdict
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, F
+
+from ark import resolver
+from ark.cache import shoulder_cache
+from ark.models import Ark, Naan, PoolArk, Shoulder
+from ark.utils import generate_noids, noid_check_digit, noid_from_counter
+
+logger = logging.getLogger(__name__)
+
+MAX_MINT_ATTEMPTS = 10
+NOID_LENGTH = 8
+# Keeps the number of query parameters well under the limits of every backend.
+QUERY_CHUNK_SIZE = 500
+
+# Claims up to a number of pooled ARKs of a NAAN and shoulder in one statement
+CLAIM_POOLED_ARKS_SQL = f"""
+DELETE FROM {PoolArk._meta.db_table} WHERE ark IN (
+    SELECT ark FROM {PoolArk._meta.db_table}
+    WHERE naan_id = %s AND shoulder = %s
+    LIMIT %s FOR UPDATE SKIP LOCKED
+) RETURNING ark
+"""
+
+
+class MintError(Exception):
+    """Raised when ARKs can't be minted, e.g. after too many collisions."""
+
+
+def mint_batch_max() -> int:
+    return getattr(settings, "ARKLET_MINT_BATCH_MAX", 10_000)
+
+
+def mint_block_size() -> int:
+    return getattr(settings, "ARKLET_MINT_BLOCK_SIZE", 100)
+
+
+def get_shoulder(naan: int, shoulder: str) -> Optional[Shoulder]:
+    """Find a shoulder's minting configuration, if it has one, without a query."""
+    cached = shoulder_cache.get((naan, shoulder))
+    if cached is None:
+        cached = (Shoulder.objects.filter(naan_id=naan, shoulder=shoulder).first(),)
+        shoulder_cache.set((naan, shoulder), cached)
+    return cached[0]
+
+
+def mint_arks(naan: Naan, mint_requests: Sequence[Dict]) -> List[Ark]:
+    """Mint one ARK per mint request, returning the ARKs in request order.
+
+    Each mint request is the cleaned_data of a MintArkForm. The caller is
+    responsible for checking that the requests belong to the given NAAN.
+    """
+    shoulders = {
+        shoulder: get_shoulder(naan.naan, shoulder)
+        for shoulder in {r["shoulder"] for r in mint_requests}
+    }
+    minted: List[Ark] = [None] * len(mint_requests)  # type: ignore
+    pending = list(range(len(mint_requests)))
+    collisions = 0
+    for _ in range(MAX_MINT_ATTEMPTS):
+        by_shoulder = defaultdict(list)
+        for i in pending:
+            by_shoulder[mint_requests[i]["shoulder"]].append(i)
+        candidates: Dict[str, int] = {}
+        # Pooled ARKs were checked against the Ark table when the pool was replenished
+        pooled: Set[str] = set()
+        for shoulder, indexes in by_shoulder.items():
+            shoulder_obj = shoulders[shoulder]
+            ark_strings = []
+            if shoulder_obj is not None and shoulder_obj.minting_mode == Shoulder.POOL:
+                ark_strings = claim_pooled_arks(shoulder_obj, len(indexes))
+                pooled.update(ark_strings)
+                if len(ark_strings) < len(indexes):
+                    logger.warning(
+                        "ARK pool for %s ran dry, minting randomly", shoulder_obj
+                    )
+            ark_strings += _new_ark_strings(
+                naan.naan, shoulder, shoulder_obj, len(indexes) - len(ark_strings)
+            )
+            for i, ark_string in zip(indexes, ark_strings):
+                if ark_string in candidates:
+                    collisions += 1
+                    continue
+                candidates[ark_string] = i
+
+        unchecked = [
+            ark_string for ark_string in candidates if ark_string not in pooled
+        ]
+        for ark_string in existing_arks(unchecked):
+            del candidates[ark_string]
+            collisions += 1
+
+        new_arks = [
+            _new_ark(naan, ark_string, mint_requests[i])
+            for ark_string, i in candidates.items()
+        ]
+        try:
+            with transaction.atomic():
+                Ark.objects.bulk_create(new_arks, batch_size=QUERY_CHUNK_SIZE)
+        except IntegrityError:
+            # Lost a race with another minter, try this whole round again.
+            collisions += len(new_arks)
+            continue
+        for ark in new_arks:
+            minted[candidates[ark.ark]] = ark
+        pending = [i for i in pending if minted[i] is None]
+        if not pending:
+            break
+
+    resolver.invalidate(ark.ark for ark in minted if ark is not None)
+    if pending:
+        msg = f"Gave up minting {len(pending)} ark(s) after {collisions} collision(s)"
+        logger.error(msg)
+        raise MintError(msg)
+    if collisions > 0:
+        logger.warning("%d arks created after %d collision(s)", len(minted), collisions)
+    return minted
+
+
+def _new_ark_strings(
+    naan: int, shoulder: str, shoulder_obj: Optional[Shoulder], count: int
+) -> List[str]:
+    """Generate count new ARKs, sequential or random as the shoulder mints them.
+
+    Pool minting shoulders get random ARKs, for when their pool runs dry.
+    """
+    ark_strings = []
+    if shoulder_obj is not None and shoulder_obj.minting_mode == Shoulder.SEQUENTIAL:
+        return [
+            _sequential_ark_string(naan, shoulder, shoulder_obj, value)
+            for value in next_sequence_values(shoulder_obj, count)
+        ]
+    for noid in generate_noids(count, NOID_LENGTH):
+        base_ark_string = f"{naan}{shoulder}{noid}"
+        ark_strings.append(f"{base_ark_string}{noid_check_digit(base_ark_string)}")
+    return ark_strings
+
+
+def _sequential_ark_string(
+    naan: int, shoulder: str, shoulder_obj: Shoulder, value: int
+) -> str:
+    template = shoulder_obj.template
+    try:
+        noid = noid_from_counter(value, template)
+    except ValueError as e:
+        raise MintError(f"Shoulder {shoulder_obj} is exhausted: {e}")
+    if not template.endswith("k"):
+        return f"{naan}{shoulder}{noid}"
+    base_ark_string = f"{naan}{shoulder}{noid}"
+    return f"{base_ark_string}{noid_check_digit(base_ark_string)}"
+
+
+# Shoulder pk -> (next counter value, end of this worker's reserved block)
+_sequence_blocks: Dict[int, Tuple[int, int]] = {}
+_sequence_blocks_lock = threading.Lock()
+
+
+def next_sequence_values(shoulder: Shoulder, count: int) -> List[int]:
+    """Take the next count counter values from this worker's block.
+
+    What the block lacks is reserved in one go, at least ARKLET_MINT_BLOCK_SIZE values
+    and enough for the whole batch. Values left in a block when a worker exits are
+    never used, leaving gaps in the sequence, as with Noid. The reservation commits
+    straight away unless called inside a transaction, in which case a rollback would
+    hand the block out twice.
+    """
+    with _sequence_blocks_lock:
+        next_value, end = _sequence_blocks.get(shoulder.pk, (0, 0))
+        values = list(range(next_value, min(end, next_value + count)))
+        next_value += len(values)
+        if len(values) < count:
+            needed = count - len(values)
+            next_value, end = _reserve_block(shoulder, max(needed, mint_block_size()))
+            values.extend(range(next_value, next_value + needed))
+            next_value += needed
+        _sequence_blocks[shoulder.pk] = (next_value, end)
+        return values
+
+
+def release_sequence_blocks() -> None:
+    """Forget this worker's reserved blocks, e.g. after the database is reset."""
+    with _sequence_blocks_lock:
+        _sequence_blocks.clear()
+
+
+def _reserve_block(shoulder: Shoulder, size: int) -> Tuple[int, int]:
+    with transaction.atomic():
+        Shoulder.objects.filter(pk=shoulder.pk).update(counter=F("counter") + size)
+        # The UPDATE holds the row lock, so this reads our own increment.
+        end = Shoulder.objects.values_list("counter", flat=True).get(pk=shoulder.pk)
+    return end - size, end
+
+
+def _new_ark(naan: Naan, ark_string: str, mint_request: Dict) -> Ark:
+    shoulder = mint_request["shoulder"]
+    return Ark(
+        ark=ark_string,
+        naan=naan,
+        shoulder=shoulder,
+        assigned_name=ark_string[len(f"{naan.naan}{shoulder}") :],
+        url=mint_request["url"],
+        metadata=mint_request["metadata"],
+        commitment=mint_request["commitment"],
+    )
+
+
+def existing_arks(ark_strings: List[str]) -> List[str]:
+    """Find which of the given ARKs are already in the Ark table."""
+    existing = []
+    for i in range(0, len(ark_strings), QUERY_CHUNK_SIZE):
+        chunk = ark_strings[i : i + QUERY_CHUNK_SIZE]
+        existing.extend(Ark.objects.filter(ark__in=chunk).values_list("ark", flat=True))
+    return existing
+
+
+def pool_low_water() -> int:
+    return getattr(settings, "ARKLET_POOL_LOW_WATER", 1_000)
+
+
+def pool_target() -> int:
+    return getattr(settings, "ARKLET_POOL_TARGET", 10_000)
+
+
+def claim_pooled_arks(shoulder: Shoulder, count: int) -> List[str]:
+    """Take up to count ARKs out of a shoulder's pool, returning their ARK strings.
+
+    Concurrent claims skip each other's locked rows instead of waiting on them. On
+    Postgres a claim is a single DELETE ... RETURNING. Claimed ARKs are gone from the
+    pool even if the caller then fails to create them.
+    """
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute(
+                CLAIM_POOLED_ARKS_SQL, [shoulder.naan_id, shoulder.shoulder, count]
+            )
+            claimed = [row[0] for row in cursor.fetchall()]
+    else:
+        with transaction.atomic():
+            pool = PoolArk.objects.filter(
+                naan_id=shoulder.naan_id, shoulder=shoulder.shoulder
+            )
+            if connection.features.has_select_for_update_skip_locked:
+                pool = pool.select_for_update(skip_locked=True)
+            claimed = list(pool.order_by().values_list("ark", flat=True)[:count])
+            PoolArk.objects.filter(ark__in=claimed).delete()
+    _count_claims(shoulder, len(claimed), short=len(claimed) < count)
+    return claimed
+
+
+def pool_depths() -> List[Dict]:
+    """Count the ARKs waiting in the pool of every pool minting shoulder."""
+    depths = {
+        (row["naan"], row["shoulder"]): row["depth"]
+        for row in PoolArk.objects.values("naan", "shoulder").annotate(
+            depth=Count("ark")
+        )
+    }
+    return [
+        {
+            "naan": shoulder.naan_id,
+            "shoulder": shoulder.shoulder,
+            "depth": depths.get((shoulder.naan_id, shoulder.shoulder), 0),
+        }
+        for shoulder in Shoulder.objects.filter(minting_mode=Shoulder.POOL)
+    ]
+
+
+def replenish_pool(shoulder: Shoulder, target: int) -> int:
+    """Mint random ARKs into a shoulder's pool until it holds target ARKs.
+
+    Returns the number of ARKs added.
+    """
+    pool = PoolArk.objects.filter(naan_id=shoulder.naan_id, shoulder=shoulder.shoulder)
+    added = 0
+    depth = pool.count()
+    for _ in range(MAX_MINT_ATTEMPTS):
+        needed = target - depth
+        if needed <= 0:
+            break
+        candidates = set(
+            _new_ark_strings(
+                shoulder.naan_id,
+                shoulder.shoulder,
+                None,
+                min(needed, QUERY_CHUNK_SIZE * 20),
+            )
+        )
+        candidates.difference_update(existing_arks(list(candidates)))
+        new_pool_arks = [
+            PoolArk(
+                ark=ark_string,
+                naan_id=shoulder.naan_id,
+                shoulder=shoulder.shoulder,
+                assigned_name=ark_string[len(f"{shoulder}") :],
+            )
+            for ark_string in candidates
+        ]
+        PoolArk.objects.bulk_create(
+            new_pool_arks, batch_size=QUERY_CHUNK_SIZE, ignore_conflicts=True
+        )
+        # ignore_conflicts doesn't say which rows were skipped, so count what's there
+        new_depth = pool.count()
+        added += max(0, new_depth - depth)
+        depth = new_depth
+    return added
+
+
+# Shoulder pk -> pooled ARKs claimed by this worker since its pool was last checked
+_pool_claims: Dict[int, int] = defaultdict(int)
+_pool_replenishers: Dict[int, threading.Thread] = {}
+_pool_lock = threading.Lock()
+
+
+def _count_claims(shoulder: Shoulder, claimed: int, short: bool) -> None:
+    """Start replenishing a shoulder's pool in the background if it may be running low.
+
+    Only when ARKLET_POOL_BACKGROUND_REPLENISH is set, otherwise run the
+    replenishpool management command periodically.
+    """
+    if not getattr(settings, "ARKLET_POOL_BACKGROUND_REPLENISH", False):
+        return
+    with _pool_lock:
+        _pool_claims[shoulder.pk] += claimed
+        if not short and _pool_claims[shoulder.pk] < max(1, pool_low_water() // 2):
+            return
+        _pool_claims[shoulder.pk] = 0
+        if shoulder.pk in _pool_replenishers:
+            return
+        thread = threading.Thread(
+            target=_replenish_in_background, args=(shoulder,), daemon=True
+        )
+        _pool_replenishers[shoulder.pk] = thread
+    thread.start()
+
+
+def _replenish_in_background(shoulder: Shoulder) -> None:
+    try:
+        pool = PoolArk.objects.filter(
+            naan_id=shoulder.naan_id, shoulder=shoulder.shoulder
+        )
+        if pool.count() < pool_low_water():
+            added = replenish_pool(shoulder, pool_target())
+            logger.info("Replenished ARK pool for %s with %d ARKs", shoulder, added)
+    except Exception:  # pylint: disable=broad-except
+        logger.exception("Failed to replenish ARK pool for %s", shoulder)
+    finally:
+        connection.close()
+        with _pool_lock:
+            del _pool_replenishers[shoulder.pk]
@@ -1,9 +1,12 @@
 import uuid
+from typing import Optional
 
 from django.contrib.auth.models import AbstractUser
 from django.core.exceptions import ValidationError
 from django.db import models
 
+from ark.utils import hash_key, key_prefix, validate_noid_template
+
 
 class Naan(models.Model):
     naan = models.PositiveBigIntegerField(primary_key=True)
@@ -23,19 +26,65 @@ class User(AbstractUser):
 
 
 class Key(models.Model):
-    key = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    """An access key for minting and binding ARKs under a NAAN.
+
+    Only a hash of the key is stored. The key itself is available as `key` on the
+    instance that created it and is never shown again.
+    """
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    prefix = models.CharField(max_length=8, db_index=True, editable=False)
+    key_hash = models.CharField(max_length=64, editable=False)
     naan = models.ForeignKey(Naan, on_delete=models.CASCADE)
     active = models.BooleanField()
 
+    key: Optional[str] = None
+
+    def save(self, *args, **kwargs):
+        if not self.key_hash:
+            self.key = str(uuid.uuid4())
+            self.prefix = key_prefix(self.key)
+            self.key_hash = hash_key(self.key)
+        super().save(*args, **kwargs)
+
     def __str__(self):
-        return f"Key-{self.naan.naan}-{self.key.hex[:8]}..."
+        return f"Key-{self.naan.naan}-{self.prefix}..."
 
 
 class Shoulder(models.Model):
+    RANDOM = "random"
+    SEQUENTIAL = "sequential"
+    POOL = "pool"
+    MINTING_MODES = [
+        (RANDOM, "Random NOIDs"),
+        (SEQUENTIAL, "Sequential NOIDs following the template"),
+        (POOL, "Random NOIDs claimed from a pre-minted pool"),
+    ]
+
     shoulder = models.CharField(max_length=50)
     naan = models.ForeignKey(Naan, on_delete=models.DO_NOTHING)
     name = models.CharField(max_length=200)
     description = models.TextField()
+    minting_mode = models.CharField(
+        max_length=20, choices=MINTING_MODES, default=RANDOM
+    )
+    template = models.CharField(
+        max_length=50,
+        default="eedeedk",
+        help_text='Noid-style mask for sequential minting, e.g. "eedeedk": '
+        "d digit, e betanumeric, trailing k check character.",
+    )
+    counter = models.PositiveBigIntegerField(
+        default=0,
+        editable=False,
+        help_text="Next sequence number to reserve for sequential minting.",
+    )
+
+    def clean(self):
+        try:
+            validate_noid_template(self.template)
+        except ValueError as e:
+            raise ValidationError({"template": str(e)})
 
     def __str__(self):
         return f"{self.naan.naan}{self.shoulder}"
@@ -47,8 +96,35 @@ class Ark(models.Model):
     shoulder = models.CharField(max_length=50, editable=False)
     assigned_name = models.CharField(max_length=100, editable=False)
     url = models.URLField(default="", blank=True)
-    metadata = models.TextField(default="", blank=True)
+    metadata = models.JSONField(default=dict, blank=True)
     commitment = models.TextField(default="", blank=True)
+    # Not updated by queryset.update() or bulk_update(), which must set it themselves
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Admin filters and exports page through a NAAN's or shoulder's ARKs in
+            # ARK order.
+            models.Index(
+                fields=["naan", "shoulder", "ark"], name="ark_ark_naan_shoulder_ark_idx"
+            ),
+            # Exports of what changed since a given time
+            models.Index(
+                fields=["naan", "updated_at"], name="ark_ark_naan_updated_idx"
+            ),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the URL as loaded, so that saves can tell if it was rebound
+        if "url" in field_names:
+            instance._loaded_url = instance.url
+        return instance
+
+    @property
+    def url_changed(self) -> bool:
+        return self.url != getattr(self, "_loaded_url", None)
 
     def clean(self):
         expected_ark = f"{self.naan.naan}{self.shoulder}{self.assigned_name}"
@@ -57,3 +133,21 @@ class Ark(models.Model):
 
     def __str__(self):
         return f"ark:/{self.ark}"
+
+
+class PoolArk(models.Model):
+    """An ARK minted ahead of time for a pool minting shoulder, waiting to be claimed.
+
+    Pool ARKs were unique among Arks and other PoolArks when the pool was replenished.
+    """
+
+    ark = models.CharField(primary_key=True, max_length=200, editable=False)
+    naan = models.ForeignKey(Naan, on_delete=models.DO_NOTHING, editable=False)
+    shoulder = models.CharField(max_length=50, editable=False)
+    assigned_name = models.CharField(max_length=100, editable=False)
+
+    class Meta:
+        indexes = [models.Index(fields=["naan", "shoulder"])]
+
+    def __str__(self):
+        return f"ark:/{self.ark}"
@@ -0,0 +1,107 @@
+"""An in-memory registry of NAAN -> resolver URL for resolver fallback redirects.
+
+resolve_ark redirects ARKs that aren't in our Ark table to the resolver of their NAAN.
+Looking that NAAN up in the database on every miss makes scrapers probing random ARKs
+cost two queries each, but the Naan table is tiny and rarely changes. The registry
+loads it once per worker and reloads it when a Naan is saved (see ark.signals) or
+after ARKLET_NAAN_REGISTRY_TTL seconds.
+
+ARKLET_NAAN_REGISTRY_SNAPSHOT can point at a copy of the global NAAN registry, in the
+ANVL format published by the ARK Alliance, so that ARKs under other organizations'
+NAANs redirect straight to their resolvers rather than via n2t.net. NAANs in our own
+Naan table take precedence over the snapshot.
+"""
+
+import logging
+import threading
+import time
+from functools import lru_cache
+from typing import Dict, Iterable, Optional
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from ark.models import Naan
+
+logger = logging.getLogger(__name__)
+
+
+class NaanRegistry:
+    def __init__(self):
+        self._urls: Dict[int, str] = {}
+        self._expires = 0.0
+        self._lock = threading.Lock()
+
+    def get(self, naan: int) -> Optional[str]:
+        """Find the URL of the resolver for a NAAN, without a trailing slash."""
+        if time.monotonic() >= self._expires:
+            self._load()
+        return self._urls.get(naan)
+
+    async def aget(self, naan: int) -> Optional[str]:
+        if time.monotonic() >= self._expires:
+            await sync_to_async(self._load)()
+        return self._urls.get(naan)
+
+    def invalidate(self) -> None:
+        self._expires = 0.0
+
+    def _load(self) -> None:
+        with self._lock:
+            if time.monotonic() < self._expires:
+                return  # another thread just loaded it
+            urls = dict(
+                load_snapshot(getattr(settings, "ARKLET_NAAN_REGISTRY_SNAPSHOT", ""))
+            )
+            urls.update(Naan.objects.values_list("naan", "url"))
+            self._urls = {naan: url.rstrip("/") for naan, url in urls.items()}
+            self._expires = time.monotonic() + getattr(
+                settings, "ARKLET_NAAN_REGISTRY_TTL", 300
+            )
+
+
+@lru_cache(maxsize=None)
+def load_snapshot(path: str) -> Dict[int, str]:
+    """Read NAAN -> resolver URL from a NAAN registry file, once per path."""
+    if not path:
+        return {}
+    try:
+        with open(path, encoding="utf-8") as f:
+            return parse_naan_registry(f)
+    except OSError as e:
+        logger.error("Couldn't read NAAN registry snapshot %s: %s", path, e)
+        return {}
+
+
+def parse_naan_registry(lines: Iterable[str]) -> Dict[int, str]:
+    """Parse the "naa:" records of an ANVL NAAN registry file.
+
+    Each record is a block of "name: value" lines starting with "naa:", where "what"
+    is the NAAN and "where" the organization's resolver URL. Other records, such as
+    shoulder delegations, and records without a usable URL are skipped.
+    """
+    urls: Dict[int, str] = {}
+    record: Dict[str, str] = {}
+    for line in list(lines) + [""]:
+        if not line.strip():
+            _add_record(urls, record)
+            record = {}
+        elif not line.startswith(("#", " ", "\t")):  # comments, continued values
+            name, _, value = line.partition(":")
+            record.setdefault(name.strip().lower(), value.strip())
+    return urls
+
+
+def _add_record(urls: Dict[int, str], record: Dict[str, str]) -> None:
+    if "naa" not in record:
+        return
+    try:
+        naan = int(record.get("what", ""))
+    except ValueError:
+        return
+    where = record.get("where", "")
+    if where.startswith(("http://", "https://")):
+        urls[naan] = where.rstrip("/")
+
+
+naan_registry = NaanRegistry()
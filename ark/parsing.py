@@ -0,0 +1,163 @@
+"""Parse and normalize ARKs, splitting them into NMA, NAAN, name and qualifier.
+
+Accepts "ark:/13960/t2abc" and the older "ark:13960/t2abc", optionally behind an NMA
+such as "https://n2t.net/", and splits off any qualifier: everything from the first
+"/" or "." after the base name, e.g. "/page/5.jp2". Hyphens are insignificant in ARKs
+and are stripped from the base name, but not from the qualifier, which is passed on
+to target URLs as it is.
+
+Parsers that know the shoulders in use, see ArkParser, also split the base name into
+its shoulder and blade, with a regular expression compiled once per NAAN. The rest is
+plain string methods, as in CPython each regular expression call costs more than the
+str.find and str.partition calls it would replace. Resolves use split_ark, which
+skips building a ParsedArk (see benchmarks/parse_ark.py).
+"""
+
+import re
+from typing import Dict, Iterable, Optional, Pattern, Tuple
+
+
+class ParsedArk:
+    """The parts of an ARK. Cheap to create, as parsing happens on every resolve."""
+
+    __slots__ = ("nma", "naan", "name", "qualifier", "shoulder")
+
+    def __init__(
+        self,
+        nma: str,
+        naan: int,
+        name: str,
+        qualifier: str = "",
+        shoulder: Optional[str] = None,
+    ):
+        self.nma = nma
+        self.naan = naan
+        self.name = name  # base name, without hyphens
+        self.qualifier = qualifier
+        self.shoulder = shoulder  # e.g. "/t2", None if unknown
+
+    @property
+    def key(self) -> str:
+        """The Ark primary key of the base object, e.g. "13960/t2abc"."""
+        return f"{self.naan}/{self.name}"
+
+    @property
+    def qualified_key(self) -> str:
+        """The Ark primary key of the ARK as given, qualifier included.
+
+        Component ARKs, e.g. "13960/t2abc/page", are Arks of their own, so updates must
+        look ARKs up by this rather than by key.
+        """
+        return f"{self.naan}/{self.name}{self.qualifier}"
+
+    @property
+    def blade(self) -> Optional[str]:
+        """The base name after the shoulder, None if the shoulder is unknown."""
+        if self.shoulder is None:
+            return None
+        return self.name[len(self.shoulder) - 1 :]
+
+    def __str__(self) -> str:
+        return f"ark:/{self.naan}/{self.name}{self.qualifier}"
+
+    def __repr__(self) -> str:
+        return f"<ParsedArk {self}>"
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, ParsedArk):
+            return NotImplemented
+        return all(
+            getattr(self, slot) == getattr(other, slot) for slot in self.__slots__
+        )
+
+
+class ArkParser:
+    """Parse ARKs, telling their shoulders apart if given (NAAN, shoulder) pairs.
+
+    Each NAAN's shoulders are compiled into one alternation, longest first, so that
+    "/fk" wins over "/f".
+    """
+
+    def __init__(self, shoulders: Iterable[Tuple[int, str]] = ()):
+        by_naan: Dict[int, list] = {}
+        for naan, shoulder in shoulders:
+            by_naan.setdefault(naan, []).append(shoulder)
+        self._shoulders: Dict[int, Pattern] = {
+            naan: re.compile(
+                "|".join(
+                    re.escape(shoulder[1:])
+                    for shoulder in sorted(set(naan_shoulders), key=len, reverse=True)
+                )
+            )
+            for naan, naan_shoulders in by_naan.items()
+        }
+
+    def parse(self, ark: str) -> ParsedArk:
+        """Parse an ARK, raising ValueError if it isn't one."""
+        ark = ark.strip()
+        label = ark.find("ark:")
+        if label < 0:
+            label = ark.lower().find("ark:")
+            if label < 0:
+                raise ValueError("Not a valid ARK")
+        naan_string, slash, name = ark[label + 4 :].lstrip("/").partition("/")
+        if not slash:
+            raise ValueError("Not a valid ARK")
+        try:
+            naan = int(naan_string)
+        except ValueError:
+            raise ValueError("ARK NAAN must be an integer")
+        name, qualifier = _split_qualifier(name)
+        if "-" in name:
+            name = name.replace("-", "")
+        if not name:
+            raise ValueError("Not a valid ARK")
+        shoulder = None
+        shoulders = self._shoulders.get(naan)
+        if shoulders is not None:
+            shoulder_match = shoulders.match(name)
+            if shoulder_match is not None:
+                shoulder = "/" + shoulder_match.group()
+        return ParsedArk(ark[:label], naan, name, qualifier, shoulder)
+
+
+# Parses without shoulder knowledge, for everything that only needs an ARK's key
+parse = ArkParser().parse
+
+
+def split_ark(ark: str) -> Tuple[int, str]:
+    """The NAAN and the base name followed by its qualifier, as parse would give.
+
+    For resolving, which doesn't need a ParsedArk or the NMA. Unless the base name
+    has hyphens, the qualifier is left where it is rather than split off, which
+    makes this cheaper than the legacy split-based parser. ARKs this can't take
+    apart as simply, such as "ARK:" or ones with surrounding whitespace, fall back
+    to parse.
+    """
+    naan_string, _, name = ark.partition("ark:")[2].lstrip("/").partition("/")
+    try:
+        naan = int(naan_string)
+    except ValueError:
+        naan = None
+    # name[:1] is "" if there's no name, which is also in "/."
+    if naan is None or name[:1] in "/." or name[-1].isspace():
+        parsed = parse(ark)
+        return parsed.naan, parsed.name + parsed.qualifier
+    if "-" in name:
+        name, qualifier = _split_qualifier(name)
+        name = name.replace("-", "")
+        if not name:
+            raise ValueError("Not a valid ARK")
+        name += qualifier
+    return naan, name
+
+
+def _split_qualifier(name: str) -> Tuple[str, str]:
+    # The qualifier starts at the first "/" or "."
+    end = name.find("/")
+    dot = name.find(".")
+    if dot >= 0 and not 0 <= end < dot:
+        end = dot
+    if end < 0:
+        return name, ""
+    return name[:end], name[end:]
@@ -0,0 +1,186 @@
+"""Tell caching proxies in front of arklet to forget resolves of rebound ARKs.
+
+Resolve responses carry Cache-Control headers (see ark.resolver.cache_max_age), so a
+reverse proxy can answer repeat resolves itself. When an ARK's URL changes, the
+purger named by ARKLET_PURGER is asked to drop the cached redirects. The default
+purger does nothing, which is only safe with short max ages. HTTPPurger sends PURGE
+requests, as understood by Varnish, nginx and Squid, to the proxy at
+ARKLET_PURGE_URL.
+
+Purges are queued once the change is committed (see ark.signals and ark.binding) and
+sent by a background thread per worker, up to PURGE_BATCH_SIZE ARKs at a time, so
+that a slow proxy doesn't hold up the requests that change ARKs. With read replicas,
+they are queued again after the replica lag bound, see ark.replicas. They are best
+effort: failures are logged, and purges queued when a worker exits, or beyond
+PURGE_QUEUE_SIZE, are lost.
+
+Resolves of qualified ARKs, e.g. ark:/13960/t2abc/page/5, can't be listed and expire
+after ARKLET_CACHE_BOUND_MAX_AGE. New ARKs aren't purged, any fallback redirects
+cached for them before they existed expire after ARKLET_CACHE_NAAN_MAX_AGE or
+ARKLET_CACHE_N2T_MAX_AGE.
+"""
+
+import atexit
+import http.client
+import logging
+import os
+import threading
+import urllib.parse
+from collections import deque
+from functools import lru_cache
+from typing import Deque, Iterable, List, Optional
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import import_string
+
+from ark.replicas import after_replica_lag
+
+logger = logging.getLogger(__name__)
+
+# The URLs resolve_ark answers for an ARK, as formatted with ark="naan/name".
+# Inflected resolves aren't listed, their responses are always revalidated.
+PURGE_PATHS = (
+    "/ark:/{ark}",
+    "/ark:{ark}",
+    "/resolve/ark:/{ark}",
+    "/resolve/ark:{ark}",
+)
+
+PURGE_BATCH_SIZE = 100
+PURGE_QUEUE_SIZE = 100_000
+
+
+class Purger:
+    """Interface for purging cached resolves, configured with ARKLET_PURGER."""
+
+    def purge(self, arks: List[str]) -> None:
+        """Purge the resolves of ARKs given as "naan/name"."""
+        raise NotImplementedError
+
+
+class NoopPurger(Purger):
+    """For deployments without a caching proxy, or ones that rely on max ages."""
+
+    def purge(self, arks: List[str]) -> None:
+        pass
+
+
+class HTTPPurger(Purger):
+    """Send a PURGE request per cached URL to the proxy at ARKLET_PURGE_URL.
+
+    ARKLET_PURGE_HOST sets the Host header, for proxies that cache by the public host
+    name rather than the one they are reached at for purging.
+    """
+
+    def __init__(self):
+        url = getattr(settings, "ARKLET_PURGE_URL", "")
+        if not url:
+            raise ImproperlyConfigured("HTTPPurger needs ARKLET_PURGE_URL")
+        parts = urllib.parse.urlsplit(url)
+        self.scheme = parts.scheme
+        self.netloc = parts.netloc
+        self.prefix = parts.path.rstrip("/")
+        self.host = getattr(settings, "ARKLET_PURGE_HOST", "") or parts.netloc
+        self.timeout = getattr(settings, "ARKLET_PURGE_TIMEOUT", 2.0)
+
+    def purge(self, arks: List[str]) -> None:
+        connection_class = (
+            http.client.HTTPSConnection
+            if self.scheme == "https"
+            else http.client.HTTPConnection
+        )
+        connection = connection_class(self.netloc, timeout=self.timeout)
+        try:
+            for ark in arks:
+                for path in PURGE_PATHS:
+                    connection.request(
+                        "PURGE",
+                        self.prefix
+                        + urllib.parse.quote(path.format(ark=ark), safe="/:"),
+                        headers={"Host": self.host},
+                    )
+                    response = connection.getresponse()
+                    response.read()
+                    # Proxies answer 404 for URLs they don't have cached
+                    if response.status >= 400 and response.status != 404:
+                        logger.warning(
+                            "PURGE %s got %s", path.format(ark=ark), response.status
+                        )
+        finally:
+            connection.close()
+
+
+@lru_cache(maxsize=None)
+def get_purger() -> Purger:
+    return import_string(getattr(settings, "ARKLET_PURGER", "ark.purge.NoopPurger"))()
+
+
+class PurgeQueue:
+    """ARKs waiting to be purged, and the background thread that purges them."""
+
+    def __init__(self):
+        self._arks: Deque[str] = deque()
+        self._sending = False
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+
+    def put(self, arks: List[str]) -> None:
+        with self._condition:
+            if len(self._arks) + len(arks) > PURGE_QUEUE_SIZE:
+                logger.warning("Purge queue full, dropped %d ARK(s)", len(arks))
+                return
+            self._arks.extend(arks)
+            # Forked workers don't inherit their parent's thread
+            if self._thread is None or self._pid != os.getpid():
+                self._thread = threading.Thread(
+                    target=self._run, name="arklet-purge", daemon=True
+                )
+                self._pid = os.getpid()
+                self._thread.start()
+            self._condition.notify_all()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every queued purge was sent, returning False on timeout."""
+        with self._condition:
+            return self._condition.wait_for(
+                lambda: not self._arks and not self._sending, timeout
+            )
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._arks)
+                batch = []
+                while self._arks and len(batch) < PURGE_BATCH_SIZE:
+                    batch.append(self._arks.popleft())
+                self._sending = True
+            try:
+                _send(list(dict.fromkeys(batch)))
+            finally:
+                with self._condition:
+                    self._sending = False
+                    self._condition.notify_all()
+
+
+purge_queue = PurgeQueue()
+# Give purges queued by a worker that is shutting down a moment to go out
+atexit.register(purge_queue.flush, 5)
+
+
+def purge(arks: Iterable[str]) -> None:
+    """Purge cached resolves of ARKs in the background."""
+    arks = list(arks)
+    if arks and not isinstance(get_purger(), NoopPurger):
+        purge_queue.put(arks)
+        # Proxies may cache the old redirect again from a lagging read replica
+        after_replica_lag(lambda: purge_queue.put(arks))
+
+
+def _send(arks: List[str]) -> None:
+    """Purge cached resolves of ARKs, logging rather than raising errors."""
+    try:
+        get_purger().purge(arks)
+    except Exception:  # pylint: disable=broad-except
+        logger.exception("Couldn't purge %d ARK(s) from the cache", len(arks))
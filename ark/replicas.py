@@ -0,0 +1,276 @@
+"""Send read-only requests to read replicas of the primary database.
+
+Replicas are configured with ARKLET_POSTGRES_REPLICA_HOSTS, see arklet/settings.py,
+which also installs ReplicaRouter and replica_pin_middleware. Reads made while
+serving a request go to the replicas in turn, skipping any that failed their last
+health check. Everything else goes to the primary ("default") database:
+
+- writes, and every query of a request after its first write
+- requests with unsafe methods such as POST and PUT, which mint and bind ARKs
+- requests from clients that wrote less than ARKLET_REPLICA_PIN_SECONDS ago, so that
+  they read their own writes despite replication lag. Clients are recognized by a
+  cookie, or, within the same worker, by their access key.
+- queries made outside of requests, by management commands and background threads
+
+Replicas are checked with a "SELECT 1" at most every ARKLET_REPLICA_CHECK_INTERVAL
+seconds per worker. Only the primary is migrated.
+
+ARKLET_REPLICA_PIN_SECONDS also bounds how far replicas are expected to lag behind.
+A resolve that reads a lagging replica right after an ARK changed would cache the old
+outcome again, so caches and proxies are told to forget changed ARKs a second time
+once that bound has passed, see after_replica_lag.
+"""
+
+import asyncio
+import hashlib
+import heapq
+import itertools
+import logging
+import os
+import threading
+import time
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from django.utils.decorators import sync_and_async_middleware
+
+from ark.cache import replica_pin_cache
+
+logger = logging.getLogger(__name__)
+
+PIN_COOKIE = "arklet_primary"
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+class RequestPin:
+    """Whether the current request must use the primary, and whether it wrote."""
+
+    __slots__ = ("pinned", "wrote")
+
+    def __init__(self, pinned: bool):
+        self.pinned = pinned
+        self.wrote = False
+
+
+# Mutated rather than set while serving a request, so that writes made in threads
+# running sync_to_async, which get a copy of the context, are seen by the middleware.
+_request_pin: "ContextVar[Optional[RequestPin]]" = ContextVar(
+    "arklet_request_pin", default=None
+)
+
+
+def check_replica(alias: str) -> bool:
+    """Whether a replica answers queries."""
+    try:
+        with connections[alias].cursor() as cursor:
+            cursor.execute("SELECT 1")
+        return True
+    except DatabaseError:
+        logger.warning("Replica %s failed its health check", alias, exc_info=True)
+        connections[alias].close()
+        return False
+
+
+class ReplicaRouter:
+    """Route reads made while serving requests to healthy replicas, round-robin."""
+
+    def __init__(self, replicas: Optional[List[str]] = None):
+        if replicas is None:
+            replicas = getattr(settings, "ARKLET_DATABASE_REPLICAS", [])
+        self.replicas = list(replicas)
+        self.check_interval = getattr(settings, "ARKLET_REPLICA_CHECK_INTERVAL", 10)
+        self._next_replica = itertools.cycle(self.replicas)
+        self._health: Dict[str, Tuple[float, bool]] = {}  # alias -> (checked, healthy)
+
+    def db_for_read(self, model, **hints) -> str:
+        pin = _request_pin.get()
+        if pin is None or pin.pinned or not self.replicas:
+            return DEFAULT_DB_ALIAS
+        for _ in self.replicas:
+            alias = next(self._next_replica)
+            if self._healthy(alias):
+                return alias
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints) -> str:
+        pin = _request_pin.get()
+        if pin is not None:
+            pin.pinned = pin.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints) -> Optional[bool]:
+        # Replicas hold the same rows as the primary
+        databases = {DEFAULT_DB_ALIAS, *self.replicas}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, **hints) -> Optional[bool]:
+        return False if db in self.replicas else None
+
+    def _healthy(self, alias: str) -> bool:
+        now = time.monotonic()
+        checked, healthy = self._health.get(alias, (float("-inf"), True))
+        if now - checked < self.check_interval:
+            return healthy
+        # Keep other threads on the last result while this one checks
+        self._health[alias] = (now, healthy)
+        healthy = check_replica(alias)
+        self._health[alias] = (now, healthy)
+        return healthy
+
+
+class DelayedCalls:
+    """Functions to call after a delay, and the background thread that calls them."""
+
+    def __init__(self):
+        self._calls: List[Tuple[float, int, Callable[[], None]]] = []  # a heap
+        self._sequence = itertools.count()  # keeps calls due at once in order
+        self._calling = False
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+
+    def call_later(self, delay: float, func: Callable[[], None]) -> None:
+        with self._condition:
+            due = time.monotonic() + delay
+            heapq.heappush(self._calls, (due, next(self._sequence), func))
+            # Forked workers don't inherit their parent's thread
+            if self._thread is None or self._pid != os.getpid():
+                self._thread = threading.Thread(
+                    target=self._run, name="arklet-delayed-calls", daemon=True
+                )
+                self._pid = os.getpid()
+                self._thread.start()
+            self._condition.notify_all()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every call was made, returning False on timeout."""
+        with self._condition:
+            return self._condition.wait_for(
+                lambda: not self._calls and not self._calling, timeout
+            )
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while not self._calls or self._calls[0][0] > time.monotonic():
+                    self._condition.wait(
+                        self._calls[0][0] - time.monotonic() if self._calls else None
+                    )
+                _, _, func = heapq.heappop(self._calls)
+                self._calling = True
+            try:
+                func()
+            except Exception:  # pylint: disable=broad-except
+                logger.exception("Delayed call to %r failed", func)
+            finally:
+                with self._condition:
+                    self._calling = False
+                    self._condition.notify_all()
+
+
+delayed_calls = DelayedCalls()
+
+
+def after_replica_lag(func: Callable[[], None]) -> None:
+    """Call func once read replicas should have replayed what was just committed.
+
+    Waits ARKLET_REPLICA_PIN_SECONDS, in the background. Does nothing without replicas.
+    """
+    if getattr(settings, "ARKLET_DATABASE_REPLICAS", []):
+        pin_seconds = getattr(settings, "ARKLET_REPLICA_PIN_SECONDS", 10)
+        delayed_calls.call_later(pin_seconds, func)
+
+
+@sync_and_async_middleware
+def replica_pin_middleware(get_response):
+    """Decide per request whether it may read from replicas, see the module docstring.
+
+    Must come first in MIDDLEWARE, so that writes by other middleware, such as saving
+    sessions, count as the request's writes.
+    """
+    if asyncio.iscoroutinefunction(get_response):
+
+        async def middleware(request):
+            pin = _request_pin_for(request)
+            token = _request_pin.set(pin)
+            try:
+                response = await get_response(request)
+            finally:
+                _request_pin.reset(token)
+            return _remember_writes(request, response, pin)
+
+    else:
+
+        def middleware(request):
+            pin = _request_pin_for(request)
+            token = _request_pin.set(pin)
+            try:
+                response = get_response(request)
+            finally:
+                _request_pin.reset(token)
+            return _remember_writes(request, response, pin)
+
+    return middleware
+
+
+def _request_pin_for(request) -> RequestPin:
+    if request.method not in SAFE_METHODS or PIN_COOKIE in request.COOKIES:
+        return RequestPin(pinned=True)
+    key = _key_hash(request)
+    return RequestPin(pinned=key is not None and replica_pin_cache.get(key, False))
+
+
+def _remember_writes(request, response, pin: RequestPin):
+    if response.streaming and request.method not in SAFE_METHODS:
+        # Streamed content, such as NDJSON batch updates, is written after this
+        # returns, once the headers are sent, so the cookie can't wait for its writes.
+        _set_pin_cookie(response)
+        response.streaming_content = _pinned_content(
+            request, response.streaming_content, pin
+        )
+    elif pin.wrote:
+        _set_pin_cookie(response)
+        _pin_key(request)
+    return response
+
+
+def _pinned_content(request, content, pin: RequestPin):
+    """Stream content with the request's pin set, as the middleware has returned."""
+    iterator = iter(content)
+    try:
+        while True:
+            token = _request_pin.set(pin)
+            try:
+                chunk = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                _request_pin.reset(token)
+            yield chunk
+    finally:
+        if pin.wrote:
+            _pin_key(request)
+
+
+def _set_pin_cookie(response):
+    pin_seconds = getattr(settings, "ARKLET_REPLICA_PIN_SECONDS", 10)
+    response.set_cookie(
+        PIN_COOKIE, "1", max_age=pin_seconds, httponly=True, samesite="Lax"
+    )
+
+
+def _pin_key(request):
+    key = _key_hash(request)
+    if key is not None:
+        replica_pin_cache.set(key, True)
+
+
+def _key_hash(request) -> Optional[str]:
+    authorization = request.headers.get("Authorization")
+    if not authorization:
+        return None
+    return hashlib.sha256(authorization.encode("utf-8")).hexdigest()
@@ -0,0 +1,176 @@
+"""Look up where an ARK should resolve to.
+
+Requested ARKs may carry a qualifier, e.g. ark:/13960/t2abc/page/5.jp2. They resolve
+by the longest ARK here that is a prefix of them ending at a "/" or "." boundary, the
+base object or a bound component, with the rest of the request appended to its URL.
+All candidate prefixes are looked up in one query.
+
+Resolution outcomes are cached per ARK in ark.cache.resolve_cache, per worker or
+shared by all workers on the host, and invalidated with invalidate() whenever an Ark
+changes, or by the signal handlers in ark.signals whenever a Naan does. Qualified
+requests are answered from the cache once every candidate longer than the match is
+cached as not being here, so creating a component ARK is picked up as soon as its
+own entry is invalidated.
+"""
+
+import re
+from typing import Iterable, List, NamedTuple, Optional, Tuple
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.db.models.functions import Length
+
+from ark.cache import resolve_cache
+from ark.models import Ark
+from ark.naan_registry import naan_registry
+from ark.replicas import after_replica_lag
+
+N2T_RESOLVER = "https://n2t.net"
+
+# Resolution kinds
+BOUND = "bound"  # the ARK exists here and has a URL bound to it
+UNBOUND = "unbound"  # the ARK exists here but has no URL yet
+NAAN = "naan"  # the ARK isn't here but we know its NAAN's resolver, redirect there
+N2T = "n2t"  # we know nothing about this ARK, let n2t.net try
+
+
+# Where qualifiers split requested ARKs into candidate prefixes
+QUALIFIER_BOUNDARY = re.compile(r"(?<=.)[/.]")
+
+# Resolution kind -> (setting, default) for how long shared caches may keep the response
+CACHE_MAX_AGE_SETTINGS = {
+    BOUND: ("ARKLET_CACHE_BOUND_MAX_AGE", 300),
+    UNBOUND: ("ARKLET_CACHE_NOT_FOUND_MAX_AGE", 60),
+    NAAN: ("ARKLET_CACHE_NAAN_MAX_AGE", 3_600),
+    N2T: ("ARKLET_CACHE_N2T_MAX_AGE", 3_600),
+}
+
+
+class Resolution(NamedTuple):
+    kind: str
+    url: str = ""
+
+
+def resolve(naan: int, name: str) -> Resolution:
+    """Resolve the ARK naan/name, where name may end in a qualifier."""
+    candidates = qualifier_candidates(name)
+    resolution = _cached(naan, name, candidates)
+    if resolution is not None:
+        return resolution
+    match = longest_match(naan, candidates).values_list("ark", "url").first()
+    naan_url = naan_registry.get(naan) if _needs_fallback(naan, name, match) else None
+    return _learn(naan, name, candidates, match, naan_url)
+
+
+async def aresolve(naan: int, name: str) -> Resolution:
+    """Like resolve(), but without blocking the event loop on the database."""
+    candidates = qualifier_candidates(name)
+    resolution = _cached(naan, name, candidates)
+    if resolution is not None:
+        return resolution
+    matches = longest_match(naan, candidates).values_list("ark", "url")
+    if hasattr(matches, "afirst"):  # Django 4.1+
+        match = await matches.afirst()
+    else:
+        match = await sync_to_async(matches.first)()
+    naan_url = (
+        await naan_registry.aget(naan) if _needs_fallback(naan, name, match) else None
+    )
+    return _learn(naan, name, candidates, match, naan_url)
+
+
+def invalidate(keys: Iterable[str]) -> None:
+    """Forget cached resolutions of ARKs, given as "naan/name", that are changing.
+
+    Call before the change commits. The keys are dropped again once it commits, as a
+    concurrent resolve may re-cache the old outcome meanwhile, and once more after the
+    replica lag bound, in case a resolve re-cached it from a lagging replica.
+    """
+    keys = list(keys)
+    resolve_cache.invalidate_many(keys)
+    transaction.on_commit(lambda: _invalidate_committed(keys))
+
+
+def _invalidate_committed(keys: List[str]) -> None:
+    resolve_cache.invalidate_many(keys)
+    after_replica_lag(lambda: resolve_cache.invalidate_many(keys))
+
+
+def qualifier_candidates(name: str) -> List[str]:
+    """The prefixes of name that could be ARKs here, longest first.
+
+    "t2abc/page/5.jp2" gives "t2abc/page/5.jp2", "t2abc/page/5", "t2abc/page" and
+    "t2abc".
+    """
+    ends = [m.start() for m in QUALIFIER_BOUNDARY.finditer(name)]
+    return [name] + [name[:end] for end in reversed(ends)]
+
+
+def _cached(naan: int, name: str, candidates: List[str]) -> Optional[Resolution]:
+    resolutions = []
+    for candidate in candidates:
+        cached = resolve_cache.get(f"{naan}/{candidate}")
+        if cached is None:
+            return None  # a longer ARK may exist, ask the database
+        resolution = Resolution(*cached)
+        if resolution.kind in (BOUND, UNBOUND):
+            return _qualified(resolution, name[len(candidate) :])
+        resolutions.append(resolution)
+    return resolutions[0]  # none of them is here, fall back for the whole ARK
+
+
+def longest_match(naan: int, candidates: List[str]):
+    """The ARKs here among candidates, as from qualifier_candidates, longest first."""
+    return Ark.objects.filter(ark__in=[f"{naan}/{c}" for c in candidates]).order_by(
+        Length("ark").desc()
+    )
+
+
+def _needs_fallback(naan: int, name: str, match: Optional[Tuple[str, str]]) -> bool:
+    # Candidates longer than the match are cached with their fallback resolution
+    return match is None or match[0] != f"{naan}/{name}"
+
+
+def _learn(
+    naan: int,
+    name: str,
+    candidates: List[str],
+    match: Optional[Tuple[str, str]],
+    naan_url: Optional[str],
+) -> Resolution:
+    """Cache what the query taught us about each candidate and resolve name."""
+    for candidate in candidates:
+        key = f"{naan}/{candidate}"
+        if match is not None and key == match[0]:
+            resolution = _bound(match[1])
+            resolve_cache.set(key, resolution)
+            return _qualified(resolution, name[len(candidate) :])
+        resolve_cache.set(key, _fallback(naan, candidate, naan_url))
+    return _fallback(naan, name, naan_url)
+
+
+def _qualified(resolution: Resolution, qualifier: str) -> Resolution:
+    if resolution.kind != BOUND or not qualifier:
+        return resolution
+    return Resolution(BOUND, resolution.url + qualifier)
+
+
+def _bound(url: str) -> Resolution:
+    return Resolution(BOUND, url) if url else Resolution(UNBOUND)
+
+
+def _fallback(naan: int, name: str, naan_url: Optional[str]) -> Resolution:
+    if naan_url:
+        return Resolution(NAAN, f"{naan_url}/ark:/{naan}/{name}")
+    # TODO: more robust resolver URL creation
+    return Resolution(N2T, f"{N2T_RESOLVER}/ark:/{naan}/{name}")
+
+
+def cache_max_age(kind: str) -> int:
+    """Seconds a caching proxy may serve a resolution of this kind without asking.
+
+    Bound redirects can be cached for long if a purger is configured, see ark.purge.
+    """
+    name, default = CACHE_MAX_AGE_SETTINGS[kind]
+    return getattr(settings, name, default)
@@ -0,0 +1,43 @@
+"""Search ARKs by ARK prefix, by part of their URL or by metadata.
+
+All searches are indexed on Postgres: ARK prefixes by the pattern ops index on the ark
+primary key, URL substrings by the pg_trgm index added in migration 0008 and metadata
+by the GIN index added in migration 0010.
+"""
+
+import re
+
+from django.db import connections
+from django.db.models import QuerySet
+from django.db.models.fields.json import KeyTransform
+
+# Search terms that look like an ARK, e.g. "ark:/13960/t2bc" or "13960/t2bc"
+ARK_TERM = re.compile(r"^(ark:/?)?\d+/")
+
+
+def search_arks(queryset: QuerySet, term: str) -> QuerySet:
+    """Filter ARKs whose ARK starts with the term if it looks like an ARK, or whose
+    URL contains the term otherwise.
+    """
+    term = term.strip()
+    if not term:
+        return queryset
+    match = ARK_TERM.match(term)
+    if match:
+        return queryset.filter(ark__startswith=term[len(match.group(1) or "") :])
+    return queryset.filter(url__icontains=term)
+
+
+def filter_metadata(queryset: QuerySet, key: str, value: str) -> QuerySet:
+    """Filter ARKs whose metadata has the value under the key.
+
+    On Postgres this is a jsonb containment query, elsewhere the key is extracted
+    from every row's metadata and compared.
+    """
+    if connections[queryset.db].vendor == "postgresql":
+        return queryset.filter(metadata__contains={key: value})
+    # A KeyTransform rather than metadata__<key>, which would read "__" in keys as
+    # nested keys or lookups.
+    return queryset.alias(metadata_value=KeyTransform(key, "metadata")).filter(
+        metadata_value=value
+    )
@@ -0,0 +1,72 @@
+"""Signal handlers that keep Arklet's caches consistent with the database.
+
+Connected in ArkConfig.ready(). These run for Ark.save() from update_ark, the admin and
+anywhere else, but not for queryset.update() or bulk operations, which must invalidate
+the caches themselves.
+"""
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from ark import resolver
+from ark.cache import key_cache, resolve_cache, shoulder_cache
+from ark.models import Ark, Key, Naan, Shoulder
+from ark.naan_registry import naan_registry
+from ark.purge import purge
+from ark.replicas import after_replica_lag
+
+
+@receiver(post_save, sender=Ark)
+@receiver(post_delete, sender=Ark)
+def invalidate_resolved_ark(sender, instance, **kwargs):
+    resolver.invalidate([instance.ark])
+
+
+@receiver(post_save, sender=Ark)
+def purge_rebound_ark(sender, instance, created, **kwargs):
+    # New ARKs have no cached redirects yet, and saving an ARK without changing its
+    # URL leaves its cached redirects valid
+    rebound = not created and instance.url_changed
+    instance._loaded_url = instance.url
+    if rebound:
+        key = instance.ark
+        transaction.on_commit(lambda: purge([key]))
+
+
+@receiver(post_delete, sender=Ark)
+def purge_deleted_ark(sender, instance, **kwargs):
+    key = instance.ark
+    transaction.on_commit(lambda: purge([key]))
+
+
+@receiver(post_save, sender=Naan)
+@receiver(post_delete, sender=Naan)
+def invalidate_naan_fallbacks(sender, instance, **kwargs):
+    # Cached NAAN fallback redirects embed the NAAN's URL, and Naans rarely change.
+    naan_registry.invalidate()
+    resolve_cache.clear()
+    transaction.on_commit(naan_registry.invalidate)
+    transaction.on_commit(resolve_cache.clear)
+    transaction.on_commit(lambda: after_replica_lag(_reload_naans))
+    key_cache.clear()
+
+
+def _reload_naans():
+    # In case the registry was reloaded from a replica that lagged behind
+    naan_registry.invalidate()
+    resolve_cache.clear()
+
+
+@receiver(post_save, sender=Shoulder)
+@receiver(post_delete, sender=Shoulder)
+def invalidate_shoulder(sender, instance, **kwargs):
+    shoulder_cache.clear()
+
+
+@receiver(post_save, sender=Key)
+@receiver(post_delete, sender=Key)
+def invalidate_keys(sender, instance, **kwargs):
+    # Also drops cached unknown keys, in case this key was looked up before it existed.
+    key_cache.clear()
+    transaction.on_commit(key_cache.clear)
@@ -1,43 +1,181 @@
-from typing import Tuple
-
+import hashlib
+import json
+import operator
 import secrets
+import uuid
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from ark.parsing import parse
 
 BETANUMERIC = "0123456789bcdfghjkmnpqrstvwxz"
 
 
+# Byte value -> score in the check digit algorithm, 0 for characters not in BETANUMERIC
+_CHECK_SCORES = bytes(
+    BETANUMERIC.find(chr(byte)) if chr(byte) in BETANUMERIC else 0
+    for byte in range(256)
+)
+
+
 def noid_check_digit(noid: str) -> str:
     """Calculate the check digit for an ARK.
 
     See: https://metacpan.org/dist/Noid/view/noid#NOID-CHECK-DIGIT-ALGORITHM
     """
-    total = 0
-    for pos, char in enumerate(noid, start=1):
-        score = BETANUMERIC.find(char)
-        if score > 0:
-            total += pos * score
+    if noid.isascii():
+        # Score every character at once with a lookup table, then weigh the scores
+        scores = noid.encode("ascii").translate(_CHECK_SCORES)
+        total = sum(map(operator.mul, scores, range(1, len(scores) + 1)))
+    else:
+        total = 0
+        for pos, char in enumerate(noid, start=1):
+            score = BETANUMERIC.find(char)
+            if score > 0:
+                total += pos * score
     remainder = total % 29  # 29 == len(BETANUMERIC)
-    return BETANUMERIC[remainder]  # IndexError may be long ARK
+    return BETANUMERIC[remainder]
 
 
 def generate_noid(length: int) -> str:
-    return "".join(secrets.choice(BETANUMERIC) for _ in range(length))
+    return generate_noids(1, length)[0]
+
+
+def generate_noids(
+    count: int, length: int, first_chars: str = BETANUMERIC
+) -> List[str]:
+    """Generate count random NOIDs, drawing their first character from first_chars.
+
+    The randomness for a whole batch comes from a few large secrets.token_bytes calls
+    rather than a secrets.choice call per character.
+    """
+    if length < 1:
+        raise ValueError("NOIDs must be at least one character long")
+    firsts = _random_chars(first_chars, count)
+    rest = _random_chars(BETANUMERIC, count * (length - 1))
+    step = length - 1
+    return [firsts[i] + rest[i * step : (i + 1) * step] for i in range(count)]
+
+
+@lru_cache(maxsize=None)
+def _byte_tables(alphabet: str) -> Tuple[bytes, bytes]:
+    """A bytes.translate table mapping bytes onto alphabet, and the bytes to reject.
+
+    Bytes at or above the largest multiple of len(alphabet) that fits in a byte are
+    rejected, so that every character is equally likely.
+    """
+    accepted = 256 - 256 % len(alphabet)
+    table = bytes(ord(alphabet[byte % len(alphabet)]) for byte in range(accepted))
+    return table + bytes(256 - accepted), bytes(range(accepted, 256))
+
+
+def _random_chars(alphabet: str, count: int) -> str:
+    """count characters drawn uniformly from an ASCII alphabet, by rejection sampling."""
+    table, rejected = _byte_tables(alphabet)
+    # Draw a little more than the expected need, so one read is almost always enough
+    acceptance = (256 - len(rejected)) / 256
+    chars = b""
+    while len(chars) < count:
+        needed = count - len(chars)
+        draw = int(needed / acceptance * 1.05) + 16
+        chars += secrets.token_bytes(draw).translate(table, rejected)
+    return chars[:count].decode("ascii")
+
+
+TEMPLATE_RADIX = {"d": 10, "e": len(BETANUMERIC)}
+
+
+def validate_noid_template(template: str) -> None:
+    """Check a Noid-style mask such as "eedeedk".
+
+    "d" is a digit, "e" a betanumeric character and an optional trailing "k" a check
+    character. The other Noid template features (generator types, "z" masks) aren't
+    supported.
+    """
+    mask = template[:-1] if template.endswith("k") else template
+    if not mask or any(char not in TEMPLATE_RADIX for char in mask):
+        raise ValueError(f"Unsupported NOID template: {template}")
+
+
+def noid_template_capacity(template: str) -> int:
+    """Count how many distinct NOIDs a template can produce."""
+    capacity = 1
+    for char in template.rstrip("k"):
+        capacity *= TEMPLATE_RADIX[char]
+    return capacity
+
+
+def noid_from_counter(counter: int, template: str) -> str:
+    """Map a sequence number onto a NOID following a template, without check character.
+
+    The mapping is mixed-radix, so counter 0 of "eedeedk" is "000000".
+    """
+    mask = template.rstrip("k")
+    if not 0 <= counter < noid_template_capacity(mask):
+        raise ValueError(f"Counter {counter} out of range for template {template}")
+    chars = []
+    for char in reversed(mask):
+        counter, index = divmod(counter, TEMPLATE_RADIX[char])
+        chars.append(BETANUMERIC[index])
+    return "".join(reversed(chars))
 
 
 def parse_ark(ark: str) -> Tuple[str, int, str]:
-    parts = ark.split("ark:")
-    if len(parts) != 2:
-        raise ValueError("Not a valid ARK")
-    nma, ark = parts
-    ark = ark.lstrip("/")
-    parts = ark.split("/")
-    if len(parts) < 2:
-        raise ValueError("Not a valid ARK")
-    # TODO: assigned_name definition here conflicts with models.Ark.assigned_name
-    # parse_ark here doesn't attempt to parse out the shoulder of the ARK.
-    naan, assigned_name = parts[:2]
+    """Split an ARK into its NMA, NAAN and base name, see ark.parsing."""
+    parsed = parse(ark)
+    return parsed.nma, parsed.naan, parsed.name
+
+
+def normalize_key(key: str) -> str:
+    """Put an access key in canonical UUID form, raising ValueError if it isn't one."""
+    return str(uuid.UUID(key))
+
+
+def hash_key(key: str) -> str:
+    """Hash a normalized access key for storage.
+
+    Keys are random UUID4s, so a fast unsalted hash is enough to make a leaked Key
+    table useless without making every API request pay for a password hash.
+    """
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def key_prefix(key: str) -> str:
+    """The first characters of a normalized access key, used to look it up."""
+    return key[:8]
+
+
+ERC_ELEMENTS = ("who", "what", "when", "where")
+
+
+def metadata_from_text(text: str) -> Dict:
+    """Structure ARK metadata given as text.
+
+    JSON objects are kept as they are. ERC records, "who: ..." lines for the four
+    kernel elements with an optional "erc:" line first, become an object of those
+    elements, and any other text is kept as the "what" element.
+    """
+    text = text.strip()
+    if not text:
+        return {}
     try:
-        naan_int = int(naan)
-    except ValueError:
-        raise ValueError("ARK NAAN must be an integer")
+        value = json.loads(text)
+    except json.JSONDecodeError:
+        value = None
+    if isinstance(value, dict):
+        return value
+    return _erc_elements(text) or {"what": text}
+
 
-    return nma, naan_int, assigned_name
+def _erc_elements(text: str) -> Optional[Dict]:
+    lines = text.splitlines()
+    if lines[0].strip().lower() == "erc:":
+        lines = lines[1:]
+    elements = {}
+    for line in lines:
+        label, colon, value = line.partition(":")
+        label = label.strip().lower()
+        if not colon or label not in ERC_ELEMENTS or label in elements:
+            return None
+        elements[label] = value.strip()
+    return elements or None
@@ -1,7 +1,9 @@
 import json
 import logging
+from typing import Optional, Tuple
 
-from django.core.exceptions import ValidationError
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.db import IntegrityError
 from django.http import (
     Http404,
@@ -9,18 +11,72 @@ from django.http import (
     HttpResponseBadRequest,
     HttpResponseForbidden,
     HttpResponseNotAllowed,
+    HttpResponseNotFound,
     HttpResponseRedirect,
     HttpResponseServerError,
     JsonResponse,
+    StreamingHttpResponse,
+)
+from django.utils.cache import (
+    get_conditional_response,
+    patch_cache_control,
+    patch_vary_headers,
 )
 from django.views.decorators.csrf import csrf_exempt
 
-from ark.forms import MintArkForm, UpdateArkForm
-from ark.models import Ark, Naan
-from ark.utils import generate_noid, noid_check_digit, parse_ark
+from ark import inflections
+from ark.auth import authenticate
+from ark.binding import bind_arks
+from ark.export import EXPORT_FIELDS, export_pages, ndjson, parse_since
+from ark.forms import (
+    MintArkBatchForm,
+    MintArkForm,
+    QueryArksForm,
+    SearchArksForm,
+    UpdateArkForm,
+)
+from ark.minting import MintError, get_shoulder, mint_arks, mint_batch_max
+from ark.models import Ark, Naan, Shoulder
+from ark.parsing import split_ark
+from ark.resolver import (
+    N2T,
+    NAAN,
+    UNBOUND,
+    aresolve,
+    cache_max_age,
+    longest_match,
+    qualifier_candidates,
+    resolve,
+)
+from ark.search import filter_metadata
+from ark.search import search_arks as search
+from ark.utils import generate_noid, noid_check_digit
 
 logger = logging.getLogger(__name__)
 
+NDJSON = "application/x-ndjson"
+
+
+def authorize(request) -> Tuple[Optional[Naan], Optional[HttpResponse]]:
+    """Find the NAAN whose access key is the request's bearer token.
+
+    Returns the NAAN, or an error response to return if the request isn't authorized.
+    """
+    # TODO: get rid of UUID for key
+    bearer_token = request.headers.get("Authorization")
+    if not bearer_token:
+        return None, HttpResponseForbidden()
+
+    key = bearer_token.split()[-1]
+
+    try:
+        naan, active = authenticate(key)
+    except ValueError as e:  # not a UUID
+        return None, HttpResponseBadRequest(e)
+    if naan is None or not active:
+        return None, HttpResponseForbidden()
+    return naan, None
+
 
 @csrf_exempt
 def mint_ark(request):
@@ -37,20 +93,9 @@ def mint_ark(request):
     if not mint_request.is_valid():
         return JsonResponse(mint_request.errors, status=400)
 
-    # TODO: get rid of UUID for key
-    # TODO: hash the keys and only show on creation
-    bearer_token = request.headers.get("Authorization")
-    if not bearer_token:
-        return HttpResponseForbidden()
-
-    key = bearer_token.split()[-1]
-
-    try:
-        authorized_naan = Naan.objects.get(key__key=key)
-    except Naan.DoesNotExist:
-        return HttpResponseForbidden()
-    except ValidationError as e:  # probably an invalid key
-        return HttpResponseBadRequest(e)
+    authorized_naan, error_response = authorize(request)
+    if error_response:
+        return error_response
 
     naan = mint_request.cleaned_data["naan"]
     shoulder = mint_request.cleaned_data["shoulder"]
@@ -61,6 +106,14 @@ def mint_ark(request):
     if authorized_naan.naan != naan:
         return HttpResponseForbidden()
 
+    shoulder_obj = get_shoulder(naan, shoulder)
+    if shoulder_obj and shoulder_obj.minting_mode != Shoulder.RANDOM:
+        try:
+            [ark] = mint_arks(authorized_naan, [mint_request.cleaned_data])
+        except MintError as e:
+            return HttpResponseServerError(e)
+        return JsonResponse({"ark": str(ark)})
+
     ark, collisions = None, 0
     for _ in range(10):
         noid = generate_noid(8)
@@ -92,6 +145,70 @@ def mint_ark(request):
     return JsonResponse({"ark": str(ark)})
 
 
+@csrf_exempt
+def mint_ark_batch(request):
+    """Mint many ARKs in one request.
+
+    Accepts either {"arks": [<mint request>, ...]} or a single mint request with an
+    additional "count" field. Returns {"arks": [...]} in the same order.
+    """
+    if request.method != "POST":
+        return HttpResponseNotAllowed(permitted_methods=["POST"])
+
+    try:
+        unsafe_batch_request = json.loads(request.body.decode("utf-8"))
+    except (json.JSONDecodeError, TypeError) as e:
+        return HttpResponseBadRequest(e)
+
+    if not isinstance(unsafe_batch_request, dict):
+        return HttpResponseBadRequest("Expected a JSON object")
+
+    # Size and authorization are checked before validating every item in the list
+    unsafe_mint_requests = unsafe_batch_request.get("arks")
+    if "arks" in unsafe_batch_request:
+        if not isinstance(unsafe_mint_requests, list) or not all(
+            isinstance(r, dict) for r in unsafe_mint_requests
+        ):
+            return HttpResponseBadRequest("arks must be a list of mint requests")
+        if len(unsafe_mint_requests) > mint_batch_max():
+            return _batch_too_large()
+
+    authorized_naan, error_response = authorize(request)
+    if error_response:
+        return error_response
+
+    if "arks" in unsafe_batch_request:
+        mint_forms = [MintArkForm(r) for r in unsafe_mint_requests]
+        errors = {i: f.errors for i, f in enumerate(mint_forms) if not f.is_valid()}
+        if errors:
+            return JsonResponse({"arks": errors}, status=400)
+        mint_requests = [f.cleaned_data for f in mint_forms]
+    else:
+        batch_request = MintArkBatchForm(unsafe_batch_request)
+        if not batch_request.is_valid():
+            return JsonResponse(batch_request.errors, status=400)
+        count = batch_request.cleaned_data["count"]
+        if count > mint_batch_max():
+            return _batch_too_large()
+        mint_requests = [batch_request.cleaned_data] * count
+
+    if any(r["naan"] != authorized_naan.naan for r in mint_requests):
+        return HttpResponseForbidden()
+
+    try:
+        arks = mint_arks(authorized_naan, mint_requests)
+    except MintError as e:
+        return HttpResponseServerError(e)
+
+    return JsonResponse({"arks": [str(ark) for ark in arks]})
+
+
+def _batch_too_large() -> HttpResponse:
+    return HttpResponseBadRequest(
+        f"Can't mint more than {mint_batch_max()} ARKs per request"
+    )
+
+
 @csrf_exempt
 def update_ark(request):
     if request.method != "PUT":
@@ -108,34 +225,20 @@ def update_ark(request):
     if not update_request.is_valid():
         return JsonResponse(update_request.errors, status=400)
 
-    # TODO: get rid of UUID for key
-    # TODO: hash the keys and only show on creation
-    bearer_token = request.headers.get("Authorization")
-    if not bearer_token:
-        return HttpResponseForbidden()
-
-    key = bearer_token.split()[-1]
-
-    try:
-        # TODO: is key valid enough to pass here?
-        authorized_naan = Naan.objects.get(key__key=key)
-    except Naan.DoesNotExist:
-        return HttpResponseForbidden()
-    except ValidationError as e:
-        return HttpResponseBadRequest(e)
+    authorized_naan, error_response = authorize(request)
+    if error_response:
+        return error_response
 
-    ark = update_request.cleaned_data["ark"]
+    parsed_ark = update_request.parsed_ark
     url = update_request.cleaned_data["url"]
     metadata = update_request.cleaned_data["metadata"]
     commitment = update_request.cleaned_data["commitment"]
 
-    _, naan, assigned_name = parse_ark(ark)
-
-    if authorized_naan.naan != naan:
+    if authorized_naan.naan != parsed_ark.naan:
         return HttpResponseForbidden()
 
     try:
-        ark = Ark.objects.get(ark=f"{naan}/{assigned_name}")
+        ark = Ark.objects.get(ark=parsed_ark.qualified_key)
     except Ark.DoesNotExist:
         raise Http404
 
@@ -147,25 +250,233 @@ def update_ark(request):
     return HttpResponse()
 
 
+@csrf_exempt
+def update_ark_batch(request):
+    """Rebind many ARKs in one request.
+
+    Accepts {"arks": [<update request>, ...]} and returns {"results": [...]}, or, with
+    Content-Type application/x-ndjson, one update request per line, streaming one
+    result per line back as each chunk is applied. Each result has the ARK and a
+    status of updated, not_found, forbidden or invalid.
+    """
+    if request.method != "PUT":
+        return HttpResponseNotAllowed(permitted_methods=["PUT"])
+
+    authorized_naan, error_response = authorize(request)
+    if error_response:
+        return error_response
+
+    if request.content_type == NDJSON:
+        return StreamingHttpResponse(
+            (
+                json.dumps(result) + "\n"
+                for result in bind_arks(authorized_naan, _ndjson_lines(request))
+            ),
+            content_type=NDJSON,
+        )
+
+    try:
+        unsafe_batch_request = json.loads(request.body.decode("utf-8"))
+    except (json.JSONDecodeError, TypeError) as e:
+        return HttpResponseBadRequest(e)
+
+    if not isinstance(unsafe_batch_request, dict) or not isinstance(
+        unsafe_batch_request.get("arks"), list
+    ):
+        return HttpResponseBadRequest("arks must be a list of update requests")
+
+    results = list(bind_arks(authorized_naan, unsafe_batch_request["arks"]))
+    return JsonResponse({"results": results})
+
+
+def _ndjson_lines(request):
+    for line in request:
+        if line.strip():
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                yield None  # reported as an invalid update request
+
+
+def export_arks(request):
+    """Stream every ARK of the caller's NAAN as NDJSON, in ARK order.
+
+    ?shoulder= limits the export to one shoulder, ?since= to ARKs updated since an ISO
+    8601 date or time, and ?after= continues an interrupted export after the last ARK
+    it received.
+    """
+    if request.method != "GET":
+        return HttpResponseNotAllowed(permitted_methods=["GET"])
+
+    authorized_naan, error_response = authorize(request)
+    if error_response:
+        return error_response
+
+    after = request.GET.get("after", "")
+    if after.startswith("ark:/"):
+        after = after[len("ark:/") :]
+    since = request.GET.get("since")
+    if since:
+        try:
+            since = parse_since(since)
+        except ValueError as e:
+            return HttpResponseBadRequest(e)
+    pages = export_pages(
+        naan=authorized_naan.naan,
+        shoulder=request.GET.get("shoulder") or None,
+        after=after,
+        since=since or None,
+    )
+    return StreamingHttpResponse((ndjson(page) for page in pages), content_type=NDJSON)
+
+
+def search_arks(request):
+    """Find the caller's ARKs by ARK prefix or by part of their URL.
+
+    ?q= is the search term, see ark.search. Results are in ARK order, at most ?limit=
+    of them (100 by default). When there are more, "next" is the ARK to pass as
+    ?after= to get the next page.
+    """
+    if request.method != "GET":
+        return HttpResponseNotAllowed(permitted_methods=["GET"])
+
+    search_request = SearchArksForm(request.GET)
+    if not search_request.is_valid():
+        return JsonResponse(search_request.errors, status=400)
+
+    authorized_naan, error_response = authorize(request)
+    if error_response:
+        return error_response
+
+    arks = search(
+        Ark.objects.filter(naan=authorized_naan), search_request.cleaned_data["q"]
+    )
+    return _keyset_page(arks, search_request.cleaned_data)
+
+
+def query_arks(request):
+    """Find the caller's ARKs whose metadata has ?value= under ?key=.
+
+    Results are paged as by search_arks.
+    """
+    if request.method != "GET":
+        return HttpResponseNotAllowed(permitted_methods=["GET"])
+
+    query_request = QueryArksForm(request.GET)
+    if not query_request.is_valid():
+        return JsonResponse(query_request.errors, status=400)
+
+    authorized_naan, error_response = authorize(request)
+    if error_response:
+        return error_response
+
+    arks = filter_metadata(
+        Ark.objects.filter(naan=authorized_naan),
+        query_request.cleaned_data["key"],
+        query_request.cleaned_data["value"],
+    )
+    return _keyset_page(arks, query_request.cleaned_data)
+
+
+def _keyset_page(arks, page_request) -> JsonResponse:
+    limit = page_request["limit"] or 100
+    after = page_request["after"]
+    if after.startswith("ark:/"):
+        after = after[len("ark:/") :]
+    page = list(
+        arks.filter(ark__gt=after).order_by("ark").values(*EXPORT_FIELDS)[: limit + 1]
+    )
+    more = len(page) > limit
+    page = page[:limit]
+    return JsonResponse({"arks": page, "next": page[-1]["ark"] if more else None})
+
+
 def resolve_ark(request, ark: str):
     # TODO: maybe just parse the ark in the urls.py re_path
     try:
-        _, naan, assigned_name = parse_ark(ark)
+        naan, name = split_ark(ark)
     except ValueError as e:
         return HttpResponseBadRequest(e)
+    inflection = inflections.inflection(request)
+    if inflection:
+        return _describe(request, naan, name, inflection)
+    return _resolved(resolve(naan, name))
+
+
+async def resolve_ark_async(request, ark: str):
+    """resolve_ark for ASGI servers, used when ARKLET_ASYNC_RESOLVE is set.
+
+    Cache hits never leave the event loop, and database lookups don't tie up a
+    thread from the sync_to_async thread pool.
+    """
     try:
-        ark_obj = Ark.objects.get(ark=f"{naan}/{assigned_name}")
-        if not ark_obj.url:
-            # TODO: return a template page for an ARK in progress
+        naan, name = split_ark(ark)
+    except ValueError as e:
+        return HttpResponseBadRequest(e)
+    inflection = inflections.inflection(request)
+    if inflection:
+        return await sync_to_async(_describe)(request, naan, name, inflection)
+    return _resolved(await aresolve(naan, name))
+
+
+def _resolved(resolution) -> HttpResponse:
+    """Redirect as resolved, with Cache-Control for proxies in front of arklet.
+
+    Shared caches keep responses for the kind's ARKLET_CACHE_*_MAX_AGE. Browsers, which
+    can't be purged, keep them no longer than ARKLET_CACHE_BROWSER_MAX_AGE.
+    """
+    if resolution.kind == UNBOUND:
+        # TODO: return a template page for an ARK in progress
+        response = HttpResponseNotFound()
+    else:
+        response = HttpResponseRedirect(resolution.url)
+    shared_max_age = cache_max_age(resolution.kind)
+    patch_cache_control(
+        response,
+        public=True,
+        max_age=min(
+            shared_max_age, getattr(settings, "ARKLET_CACHE_BROWSER_MAX_AGE", 60)
+        ),
+        s_maxage=shared_max_age,
+    )
+    return response
+
+
+def _describe(request, naan: int, name: str, inflection: str):
+    """Answer an inflected resolve with a description of the ARK.
+
+    Descriptions carry a strong ETag and Last-Modified from the ARK's updated_at, so
+    revalidating clients get a 304 without the ARK being described again. Qualified
+    ARKs are described by the ARK they resolve through, with their qualifier. ARKs
+    that aren't here are redirected, inflection included, like plain resolves.
+    """
+    record = (
+        longest_match(naan, qualifier_candidates(name))
+        .values("ark", "url", "metadata", "commitment", "updated_at")
+        .first()
+    )
+    if record is None:
+        resolution = resolve(naan, name)
+        if resolution.kind not in (NAAN, N2T):
             raise Http404
-        return HttpResponseRedirect(ark_obj.url)
-    except Ark.DoesNotExist:
-        try:
-            naan_obj = Naan.objects.get(naan=naan)
-            return HttpResponseRedirect(
-                f"{naan_obj.url}/ark:/{naan_obj.naan}/{assigned_name}"
-            )
-        except Naan.DoesNotExist:
-            resolver = "https://n2t.net"
-            # TODO: more robust resolver URL creation
-            return HttpResponseRedirect(f"{resolver}/ark:/{naan}/{assigned_name}")
+        query = request.META.get("QUERY_STRING", "")
+        return HttpResponseRedirect(f"{resolution.url}?{query}")
+
+    ark = record["ark"]
+    qualifier = name[len(ark) - len(f"{naan}/") :]  # what follows the matched ARK
+    media_type = inflections.content_type(request)
+    etag = inflections.etag(record["updated_at"], inflection, media_type)
+    response = get_conditional_response(
+        request, etag=etag, last_modified=int(record["updated_at"].timestamp())
+    )
+    if response is None:
+        response = HttpResponse(
+            inflections.describe(ark, record, inflection, media_type, qualifier),
+            content_type=media_type,
+        )
+    # Descriptions aren't purged, caches must revalidate them, cheaply, each time
+    patch_cache_control(response, public=True, no_cache=True)
+    response["ETag"] = etag
+    response["Last-Modified"] = inflections.last_modified(record["updated_at"])
+    patch_vary_headers(response, ["Accept"])
+    return response
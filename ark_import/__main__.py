@@ -1,65 +1,43 @@
-"""Generate SQL queries from Noid/Egg Berkeley DB dump.
+"""Import ARK bindings from a Noid/Egg Berkeley DB dump into arklet.
 
-This script formats a Noid/Egg db dump into a series of SQL queries,
+By default this script formats the dump into a series of SQL queries,
 grouped into multiple files, suitable for importing into arklet.
 
-As written, will only work for naan 13960 and shoulders /t, /fk.
-Modify the extract_ark function to work for your DB file.
+With --load it instead streams the bindings straight into the database
+configured in the Django settings (COPY on Postgres, multi-row inserts
+elsewhere), committing every --commit-every records. Progress is saved to
+a checkpoint file, so rerunning the same command after a failure resumes
+after the last commit.
 
-Supply a path to the db dump and a prefix for the query files.
+By default only ARKs under naan 13960 with shoulders /t, /fk and 8
+character numbers are accepted. Use --naan, --shoulder and --noid-length,
+each of which may be repeated where it makes sense, to match your DB file.
+The dump is parsed in --workers processes.
 
-Example call:
+Example calls:
 python -m ark_import sample_noid_output.txt output-prefix
+python -m ark_import sample_noid_output.txt --load
+python -m ark_import dump.txt --load --naan 12345 --shoulder /x1 --noid-length 10
 """
 
+import argparse
+import os
 import sys
 
-infile = sys.argv[1]
-out_prefix = sys.argv[2]
-queries_per_file = 10000
-
-
-def signal_line(line):
-    return line.startswith("ark:/") and line.endswith("_t")
-
+from ark_import.noid_dump import DEFAULT_CONFIG, DumpConfig, parallel_ark_records
 
-def extract_ark(line):
-    ark, record_type = line.split("|")
-    proto, naan, number = ark.split("/")
-    naan = int(naan)
-    if naan != 13960:
-        raise ValueError(f"bad naan: {naan}")
-    if number.startswith("t"):
-        shoulder = "/t"
-        number = number[1:]
-    elif number.startswith("fk"):
-        shoulder = "/fk"
-        number = number[2:]
-    else:
-        raise ValueError(number)
-    if len(number) != 8:
-        raise ValueError(f"unexpected number: {number}")
-    return naan, shoulder, number
+queries_per_file = 10000
 
 
-def query_format(naan, shoulder, number, url):
-    ark = f"{naan}{shoulder}{number}"
-    return repr((ark, shoulder, number, url, naan))
+def sql_literal(value):
+    if isinstance(value, int):
+        return str(value)
+    return "'" + str(value).replace("'", "''") + "'"
 
 
-def ark_input_iter(ark_input_file):
-    with open(ark_input_file, "r") as f:
-        take_next = False
-        for line in f:
-            line = line.strip()
-            if signal_line(line):
-                take_next = True
-                naan, shoulder, number = extract_ark(line)
-            elif take_next:
-                yield query_format(naan, shoulder, number, line)
-                take_next = False
-            else:
-                take_next = False
+def query_format(record):
+    values = (record.ark, record.shoulder, record.number, record.url, record.naan)
+    return "(" + ", ".join(sql_literal(value) for value in values) + ")"
 
 
 def write_query_values(prefix, file_num, vals):
@@ -71,12 +49,114 @@ def write_query_values(prefix, file_num, vals):
         f.write(query)
 
 
-query_vals = []
-outfile_num = 0
-for query_val in ark_input_iter(infile):
-    query_vals.append(query_val)
-    if len(query_vals) >= queries_per_file:
-        write_query_values(out_prefix, outfile_num, query_vals)
-        query_vals.clear()
-        outfile_num += 1
-write_query_values(out_prefix, outfile_num, query_vals)  # write remaining values
+def write_sql_files(records, out_prefix):
+    query_vals = []
+    outfile_num = 0
+    for _, record in records:
+        query_vals.append(query_format(record))
+        if len(query_vals) >= queries_per_file:
+            write_query_values(out_prefix, outfile_num, query_vals)
+            query_vals.clear()
+            outfile_num += 1
+    write_query_values(out_prefix, outfile_num, query_vals)  # write remaining values
+
+
+def load(infile, parse, checkpoint_path, restart, commit_every, on_conflict):
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "arklet.settings")
+    import django
+
+    django.setup()
+    from ark_import.load import load_records, read_checkpoint
+
+    source = os.path.abspath(infile)
+    start = None if restart else read_checkpoint(checkpoint_path)
+    if start is not None:
+        if start.get("input") != source:
+            sys.exit(f"{checkpoint_path} is for {start.get('input')}, not {source}")
+        print(f"Resuming from byte {start['offset']}", file=sys.stderr)
+    else:
+        start = {"input": source, "offset": 0, "read": 0, "written": 0}
+    try:
+        state = load_records(
+            parse(start["offset"]),
+            checkpoint_path=checkpoint_path,
+            start=start,
+            commit_every=commit_every,
+            on_conflict=on_conflict,
+        )
+    except ValueError as e:
+        sys.exit(str(e))
+    print(f"Done: {state['read']} records read, {state['written']} written")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Import ARK bindings from a Noid/Egg Berkeley DB dump."
+    )
+    parser.add_argument("infile", help="Path to the db dump")
+    parser.add_argument("out_prefix", nargs="?", help="Prefix for the query files")
+    parser.add_argument(
+        "--load", action="store_true", help="Load into the database directly"
+    )
+    parser.add_argument(
+        "--checkpoint", help="Checkpoint file for --load, default: <infile>.checkpoint"
+    )
+    parser.add_argument(
+        "--restart", action="store_true", help="Ignore an existing checkpoint"
+    )
+    parser.add_argument("--commit-every", type=int, default=50_000)
+    parser.add_argument(
+        "--on-conflict",
+        choices=["skip", "update"],
+        default="skip",
+        help="Skip ARKs that already exist or rebind them to the dump's URL",
+    )
+    parser.add_argument(
+        "--naan", type=int, action="append", help="NAAN to accept, may be repeated"
+    )
+    parser.add_argument(
+        "--shoulder", action="append", help="Shoulder to accept, may be repeated"
+    )
+    parser.add_argument(
+        "--noid-length",
+        type=int,
+        help="Expected length of the number after the shoulder, 0 for any",
+    )
+    parser.add_argument(
+        "--workers", type=int, help="Parser processes, default: one per CPU"
+    )
+    args = parser.parse_args()
+
+    if args.shoulder and not all(s.startswith("/") for s in args.shoulder):
+        parser.error("shoulders must start with a forward slash")
+    config = DumpConfig(
+        naans=frozenset(args.naan) if args.naan else DEFAULT_CONFIG.naans,
+        shoulders=tuple(args.shoulder or DEFAULT_CONFIG.shoulders),
+        noid_length=(
+            DEFAULT_CONFIG.noid_length
+            if args.noid_length is None
+            else args.noid_length or None
+        ),
+    )
+
+    def parse(offset=0):
+        return parallel_ark_records(args.infile, offset, config, args.workers)
+
+    if args.load:
+        checkpoint_path = args.checkpoint or f"{args.infile}.checkpoint"
+        load(
+            args.infile,
+            parse,
+            checkpoint_path,
+            args.restart,
+            args.commit_every,
+            args.on_conflict,
+        )
+    elif args.out_prefix:
+        write_sql_files(parse(), args.out_prefix)
+    else:
+        parser.error("give an output prefix for the query files, or --load")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""Load ARK records straight into the Ark table.
+
+On Postgres each chunk of records is streamed with COPY FROM STDIN into a temporary
+staging table and moved into ark_ark with INSERT ... SELECT ... ON CONFLICT, so that
+ARKs that were already imported are skipped or rebound. Other databases get chunked
+multi-row INSERT ... ON CONFLICT statements instead.
+
+Every chunk is committed on its own and followed by a checkpoint recording how far
+into the dump the import got, so an interrupted import resumes from the last commit.
+"""
+
+import io
+import json
+import os
+import sys
+import time
+from typing import Iterable, Iterator, List, Optional, Set, TextIO, Tuple
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from ark.models import Naan
+from ark_import.noid_dump import ArkRecord
+
+SKIP = "skip"
+UPDATE = "update"
+ON_CONFLICT = {
+    SKIP: "ON CONFLICT (ark) DO NOTHING",
+    UPDATE: "ON CONFLICT (ark) DO UPDATE"
+    " SET url = EXCLUDED.url, updated_at = EXCLUDED.updated_at",
+}
+
+COLUMNS = "ark, naan_id, shoulder, assigned_name, url, metadata, commitment, updated_at"
+# Rows per INSERT statement when COPY isn't available, 8 parameters each
+INSERT_ROWS = 100
+
+
+def load_records(
+    records: Iterable[Tuple[int, ArkRecord]],
+    checkpoint_path: Optional[str] = None,
+    start: Optional[dict] = None,
+    commit_every: int = 50_000,
+    on_conflict: str = SKIP,
+    progress: Optional[TextIO] = sys.stderr,
+) -> dict:
+    """Load (offset, record) pairs as yielded by noid_dump.ark_records.
+
+    Returns the final checkpoint: the offset after the last loaded record and running
+    totals of records read and rows written, i.e. inserted or, when updating on
+    conflict, updated. Totals continue from start when resuming.
+    """
+    state = dict(start or {"offset": 0, "read": 0, "written": 0})
+    started = time.perf_counter()
+    read_before = state["read"]
+    known_naans: Set[int] = set()
+    for offset, chunk in _chunks(records, commit_every):
+        _check_naans({record.naan for record in chunk} - known_naans)
+        known_naans.update(record.naan for record in chunk)
+        with transaction.atomic():
+            if connection.vendor == "postgresql":
+                written = _copy_chunk(chunk, on_conflict)
+            else:
+                written = _insert_chunk(chunk, on_conflict)
+        state["offset"] = offset
+        state["read"] += len(chunk)
+        state["written"] += written
+        if checkpoint_path:
+            write_checkpoint(checkpoint_path, state)
+        if progress:
+            rate = (state["read"] - read_before) / (time.perf_counter() - started)
+            print(
+                f"{state['read']} records read, {state['written']} written, "
+                f"{rate:.0f} records/s",
+                file=progress,
+            )
+    return state
+
+
+def _check_naans(naans: Set[int]) -> None:
+    missing = naans - set(
+        Naan.objects.filter(naan__in=naans).values_list("naan", flat=True)
+    )
+    if missing:
+        raise ValueError(f"Create these NAANs before importing their ARKs: {missing}")
+
+
+def read_checkpoint(path: str) -> Optional[dict]:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def write_checkpoint(path: str, state: dict) -> None:
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _chunks(
+    records: Iterable[Tuple[int, ArkRecord]], size: int
+) -> Iterator[Tuple[int, List[ArkRecord]]]:
+    chunk: List[ArkRecord] = []
+    offset = 0
+    for offset, record in records:
+        chunk.append(record)
+        if len(chunk) >= size:
+            yield offset, chunk
+            chunk = []
+    if chunk:
+        yield offset, chunk
+
+
+def _row(record: ArkRecord, now) -> tuple:
+    return (
+        record.ark,
+        record.naan,
+        record.shoulder,
+        record.number,
+        record.url,
+        "{}",  # no metadata, as JSON
+        "",
+        now,
+    )
+
+
+def _unique_rows(chunk: List[ArkRecord]) -> List[tuple]:
+    # A dump may bind the same ARK twice, which ON CONFLICT DO UPDATE refuses within
+    # one statement. The last binding wins.
+    now = connection.ops.adapt_datetimefield_value(timezone.now())
+    return list({record.ark: _row(record, now) for record in chunk}.values())
+
+
+def _copy_chunk(chunk: List[ArkRecord], on_conflict: str) -> int:
+    buffer = io.StringIO()
+    for row in _unique_rows(chunk):
+        buffer.write("\t".join(copy_text(value) for value in row) + "\n")
+    buffer.seek(0)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "CREATE TEMPORARY TABLE ark_import_staging"
+            " (ark text, naan_id bigint, shoulder text, assigned_name text,"
+            " url text, metadata jsonb, commitment text, updated_at timestamptz)"
+            " ON COMMIT DROP"
+        )
+        copy_sql = f"COPY ark_import_staging ({COLUMNS}) FROM STDIN"
+        raw_cursor = cursor.cursor
+        if hasattr(raw_cursor, "copy_expert"):  # psycopg2
+            raw_cursor.copy_expert(copy_sql, buffer)
+        else:  # psycopg 3
+            with raw_cursor.copy(copy_sql) as copy:
+                copy.write(buffer.getvalue())
+        cursor.execute(
+            f"INSERT INTO ark_ark ({COLUMNS})"
+            f" SELECT {COLUMNS} FROM ark_import_staging {ON_CONFLICT[on_conflict]}"
+        )
+        return cursor.rowcount
+
+
+def _insert_chunk(chunk: List[ArkRecord], on_conflict: str) -> int:
+    rows = _unique_rows(chunk)
+    written = 0
+    with connection.cursor() as cursor:
+        for i in range(0, len(rows), INSERT_ROWS):
+            batch = rows[i : i + INSERT_ROWS]
+            placeholders = ", ".join(["(%s, %s, %s, %s, %s, %s, %s, %s)"] * len(batch))
+            cursor.execute(
+                f"INSERT INTO ark_ark ({COLUMNS}) VALUES {placeholders}"
+                f" {ON_CONFLICT[on_conflict]}",
+                [value for row in batch for value in row],
+            )
+            written += cursor.rowcount
+    return written
+
+
+def copy_text(value) -> str:
+    """Format a value as a column of COPY's text format."""
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
@@ -0,0 +1,175 @@
+"""Parse ARK bindings out of a Noid/Egg Berkeley DB dump.
+
+Which NAANs, shoulders and NOID lengths to expect is set by a DumpConfig. The default
+only accepts NAAN 13960 with shoulders /t and /fk and 8 character NOIDs.
+
+Large dumps can be parsed across processes with parallel_ark_records, which splits
+the file into byte ranges that each start on a binding and parses them from a
+memory map in a process pool, yielding records in file order.
+"""
+
+import mmap
+import os
+import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import BinaryIO, FrozenSet, Iterator, List, NamedTuple, Optional, Tuple
+
+from ark.parsing import ArkParser
+
+
+class ArkRecord(NamedTuple):
+    naan: int
+    shoulder: str
+    number: str
+    url: str
+
+    @property
+    def ark(self) -> str:
+        return f"{self.naan}{self.shoulder}{self.number}"
+
+
+class DumpConfig(NamedTuple):
+    naans: FrozenSet[int] = frozenset({13960})
+    shoulders: Tuple[str, ...] = ("/t", "/fk")
+    noid_length: Optional[int] = 8  # None for any length
+
+
+DEFAULT_CONFIG = DumpConfig()
+
+# Bytes of dump each worker process parses at a time
+CHUNK_BYTES = 32 * 1024 * 1024
+
+
+def extract_ark(line, config: DumpConfig = DEFAULT_CONFIG):
+    ark, record_type = line.split("|")
+    parsed = _parser(config).parse(ark)
+    if parsed.naan not in config.naans:
+        raise ValueError(f"bad naan: {parsed.naan}")
+    if parsed.shoulder is None:
+        raise ValueError(f"unexpected shoulder: {parsed.name}")
+    number = parsed.blade
+    if parsed.qualifier or (
+        config.noid_length is not None and len(number) != config.noid_length
+    ):
+        raise ValueError(f"unexpected number: {number}{parsed.qualifier}")
+    return parsed.naan, parsed.shoulder, number
+
+
+@lru_cache(maxsize=None)
+def _parser(config: DumpConfig) -> ArkParser:
+    return ArkParser(
+        (naan, shoulder) for naan in config.naans for shoulder in config.shoulders
+    )
+
+
+def ark_records(
+    f: BinaryIO, offset: int = 0, config: DumpConfig = DEFAULT_CONFIG
+) -> Iterator[Tuple[int, ArkRecord]]:
+    """Yield (offset after the record, ArkRecord) for each binding in a dump.
+
+    Reads the dump file opened in binary mode from the given byte offset, which must
+    be the start of a line, so that an interrupted import can resume where it was.
+    """
+    if os.fstat(f.fileno()).st_size <= offset:
+        return
+    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+        for start, end in _ranges(m, offset, CHUNK_BYTES):
+            yield from _parse(m[start:end], start, config)
+
+
+def parallel_ark_records(
+    path: str,
+    offset: int = 0,
+    config: DumpConfig = DEFAULT_CONFIG,
+    workers: Optional[int] = None,
+    chunk_bytes: int = CHUNK_BYTES,
+) -> Iterator[Tuple[int, ArkRecord]]:
+    """Like ark_records, but parsing chunks of the dump in a pool of processes.
+
+    Only a few chunks per worker are parsed ahead of the caller, so memory stays
+    bounded however slowly the records are consumed.
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        with open(path, "rb") as f:
+            yield from ark_records(f, offset, config)
+        return
+    with ProcessPoolExecutor(workers) as pool:
+        pending: deque = deque()
+        for start, end in split_ranges(path, offset, chunk_bytes):
+            pending.append(pool.submit(parse_range, path, start, end, config))
+            if len(pending) >= workers * 2:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def split_ranges(path: str, offset: int, chunk_bytes: int) -> List[Tuple[int, int]]:
+    """Split a dump from offset into byte ranges that each start on a binding.
+
+    A binding's value line then always falls into the same range as its key line.
+    """
+    if os.path.getsize(path) <= offset:
+        return []
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+        return list(_ranges(m, offset, chunk_bytes))
+
+
+def parse_range(
+    path: str, start: int, end: int, config: DumpConfig
+) -> List[Tuple[int, ArkRecord]]:
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+        data = m[start:end]
+    return list(_parse(data, start, config))
+
+
+# The key line of a binding, e.g. " ark:/13960/t00000018|_t"
+_SIGNAL_LINE = re.compile(rb"^[ \t]*ark:/[^\n]*_t[ \t\r]*$", re.MULTILINE)
+
+
+def _parse(
+    data: bytes, offset: int, config: DumpConfig
+) -> Iterator[Tuple[int, ArkRecord]]:
+    """Parse the bindings in a chunk of dump that starts at offset in the file.
+
+    Key lines are found with a regular expression, so the many other lines of the
+    dump are skipped without being looked at in Python.
+    """
+    for match in _SIGNAL_LINE.finditer(data):
+        value_start = match.end() + 1
+        if value_start > len(data):
+            break  # a key line without a value at the end of the dump
+        value_end = data.find(b"\n", value_start)
+        record_end = len(data) if value_end == -1 else value_end + 1
+        value = data[value_start:record_end]
+        if _SIGNAL_LINE.match(value):
+            continue  # a key line without a value, its successor is handled next
+        naan, shoulder, number = extract_ark(_decode(match.group()), config)
+        yield offset + record_end, ArkRecord(naan, shoulder, number, _decode(value))
+
+
+def _decode(raw_line: bytes) -> str:
+    return raw_line.decode("utf-8", errors="replace").strip()
+
+
+def _ranges(m: mmap.mmap, offset: int, chunk_bytes: int) -> Iterator[Tuple[int, int]]:
+    size = len(m)
+    while offset < size:
+        end = _next_binding(m, offset + chunk_bytes)
+        yield offset, end
+        offset = end
+
+
+def _next_binding(m: mmap.mmap, offset: int) -> int:
+    """Find the start of the first binding's key line at or after offset."""
+    if offset >= len(m):
+        return len(m)
+    if offset > 0 and m[offset - 1 : offset] != b"\n":
+        newline = m.find(b"\n", offset)
+        if newline == -1:
+            return len(m)
+        offset = newline + 1
+    match = _SIGNAL_LINE.search(m, offset)
+    return len(m) if match is None else match.start()
@@ -0,0 +1,31 @@
+"""
+Django settings for resolver-only arklet nodes.
+
+Public resolver nodes only answer ARK resolves, so they skip the admin and the
+session, CSRF, authentication and message middleware that the admin and API need.
+Everything else, including the database and cache settings, comes from
+arklet.settings. Serve them with arklet.resolver_wsgi or arklet.resolver_asgi, and
+keep minting, updating and the admin on nodes running arklet.wsgi or arklet.asgi.
+"""
+
+from arklet.settings import *  # noqa: F401,F403 pylint: disable=wildcard-import
+
+# ark.User is an AbstractUser, which needs auth and contenttypes installed
+INSTALLED_APPS = [
+    "django.contrib.auth",
+    "django.contrib.contenttypes",
+    "ark.apps.ArkConfig",
+]
+
+# CommonMiddleware checks the Host header against ALLOWED_HOSTS
+MIDDLEWARE = [
+    "ark.replicas.replica_pin_middleware",
+    "django.middleware.security.SecurityMiddleware",
+    "django.middleware.common.CommonMiddleware",
+]
+
+ROOT_URLCONF = "arklet.resolver_urls"
+
+TEMPLATES = []
+
+WSGI_APPLICATION = "arklet.resolver_wsgi.application"
@@ -0,0 +1,20 @@
+"""arklet resolver URL Configuration
+
+Only the resolve route, as served by resolver-only nodes (see
+arklet.resolver_settings). arklet.urls includes it alongside the API and admin.
+"""
+from django.conf import settings
+from django.urls import re_path
+
+from ark import views
+
+# Under ASGI, serve resolves with the native async view
+resolve_ark = (
+    views.resolve_ark_async
+    if getattr(settings, "ARKLET_ASYNC_RESOLVE", False)
+    else views.resolve_ark
+)
+
+urlpatterns = [
+    re_path(r"^(resolve/)?(?P<ark>ark:/?.*$)", resolve_ark, name="resolve_ark"),
+]
@@ -26,10 +26,36 @@ env = environ.Env(
     ARKLET_POSTGRES_PORT=(str, "5432"),
     ARKLET_POSTGRES_USER=(str, "arklet"),
     ARKLET_POSTGRES_PASSWORD=(str, "arklet"),
+    ARKLET_POSTGRES_REPLICA_HOSTS=(list, []),
+    ARKLET_POSTGRES_REPLICA_CONNECT_TIMEOUT=(int, 2),
+    ARKLET_REPLICA_CHECK_INTERVAL=(int, 10),
+    ARKLET_REPLICA_PIN_SECONDS=(int, 10),
     ARKLET_SENTRY_DSN=(str, ""),
     ARKLET_SENTRY_TRANSACTIONS_PER_TRACE=(int, 1),
     ARKLET_STATIC_ROOT=(str, "static"),
     ARKLET_MEDIA_ROOT=(str, "media"),
+    ARKLET_MINT_BATCH_MAX=(int, 10_000),
+    ARKLET_MINT_BLOCK_SIZE=(int, 100),
+    ARKLET_POOL_LOW_WATER=(int, 1_000),
+    ARKLET_POOL_TARGET=(int, 10_000),
+    ARKLET_POOL_BACKGROUND_REPLENISH=(bool, False),
+    ARKLET_ASYNC_RESOLVE=(bool, False),
+    ARKLET_KEY_CACHE_TTL=(int, 60),
+    ARKLET_CACHE_STATS_INTERVAL=(int, 0),
+    ARKLET_NAAN_REGISTRY_SNAPSHOT=(str, ""),
+    ARKLET_NAAN_REGISTRY_TTL=(int, 300),
+    ARKLET_RESOLVE_CACHE_SIZE=(int, 10_000),
+    ARKLET_RESOLVE_CACHE_TTL=(int, 300),
+    ARKLET_RESOLVE_SHARED_CACHE_PATH=(str, ""),
+    ARKLET_RESOLVE_SHARED_CACHE_SLOTS=(int, 65_536),
+    ARKLET_CACHE_BOUND_MAX_AGE=(int, 300),
+    ARKLET_CACHE_NAAN_MAX_AGE=(int, 3_600),
+    ARKLET_CACHE_N2T_MAX_AGE=(int, 3_600),
+    ARKLET_CACHE_NOT_FOUND_MAX_AGE=(int, 60),
+    ARKLET_CACHE_BROWSER_MAX_AGE=(int, 60),
+    ARKLET_PURGER=(str, "ark.purge.NoopPurger"),
+    ARKLET_PURGE_URL=(str, ""),
+    ARKLET_PURGE_HOST=(str, ""),
 )
 
 # .env files are optional. django-environ will log an INFO message if no file is found
@@ -67,6 +93,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "ark.replicas.replica_pin_middleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -114,6 +141,23 @@ DATABASES = {
     }
 }
 
+# Read replicas of the default database, as host or host:port, comma-separated. Reads
+# made while serving requests are spread over them, see ark/replicas.py. They share
+# the default database's name and credentials, and tests use the default database.
+ARKLET_DATABASE_REPLICAS = []
+for number, replica in enumerate(env("ARKLET_POSTGRES_REPLICA_HOSTS"), start=1):
+    replica_host, _, replica_port = replica.partition(":")
+    DATABASES[f"replica{number}"] = {
+        **DATABASES["default"],
+        "HOST": replica_host,
+        "PORT": replica_port or DATABASES["default"]["PORT"],
+        "OPTIONS": {"connect_timeout": env("ARKLET_POSTGRES_REPLICA_CONNECT_TIMEOUT")},
+        "TEST": {"MIRROR": "default"},
+    }
+    ARKLET_DATABASE_REPLICAS.append(f"replica{number}")
+
+DATABASE_ROUTERS = ["ark.replicas.ReplicaRouter"] if ARKLET_DATABASE_REPLICAS else []
+
 
 AUTH_USER_MODEL = "ark.User"
 
@@ -163,6 +207,70 @@ MEDIA_ROOT = env.str("ARKLET_MEDIA_ROOT")
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
+# Most ARKs a single POST /mint/batch request may mint
+ARKLET_MINT_BATCH_MAX = env("ARKLET_MINT_BATCH_MAX")
+
+# Counter values each worker reserves at once for shoulders minting sequentially
+ARKLET_MINT_BLOCK_SIZE = env("ARKLET_MINT_BLOCK_SIZE")
+
+# Pools of pre-minted ARKs for pool minting shoulders are refilled up to the target
+# once they fall below the low-water mark, by the replenishpool management command or,
+# if enabled, by a background thread in the worker that notices.
+ARKLET_POOL_LOW_WATER = env("ARKLET_POOL_LOW_WATER")
+ARKLET_POOL_TARGET = env("ARKLET_POOL_TARGET")
+ARKLET_POOL_BACKGROUND_REPLENISH = env("ARKLET_POOL_BACKGROUND_REPLENISH")
+
+# Resolve ARKs with a native async view. Only worth setting when serving arklet.asgi
+# with an ASGI server such as uvicorn, under WSGI it adds an event loop per request.
+ARKLET_ASYNC_RESOLVE = env("ARKLET_ASYNC_RESOLVE")
+
+# Seconds each worker may keep using a cached access key lookup. Keys saved in one
+# worker are dropped from that worker's cache straight away.
+ARKLET_KEY_CACHE_TTL = env("ARKLET_KEY_CACHE_TTL")
+
+# Per-worker LRU cache of ARK -> resolver redirect. Size 0 disables it, TTL in seconds
+# bounds how long other workers can serve a binding changed elsewhere.
+ARKLET_RESOLVE_CACHE_SIZE = env("ARKLET_RESOLVE_CACHE_SIZE")
+ARKLET_RESOLVE_CACHE_TTL = env("ARKLET_RESOLVE_CACHE_TTL")
+
+# Set a path (e.g. /dev/shm/arklet-resolve) to share one memory-mapped resolve cache
+# between all worker processes on the host instead. Each slot takes 512 bytes, and
+# entries expire after ARKLET_RESOLVE_CACHE_TTL, which bounds how long writes made on
+# other nodes or in bulk can go unseen.
+ARKLET_RESOLVE_SHARED_CACHE_PATH = env("ARKLET_RESOLVE_SHARED_CACHE_PATH")
+ARKLET_RESOLVE_SHARED_CACHE_SLOTS = env("ARKLET_RESOLVE_SHARED_CACHE_SLOTS")
+
+# Seconds between logging the hits, misses and evictions of each worker's caches to
+# the "ark.cache" logger at INFO level, 0 to not log them. See ark/cache.py.
+ARKLET_CACHE_STATS_INTERVAL = env("ARKLET_CACHE_STATS_INTERVAL")
+
+# Seconds caching proxies may serve resolves before asking again: bound redirects,
+# redirects to our NAANs' or n2t.net's resolvers for ARKs we don't have, and 404s for
+# ARKs without a URL yet. Browsers, which can't be purged, cache for at most the
+# browser max age. Bound redirects can be cached for hours once a purger tells the
+# proxy about rebound ARKs: set ARKLET_PURGER to ark.purge.HTTPPurger to send PURGE
+# requests to the proxy at ARKLET_PURGE_URL, with ARKLET_PURGE_HOST as Host if set.
+ARKLET_CACHE_BOUND_MAX_AGE = env("ARKLET_CACHE_BOUND_MAX_AGE")
+ARKLET_CACHE_NAAN_MAX_AGE = env("ARKLET_CACHE_NAAN_MAX_AGE")
+ARKLET_CACHE_N2T_MAX_AGE = env("ARKLET_CACHE_N2T_MAX_AGE")
+ARKLET_CACHE_NOT_FOUND_MAX_AGE = env("ARKLET_CACHE_NOT_FOUND_MAX_AGE")
+ARKLET_CACHE_BROWSER_MAX_AGE = env("ARKLET_CACHE_BROWSER_MAX_AGE")
+ARKLET_PURGER = env("ARKLET_PURGER")
+ARKLET_PURGE_URL = env("ARKLET_PURGE_URL")
+ARKLET_PURGE_HOST = env("ARKLET_PURGE_HOST")
+
+# Seconds between health checks of each read replica, per worker, and the bound on
+# replication lag: how long clients that wrote keep reading from the primary, and
+# after how long cached resolves of changed ARKs are dropped, and purged, once more
+ARKLET_REPLICA_CHECK_INTERVAL = env("ARKLET_REPLICA_CHECK_INTERVAL")
+ARKLET_REPLICA_PIN_SECONDS = env("ARKLET_REPLICA_PIN_SECONDS")
+
+# Each worker keeps the Naan table in memory for resolver fallback redirects, reloading
+# it after this many seconds. Point the snapshot setting at a copy of the global NAAN
+# registry file to redirect other organizations' ARKs to their resolvers directly.
+ARKLET_NAAN_REGISTRY_SNAPSHOT = env("ARKLET_NAAN_REGISTRY_SNAPSHOT")
+ARKLET_NAAN_REGISTRY_TTL = env("ARKLET_NAAN_REGISTRY_TTL")
+
 SENTRY_DSN = env("ARKLET_SENTRY_DSN")
 SENTRY_SAMPLE_RATE = 1 / int(env("ARKLET_SENTRY_TRANSACTIONS_PER_TRACE"))
 if SENTRY_DSN:
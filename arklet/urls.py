@@ -14,13 +14,19 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path, re_path
+from django.urls import path
 
 from ark import views
+from arklet import resolver_urls
 
 urlpatterns = [
     path("mint", views.mint_ark, name="mint_ark"),
+    path("mint/batch", views.mint_ark_batch, name="mint_ark_batch"),
     path("update", views.update_ark, name="update_ark"),
-    re_path(r"^(resolve/)?(?P<ark>ark:/?.*$)", views.resolve_ark, name="resolve_ark"),
+    path("update/batch", views.update_ark_batch, name="update_ark_batch"),
+    path("export", views.export_arks, name="export_arks"),
+    path("search", views.search_arks, name="search_arks"),
+    path("query", views.query_arks, name="query_arks"),
+    *resolver_urls.urlpatterns,
     path("admin/", admin.site.urls),
 ]
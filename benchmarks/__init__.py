@@ -0,0 +1 @@
+"""Benchmarks and load tests for Arklet. See each module for how to run it."""
@@ -0,0 +1,69 @@
+"""Compare resolve throughput and latency of Arklet under WSGI and ASGI.
+
+Start the same database-backed Arklet twice, once per server, e.g.:
+
+    gunicorn arklet.wsgi -w 4 -b 127.0.0.1:8000
+    ARKLET_ASYNC_RESOLVE=True uvicorn arklet.asgi:application --workers 4 --port 8001
+
+then drive both with the same ARKs, one per line such as `ark:/13960/t00000018`, e.g.
+as written by `python -m benchmarks.loadtest seed --arks-file arks.txt`:
+
+    python -m benchmarks.asgi_vs_wsgi arks.txt \\
+        --target wsgi=http://127.0.0.1:8000 --target asgi=http://127.0.0.1:8001 \\
+        --concurrency 200 --duration 30
+
+Results are printed as JSON, one summary per target.
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import random
+
+from benchmarks.http_load import Request, run_load
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("arks_file", help="File of ARKs to resolve, one per line")
+    parser.add_argument(
+        "--target",
+        action="append",
+        required=True,
+        metavar="NAME=URL",
+        help="A server to benchmark, may be repeated",
+    )
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--duration", type=float, default=10, help="Seconds per target")
+    parser.add_argument("--warmup", type=float, default=2, help="Seconds per target")
+    args = parser.parse_args()
+
+    with open(args.arks_file) as f:
+        arks = [line.strip() for line in f if line.strip()]
+    random.shuffle(arks)
+
+    report = {
+        "config": {
+            "arks": len(arks),
+            "concurrency": args.concurrency,
+            "duration_s": args.duration,
+        }
+    }
+    for target in args.target:
+        name, _, base_url = target.partition("=")
+        paths = itertools.cycle(arks)
+
+        def next_request():
+            return Request("GET", f"/{next(paths)}")
+
+        if args.warmup:
+            asyncio.run(run_load(base_url, next_request, args.concurrency, args.warmup))
+        report[name] = asyncio.run(
+            run_load(base_url, next_request, args.concurrency, args.duration)
+        )
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""A small HTTP/1.1 load generator with no dependencies beyond the standard library.
+
+Each simulated client holds one keep-alive connection and sends requests back to back
+until the deadline, so concurrency is the number of requests in flight.
+"""
+
+import asyncio
+import time
+from collections import Counter
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+from urllib.parse import urlsplit
+
+
+class Request(NamedTuple):
+    method: str
+    path: str
+    headers: Dict[str, str] = {}
+    body: bytes = b""
+
+
+class Result(NamedTuple):
+    latency: float  # seconds
+    status: int  # 0 when the request failed without a response
+    body: bytes
+
+
+async def run_load(
+    base_url: str,
+    next_request: Callable[[], Request],
+    concurrency: int,
+    duration: float,
+    on_result: Optional[Callable[[Request, Result], None]] = None,
+) -> Dict:
+    """Send requests to base_url for duration seconds and summarize the results."""
+    url = urlsplit(base_url)
+    host = url.hostname or "127.0.0.1"
+    port = url.port or (443 if url.scheme == "https" else 80)
+    results: List[Result] = []
+    deadline = time.perf_counter() + duration
+    start = time.perf_counter()
+    await asyncio.gather(
+        *(
+            _client(
+                host,
+                port,
+                url.scheme == "https",
+                next_request,
+                deadline,
+                results,
+                on_result,
+            )
+            for _ in range(concurrency)
+        )
+    )
+    return summarize(results, time.perf_counter() - start)
+
+
+def summarize(results: List[Result], elapsed: float) -> Dict:
+    latencies = sorted(result.latency for result in results)
+    statuses = Counter(result.status for result in results)
+    return {
+        "requests": len(results),
+        "errors": sum(
+            n for status, n in statuses.items() if status == 0 or status >= 500
+        ),
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(results) / elapsed, 1) if elapsed else None,
+        "latency_ms": {
+            "mean": _ms(sum(latencies) / len(latencies)) if latencies else None,
+            "p50": _ms(percentile(latencies, 50)),
+            "p95": _ms(percentile(latencies, 95)),
+            "p99": _ms(percentile(latencies, 99)),
+            "max": _ms(latencies[-1]) if latencies else None,
+        },
+        "statuses": {str(status): n for status, n in sorted(statuses.items())},
+    }
+
+
+def percentile(sorted_values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * pct // 100))  # ceil without floats
+    return sorted_values[int(rank) - 1]
+
+
+def _ms(seconds: Optional[float]) -> Optional[float]:
+    return None if seconds is None else round(seconds * 1000, 3)
+
+
+async def _client(host, port, ssl, next_request, deadline, results, on_result):
+    connection: Optional[Tuple[asyncio.StreamReader, asyncio.StreamWriter]] = None
+    while time.perf_counter() < deadline:
+        request = next_request()
+        start = time.perf_counter()
+        try:
+            if connection is None:
+                connection = await asyncio.open_connection(host, port, ssl=ssl or None)
+            reader, writer = connection
+            writer.write(_encode(host, request))
+            await writer.drain()
+            status, body, keep_alive = await _read_response(reader)
+        except (OSError, asyncio.IncompleteReadError, ValueError):
+            status, body, keep_alive = 0, b"", False
+        result = Result(time.perf_counter() - start, status, body)
+        results.append(result)
+        if on_result is not None:
+            on_result(request, result)
+        if not keep_alive and connection is not None:
+            connection[1].close()
+            connection = None
+    if connection is not None:
+        connection[1].close()
+
+
+def _encode(host: str, request: Request) -> bytes:
+    headers = {"Host": host, "Content-Length": str(len(request.body))}
+    headers.update(request.headers)
+    head = f"{request.method} {request.path} HTTP/1.1\r\n"
+    head += "".join(f"{name}: {value}\r\n" for name, value in headers.items())
+    return (head + "\r\n").encode("latin-1") + request.body
+
+
+async def _read_response(reader: asyncio.StreamReader) -> Tuple[int, bytes, bool]:
+    status_line = await reader.readuntil(b"\r\n")
+    status = int(status_line.split()[1])
+    headers = {}
+    while True:
+        line = await reader.readuntil(b"\r\n")
+        if line == b"\r\n":
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    if headers.get("transfer-encoding", "").lower() == "chunked":
+        body = b""
+        while True:
+            size = int((await reader.readuntil(b"\r\n")).split(b";")[0], 16)
+            chunk = await reader.readexactly(size + 2)
+            if size == 0:
+                break
+            body += chunk[:-2]
+    else:
+        body = await reader.readexactly(int(headers.get("content-length", 0)))
+    connection = headers.get("connection", "").lower()
+    if status_line.startswith(b"HTTP/1.0"):
+        keep_alive = connection == "keep-alive"
+    else:
+        keep_alive = connection != "close"
+    return status, body, keep_alive
@@ -0,0 +1,303 @@
+"""Seed a database with ARKs and load test resolving, minting and updating them.
+
+First create the schema and seed it, e.g. with a million ARKs:
+
+    python -m benchmarks.loadtest seed --arks 1000000
+
+then drive the views and print the results as JSON:
+
+    python -m benchmarks.loadtest run --concurrency 32 --duration 30 > results.json
+
+By default requests go through Django's test client in threads of this process, which
+measures the cost of Arklet and the database without a web server. With --url they go
+to a running server instead, which must use the same database. Either way, a profiling
+pass in this process counts the database queries per request first. Mint collisions
+are counted in this process too, so with --url only over the profiling pass.
+
+Configure the database as for Arklet itself, or set ARKLET_BENCHMARK_SQLITE to a file
+to use SQLite (see benchmarks.settings). Seeding is deterministic for a given --seed,
+so runs against databases seeded with the same arguments are comparable. Set
+ARKLET_RESOLVE_CACHE_SIZE=0 to measure resolving without the resolve cache.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import re
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterator, List, Optional
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "benchmarks.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.core.management import call_command  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test import Client  # noqa: E402
+
+from ark.models import Ark, Key, Naan, Shoulder  # noqa: E402
+from ark.utils import BETANUMERIC, noid_check_digit  # noqa: E402
+from benchmarks.http_load import Request, Result, run_load, summarize  # noqa: E402
+
+SCENARIOS = ["resolve", "mint", "update"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--naan", type=int, default=99999)
+    parser.add_argument("--shoulder", default="/b1")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for ARKs")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    seed = commands.add_parser("seed", help="Create the schema and seed ARKs")
+    seed.add_argument("--arks", type=int, default=100_000, help="ARKs to seed")
+    seed.add_argument("--batch-size", type=int, default=5_000)
+    seed.add_argument("--arks-file", help="Also write the seeded ARKs to this file")
+
+    run = commands.add_parser("run", help="Load test the seeded database")
+    run.add_argument("--arks", type=int, default=100_000, help="ARKs seeded")
+    run.add_argument(
+        "--scenario", action="append", choices=SCENARIOS, help="Default: all"
+    )
+    run.add_argument("--concurrency", type=int, default=16)
+    run.add_argument("--duration", type=float, default=10, help="Seconds each")
+    run.add_argument("--url", help="Base URL of a running server to load test")
+    run.add_argument(
+        "--profile-requests",
+        type=int,
+        default=200,
+        help="Requests per scenario to count queries and collisions over",
+    )
+    run.add_argument(
+        "--sample", type=int, default=100_000, help="Seeded ARKs to resolve and update"
+    )
+
+    args = parser.parse_args()
+    if args.command == "seed":
+        seed_arks(args)
+    else:
+        print(json.dumps(run_scenarios(args), indent=2))
+
+
+def seeded_arks(naan: int, shoulder: str, seed: int, count: int) -> Iterator[str]:
+    """Generate the ARKs a seed run inserts, as Ark primary keys, in the same order."""
+    rng = random.Random(seed)
+    for _ in range(count):
+        base_ark_string = f"{naan}{shoulder}{''.join(rng.choices(BETANUMERIC, k=8))}"
+        yield f"{base_ark_string}{noid_check_digit(base_ark_string)}"
+
+
+def seed_arks(args) -> None:
+    call_command("migrate", run_syncdb=True, verbosity=0)
+    naan = _benchmark_naan(args.naan, args.shoulder)
+    arks_file = open(args.arks_file, "w") if args.arks_file else None
+    prefix_length = len(f"{args.naan}{args.shoulder}")
+    start = time.perf_counter()
+    batch: List[Ark] = []
+    seeded = 0
+    for ark_string in seeded_arks(args.naan, args.shoulder, args.seed, args.arks):
+        assigned_name = ark_string[prefix_length:]
+        batch.append(
+            Ark(
+                ark=ark_string,
+                naan=naan,
+                shoulder=args.shoulder,
+                assigned_name=assigned_name,
+                url=f"https://example.org/{assigned_name}",
+            )
+        )
+        if arks_file:
+            arks_file.write(f"ark:/{ark_string}\n")
+        if len(batch) >= args.batch_size:
+            seeded += _insert(batch)
+            batch = []
+            elapsed = time.perf_counter() - start
+            print(f"{seeded} ARKs, {seeded / elapsed:.0f}/s", file=sys.stderr)
+    seeded += _insert(batch)
+    if arks_file:
+        arks_file.close()
+    elapsed = time.perf_counter() - start
+    print(f"Seeded {seeded} ARKs in {elapsed:.1f}s", file=sys.stderr)
+
+
+def _benchmark_naan(naan: int, shoulder: str) -> Naan:
+    naan_obj, _ = Naan.objects.get_or_create(
+        naan=naan,
+        defaults={
+            "name": "Benchmark",
+            "description": "ARKs seeded by benchmarks.loadtest",
+            "url": "https://example.org",
+        },
+    )
+    Shoulder.objects.get_or_create(
+        naan=naan_obj,
+        shoulder=shoulder,
+        defaults={"name": "Benchmark", "description": "Benchmark shoulder"},
+    )
+    return naan_obj
+
+
+def _insert(batch: List[Ark]) -> int:
+    Ark.objects.bulk_create(batch, ignore_conflicts=True)
+    return len(batch)
+
+
+def run_scenarios(args) -> Dict:
+    naan = _benchmark_naan(args.naan, args.shoulder)
+    key = Key.objects.create(naan=naan, active=True)
+    sample = list(
+        seeded_arks(args.naan, args.shoulder, args.seed, min(args.arks, args.sample))
+    )
+    report = {
+        "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "django": django.get_version(),
+        "database": connection.vendor,
+        "config": {
+            "naan": args.naan,
+            "shoulder": args.shoulder,
+            "seed": args.seed,
+            "arks": args.arks,
+            "concurrency": args.concurrency,
+            "duration_s": args.duration,
+            "target": args.url or "in-process",
+        },
+        "scenarios": {},
+    }
+    collisions = _CollisionCounter()
+    logging.getLogger("ark").addHandler(collisions)
+    try:
+        for scenario in args.scenario or SCENARIOS:
+            next_request = _request_factory(scenario, args, key.key, sample)
+            collisions.count = 0
+            queries = _count_queries(next_request, args.profile_requests)
+            if args.url:
+                result = asyncio.run(
+                    run_load(args.url, next_request, args.concurrency, args.duration)
+                )
+            else:
+                result = run_in_process(next_request, args.concurrency, args.duration)
+            result["queries_per_request"] = queries
+            result["collisions"] = collisions.count
+            report["scenarios"][scenario] = result
+    finally:
+        logging.getLogger("ark").removeHandler(collisions)
+        key.delete()
+    return report
+
+
+def _request_factory(
+    scenario: str, args, key: str, sample: List[str]
+) -> Callable[[], Request]:
+    rng = random.Random()
+    headers = {"Authorization": f"Bearer {key}", "Content-Type": "application/json"}
+
+    def resolve():
+        return Request("GET", f"/ark:/{rng.choice(sample)}")
+
+    def mint():
+        body = {"naan": args.naan, "shoulder": args.shoulder, "url": _url(rng)}
+        return Request("POST", "/mint", headers, json.dumps(body).encode())
+
+    def update():
+        body = {"ark": f"ark:/{rng.choice(sample)}", "url": _url(rng)}
+        return Request("PUT", "/update", headers, json.dumps(body).encode())
+
+    return {"resolve": resolve, "mint": mint, "update": update}[scenario]
+
+
+def _url(rng: random.Random) -> str:
+    return f"https://example.org/{rng.getrandbits(64):x}"
+
+
+def run_in_process(
+    next_request: Callable[[], Request], concurrency: int, duration: float
+) -> Dict:
+    """Like http_load.run_load, but through Django's test client in threads."""
+    results: List[Result] = []
+    deadline = time.perf_counter() + duration
+    start = time.perf_counter()
+
+    def client():
+        try:
+            while time.perf_counter() < deadline:
+                results.append(_send(Client(), next_request()))
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return summarize(results, time.perf_counter() - start)
+
+
+def _send(client: Client, request: Request) -> Result:
+    headers = {
+        f"HTTP_{name.upper().replace('-', '_')}": value
+        for name, value in request.headers.items()
+        if name != "Content-Type"
+    }
+    start = time.perf_counter()
+    try:
+        response = client.generic(
+            request.method,
+            request.path,
+            data=request.body,
+            content_type=request.headers.get("Content-Type", ""),
+            **headers,
+        )
+    except Exception:  # pylint: disable=broad-except
+        return Result(time.perf_counter() - start, 0, b"")
+    return Result(time.perf_counter() - start, response.status_code, b"")
+
+
+def _count_queries(
+    next_request: Callable[[], Request], requests: int
+) -> Optional[float]:
+    """Send requests one at a time, returning the mean number of queries per request."""
+    if not requests:
+        return None
+    queries = 0
+
+    def count_query(execute, sql, params, many, context):
+        nonlocal queries
+        queries += 1
+        return execute(sql, params, many, context)
+
+    client = Client()
+    with connection.execute_wrapper(count_query):
+        for _ in range(requests):
+            _send(client, next_request())
+    return round(queries / requests, 2)
+
+
+class _CollisionCounter(logging.Handler):
+    """Add up the collisions that minting reports in its log messages."""
+
+    pattern = re.compile(r"after (\d+) collision")
+
+    def __init__(self):
+        super().__init__(logging.WARNING)
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def emit(self, record: logging.LogRecord) -> None:
+        match = self.pattern.search(record.getMessage())
+        if match:
+            with self._lock:
+                self.count += int(match.group(1))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Compare per-ARK cost of minting NOIDs one at a time and in batches.
+
+Times generating random NOIDs and computing the check digits of the resulting ARKs,
+with the per-character implementations ark.utils had before generate_noids and with
+the batch ones, and prints ns per ARK as JSON:
+
+    python -m benchmarks.noids --count 1000000 --batch-size 10000
+
+Needs no database or Django settings.
+"""
+
+import argparse
+import json
+import secrets
+import time
+from typing import Callable, List
+
+from ark.utils import BETANUMERIC, generate_noids, noid_check_digit
+
+PREFIX = "13960/t"
+
+
+def legacy_generate_noid(length: int) -> str:
+    return "".join(secrets.choice(BETANUMERIC) for _ in range(length))
+
+
+def legacy_noid_check_digit(noid: str) -> str:
+    total = 0
+    for pos, char in enumerate(noid, start=1):
+        score = BETANUMERIC.find(char)
+        if score > 0:
+            total += pos * score
+    return BETANUMERIC[total % 29]
+
+
+def legacy_batch(count: int, length: int) -> List[str]:
+    noids = [legacy_generate_noid(length) for _ in range(count)]
+    return [f"{noid}{legacy_noid_check_digit(PREFIX + noid)}" for noid in noids]
+
+
+def batch(count: int, length: int) -> List[str]:
+    noids = generate_noids(count, length)
+    return [f"{noid}{noid_check_digit(PREFIX + noid)}" for noid in noids]
+
+
+def time_minting(mint: Callable, count: int, batch_size: int, length: int) -> float:
+    """ns per ARK to mint count ARKs in batches of batch_size."""
+    start = time.perf_counter_ns()
+    minted = 0
+    while minted < count:
+        minted += len(mint(min(batch_size, count - minted), length))
+    return (time.perf_counter_ns() - start) / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=1_000_000)
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    parser.add_argument("--noid-length", type=int, default=8)
+    args = parser.parse_args()
+
+    results = {"count": args.count, "batch_size": args.batch_size, "ns_per_ark": {}}
+    for name, mint in [("legacy", legacy_batch), ("batch", batch)]:
+        results["ns_per_ark"][name] = round(
+            time_minting(mint, args.count, args.batch_size, args.noid_length), 1
+        )
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""Compare ark.parsing with the split-based parse_ark it replaced.
+
+Parses synthetic ARKs, a mix of ark:/ and ark: forms with NMAs, hyphens and
+qualifiers, with each parser in turn and prints ns per ARK as JSON:
+
+    python -m benchmarks.parse_ark --count 1000000 --repeat 3
+
+Needs no database or Django settings. The legacy parser only splits out the NAAN
+and leaves hyphens and qualifiers in the name, and resolves split each ARK twice
+with it to keep the qualifier. split_ark, which resolves use now, also strips
+hyphens, and should beat the legacy resolve split and, on ARKs without hyphens, the
+legacy parser. ArkParser also splits off the qualifier into a ParsedArk and, given
+--shoulders per NAAN, the shoulder, so it is expected to take longer.
+"""
+
+import argparse
+import json
+import random
+import string
+import time
+from typing import Callable, List, Tuple
+
+from ark.parsing import ArkParser, split_ark
+
+NAANS = [13960, 12345, 99999, 1]
+NMAS = ["", "", "https://n2t.net/", "https://arks.example.org/"]
+QUALIFIERS = ["", "", "", "/page/5", ".pdf", "/a/b/c.jp2"]
+BETANUMERIC = "0123456789bcdfghjkmnpqrstvwxz"
+
+
+def legacy_parse_ark(ark: str) -> Tuple[str, int, str]:
+    """ark.utils.parse_ark before ark.parsing, kept here to benchmark against."""
+    parts = ark.split("ark:")
+    if len(parts) != 2:
+        raise ValueError("Not a valid ARK")
+    nma, ark = parts
+    ark = ark.lstrip("/")
+    parts = ark.split("/")
+    if len(parts) < 2:
+        raise ValueError("Not a valid ARK")
+    naan, assigned_name = parts[:2]
+    try:
+        naan_int = int(naan)
+    except ValueError:
+        raise ValueError("ARK NAAN must be an integer")
+
+    return nma, naan_int, assigned_name
+
+
+def legacy_parse_qualified_ark(ark: str) -> Tuple[int, str]:
+    """How resolves split ARKs before ark.parsing, qualifier included."""
+    _, naan, _ = legacy_parse_ark(ark)
+    _, name = ark.split("ark:")[1].lstrip("/").split("/", 1)
+    return naan, name
+
+
+def synthetic_arks(count: int, rng: random.Random) -> List[str]:
+    arks = []
+    for _ in range(count):
+        name = "".join(rng.choices(BETANUMERIC, k=8))
+        if rng.random() < 0.1:
+            name = f"{name[:4]}-{name[4:]}"
+        slash = "/" if rng.random() < 0.9 else ""
+        arks.append(
+            f"{rng.choice(NMAS)}ark:{slash}{rng.choice(NAANS)}/"
+            f"{name}{rng.choice(QUALIFIERS)}"
+        )
+    return arks
+
+
+def shoulders(per_naan: int, rng: random.Random) -> List[Tuple[int, str]]:
+    return [
+        (naan, "/" + "".join(rng.choices(string.ascii_lowercase, k=rng.randint(1, 3))))
+        for naan in NAANS
+        for _ in range(per_naan)
+    ]
+
+
+def time_parser(parse: Callable, arks: List[str], repeat: int) -> float:
+    """The best ns per ARK over repeat runs."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter_ns()
+        for ark in arks:
+            parse(ark)
+        best = min(best, time.perf_counter_ns() - start)
+    return best / len(arks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--shoulders", type=int, default=10, help="Per NAAN")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    arks = synthetic_arks(args.count, rng)
+    parsers = {
+        "legacy": legacy_parse_ark,
+        "legacy_resolve": legacy_parse_qualified_ark,
+        "split_ark": split_ark,
+        "ark_parser": ArkParser().parse,
+        "ark_parser_shoulders": ArkParser(shoulders(args.shoulders, rng)).parse,
+    }
+    results = {
+        "count": args.count,
+        "ns_per_ark": {
+            name: round(time_parser(parse, arks, args.repeat), 1)
+            for name, parse in parsers.items()
+        },
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,23 @@
+"""Settings for running the benchmarks, against Postgres as configured or SQLite.
+
+Set ARKLET_BENCHMARK_SQLITE to a database file to benchmark without Postgres. The ark
+app's tables are then created straight from the models, as its migrations include
+Postgres-only SQL.
+"""
+
+import os
+
+from arklet.settings import *  # noqa: F403
+
+# The Django test client used for in-process load tests sends Host: testserver
+ALLOWED_HOSTS = [*ALLOWED_HOSTS, "testserver"]  # noqa: F405
+
+if os.environ.get("ARKLET_BENCHMARK_SQLITE"):
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": os.environ["ARKLET_BENCHMARK_SQLITE"],
+            "OPTIONS": {"timeout": 30},
+        }
+    }
+    MIGRATION_MODULES = {"ark": None}
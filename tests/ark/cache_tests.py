@@ -0,0 +1,166 @@
+"""Tests for ark/cache.py, the in-process caches used by the resolver."""
+
+import json
+import logging
+import threading
+from unittest.mock import patch
+
+import pytest
+
+from ark.cache import (
+    LRUCache,
+    SharedMemoryCache,
+    log_cache_stats,
+    resolve_cache,
+    start_logging_cache_stats,
+)
+
+
+class TestLRUCache:
+    """Test the bounded LRU/TTL cache."""
+
+    def test_evicts_least_recently_used(self) -> None:
+        """The least recently read entry is evicted first when the cache is full."""
+        cache = LRUCache(maxsize=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert cache.get("c") == 3
+        assert cache.stats()["evictions"] == 1
+
+    def test_entries_expire_after_ttl(self) -> None:
+        """Entries older than the TTL are treated as misses."""
+        cache = LRUCache(maxsize=10, ttl=60)
+        with patch("ark.cache.time.monotonic", return_value=1000):
+            cache.set("a", 1)
+        with patch("ark.cache.time.monotonic", return_value=1059):
+            assert cache.get("a") == 1
+        with patch("ark.cache.time.monotonic", return_value=1061):
+            assert cache.get("a") is None
+        stats = cache.stats()
+        assert stats["expirations"] == 1
+        assert stats["size"] == 0
+
+    def test_counts_hits_and_misses(self) -> None:
+        """stats() reports hits, misses and the hit ratio."""
+        cache = LRUCache(maxsize=10)
+        cache.get("a")
+        cache.set("a", 1)
+        cache.get("a")
+        cache.get("a")
+        stats = cache.stats()
+        assert (stats["hits"], stats["misses"]) == (2, 1)
+        assert stats["hit_ratio"] == 2 / 3
+
+    def test_zero_maxsize_disables_cache(self) -> None:
+        """A maxsize of 0 never stores anything."""
+        cache = LRUCache(maxsize=0)
+        cache.set("a", 1)
+        assert cache.get("a") is None
+
+
+class TestSharedMemoryCache:
+    """Test the memory-mapped cache shared between worker processes."""
+
+    @pytest.fixture
+    def path(self, tmp_path):
+        """Path to a fresh shared cache file."""
+        return str(tmp_path / "resolve-cache")
+
+    def test_round_trip(self, path) -> None:
+        """Values are stored and returned as tuples of strings."""
+        cache = SharedMemoryCache(path, slots=16)
+        assert cache.get("1/t2a") is None
+        cache.set("1/t2a", ("bound", "https://example.com"))
+        assert cache.get("1/t2a") == ("bound", "https://example.com")
+
+    def test_shared_between_instances(self, path) -> None:
+        """Caches opened on the same file, like separate workers, share entries."""
+        worker_a = SharedMemoryCache(path, slots=16)
+        worker_b = SharedMemoryCache(path, slots=16)
+        worker_a.set("1/t2a", ("bound", "https://example.com"))
+        assert worker_b.get("1/t2a") == ("bound", "https://example.com")
+
+    def test_invalidate_drops_the_key_everywhere(self, path) -> None:
+        """Invalidating a key in one worker drops it for every worker, and only it."""
+        worker_a = SharedMemoryCache(path, slots=16)
+        worker_b = SharedMemoryCache(path, slots=16)
+        worker_a.set("1/t2a", ("bound", "https://example.com/a"))
+        worker_a.set("1/t2b", ("bound", "https://example.com/b"))
+        generation = worker_a.generation
+        worker_b.invalidate("1/t2a")
+        assert worker_a.generation == generation
+        assert worker_a.get("1/t2a") is None
+        assert worker_a.get("1/t2b") == ("bound", "https://example.com/b")
+        worker_a.set("1/t2a", ("bound", "https://example.com/new"))
+        assert worker_b.get("1/t2a") == ("bound", "https://example.com/new")
+
+    def test_clear_bumps_generation_everywhere(self, path) -> None:
+        """Clearing in one worker drops the entries seen by every worker."""
+        worker_a = SharedMemoryCache(path, slots=16)
+        worker_b = SharedMemoryCache(path, slots=16)
+        worker_a.set("1/t2a", ("bound", "https://example.com"))
+        generation = worker_a.generation
+        worker_b.clear()
+        assert worker_a.generation == generation + 1
+        assert worker_a.get("1/t2a") is None
+
+    def test_entries_expire_after_ttl(self, path) -> None:
+        """Entries older than the TTL are misses in every process, and reused first."""
+        worker_a = SharedMemoryCache(path, slots=SharedMemoryCache.WAYS, ttl=1)
+        worker_b = SharedMemoryCache(path, slots=SharedMemoryCache.WAYS, ttl=1)
+        with patch("ark.cache.time.time", return_value=1000.0):
+            for i in range(SharedMemoryCache.WAYS):
+                worker_a.set(f"1/t2{i}", ("bound", "https://example.com/"))
+        with patch("ark.cache.time.time", return_value=1000.5):
+            assert worker_b.get("1/t20") == ("bound", "https://example.com/")
+        with patch("ark.cache.time.time", return_value=1001.5):
+            assert worker_b.get("1/t20") is None
+            worker_b.set("1/t2new", ("unbound", ""))
+            assert worker_a.get("1/t2new") == ("unbound", "")
+        assert worker_b.stats()["expirations"] == 1
+        assert worker_b.stats()["evictions"] == 0
+
+    def test_full_bucket_evicts(self, path) -> None:
+        """A single bucket holds WAYS entries before evicting."""
+        cache = SharedMemoryCache(path, slots=SharedMemoryCache.WAYS)
+        for i in range(SharedMemoryCache.WAYS + 1):
+            cache.set(f"1/t2{i}", ("unbound", ""))
+        stored = sum(
+            cache.get(f"1/t2{i}") is not None for i in range(SharedMemoryCache.WAYS + 1)
+        )
+        assert stored == SharedMemoryCache.WAYS
+        assert cache.stats()["evictions"] == 1
+
+    def test_oversized_entries_are_not_cached(self, path) -> None:
+        """Entries larger than a slot are skipped rather than truncated."""
+        cache = SharedMemoryCache(path, slots=16, slot_size=64)
+        cache.set("1/t2a", ("bound", "https://example.com/" + "x" * 100))
+        assert cache.get("1/t2a") is None
+
+
+def test_log_cache_stats(caplog) -> None:
+    """Every cache's counters are logged, for sizing caches against real traffic."""
+    misses = resolve_cache.stats()["misses"]
+    resolve_cache.get("1/t2missing")
+    with caplog.at_level(logging.INFO, logger="ark.cache"):
+        log_cache_stats()
+    logged = {record.args[0]: json.loads(record.args[2]) for record in caplog.records}
+    assert set(logged) == {"resolve", "shoulder", "key", "replica_pin"}
+    assert logged["resolve"]["misses"] == misses + 1
+
+
+def test_cache_stats_are_logged_periodically(caplog) -> None:
+    logged = threading.Event()
+    with patch("ark.cache.os.register_at_fork") as register_at_fork, patch(
+        "ark.cache.log_cache_stats", side_effect=logged.set
+    ):
+        stop = start_logging_cache_stats(0.01)
+        try:
+            assert logged.wait(timeout=5)
+        finally:
+            stop.set()
+    register_at_fork.assert_called_once()
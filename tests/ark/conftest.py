@@ -0,0 +1,72 @@
+"""Shared pytest fixtures for the ark app tests."""
+
+import pytest
+
+from ark.cache import key_cache, replica_pin_cache, resolve_cache, shoulder_cache
+from ark.minting import release_sequence_blocks
+from ark.models import Ark, Key, Naan, Shoulder
+from ark.naan_registry import naan_registry
+
+IN_PROCESS_CACHES = (key_cache, replica_pin_cache, resolve_cache, shoulder_cache)
+
+
+@pytest.fixture(autouse=True)
+def primary_database(settings):
+    """Read from the primary database, even with read replicas configured.
+
+    Replica connections can't see rows written inside a test's transaction. See
+    replicas_tests.py for tests of the replica router.
+    """
+    settings.DATABASE_ROUTERS = []
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    """Start every test with empty in-process caches and sequence blocks.
+
+    Test database transactions are rolled back between tests without firing the
+    signals that normally invalidate these caches.
+    """
+    for cache in IN_PROCESS_CACHES:
+        cache.clear()
+    naan_registry.invalidate()
+    release_sequence_blocks()
+    yield
+    for cache in IN_PROCESS_CACHES:
+        cache.clear()
+    naan_registry.invalidate()
+    release_sequence_blocks()
+
+
+@pytest.fixture
+def naan(db):
+    """Create the initial NAAN used for most tests."""
+    return Naan.objects.create(
+        naan=1, name="Archive", description="A NAAN", url="https://example.com"
+    )
+
+
+@pytest.fixture
+def shoulder(db, naan):
+    """Create an initial shoulder used for most tests."""
+    return Shoulder.objects.create(
+        shoulder="/t2", naan=naan, name="Test", description="A Shoulder"
+    )
+
+
+@pytest.fixture
+def auth(db, naan):
+    """Create an access key for the initial naan."""
+    key = Key.objects.create(naan=naan, active=True)
+    return f"Bearer {key.key}"
+
+
+@pytest.fixture
+def ark(db, naan, shoulder):
+    """Create an ARK for tests."""
+    return Ark.objects.create(
+        ark=f"{naan.naan}{shoulder.shoulder}12346",
+        naan=naan,
+        shoulder=shoulder.shoulder,
+        assigned_name="12346",
+    )
@@ -0,0 +1,127 @@
+"""Tests for ark/export.py and the exportarks management command."""
+
+import csv
+import gzip
+import json
+from unittest.mock import patch
+
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+from ark.export import export_pages
+from ark.management.commands import exportarks
+from ark.models import Ark, Naan
+
+
+@pytest.fixture
+def arks(naan):
+    """Create 5 ARKs under the initial NAAN and 2 under another one."""
+    other = Naan.objects.create(
+        naan=2, name="Other", description="", url="https://example.org"
+    )
+    created = [
+        Ark.objects.create(
+            ark=f"1/t2{i}",
+            naan=naan,
+            shoulder="/t2",
+            assigned_name=str(i),
+            url=f"https://example.com/{i}",
+            metadata={"what": 'quotes " and, commas\nand newlines'},
+        )
+        for i in range(5)
+    ]
+    for i in range(2):
+        Ark.objects.create(
+            ark=f"2/x{i}", naan=other, shoulder="/x", assigned_name=str(i)
+        )
+    return created
+
+
+@pytest.mark.django_db
+def test_export_pages_keyset(arks) -> None:
+    """Pages follow each other in ARK order and filter by NAAN and shoulder."""
+    pages = list(export_pages(page_size=3))
+    assert [len(page) for page in pages] == [3, 3, 1]
+    exported = [row["ark"] for page in pages for row in page]
+    assert exported == sorted(exported)
+    assert exported[-2:] == ["2/x0", "2/x1"]
+
+    [page] = export_pages(naan=1, after="1/t22")
+    assert [row["ark"] for row in page] == ["1/t23", "1/t24"]
+    assert page[0]["naan"] == 1
+    assert page[0]["url"] == "https://example.com/3"
+    assert [row["ark"] for page in export_pages(shoulder="/x") for row in page] == [
+        "2/x0",
+        "2/x1",
+    ]
+
+
+@pytest.mark.django_db
+def test_export_jsonl_gz(arks, tmp_path) -> None:
+    path = tmp_path / "arks.jsonl.gz"
+    call_command("exportarks", str(path), "--naan", "1", "--page-size", "2")
+    with gzip.open(path, "rt") as f:
+        rows = [json.loads(line) for line in f]
+    assert [row["ark"] for row in rows] == [f"1/t2{i}" for i in range(5)]
+    assert rows[0]["metadata"] == {"what": 'quotes " and, commas\nand newlines'}
+
+
+@pytest.mark.django_db
+def test_export_csv(arks, tmp_path) -> None:
+    path = tmp_path / "arks.csv"
+    call_command("exportarks", str(path), "--shoulder", "/t2")
+    with open(path, newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert len(rows) == 5
+    assert rows[4]["ark"] == "1/t24"
+    assert json.loads(rows[4]["metadata"]) == {
+        "what": 'quotes " and, commas\nand newlines'
+    }
+
+
+@pytest.mark.django_db
+def test_export_resumes_from_cursor(arks, tmp_path) -> None:
+    """A rerun continues after the last checkpoint, dropping anything written later."""
+    expected = tmp_path / "expected.jsonl"
+    call_command("exportarks", str(expected))
+    path = tmp_path / "arks.jsonl.gz"
+    cursor = tmp_path / "cursor.json"
+    options = ["--page-size", "2", "--checkpoint-pages", "1", "--cursor", str(cursor)]
+
+    encode = exportarks._encode
+    calls = []
+
+    def fail_on_third_page(page, export_format):
+        calls.append(page)
+        if len(calls) == 3:
+            raise OSError("disk full")
+        return encode(page, export_format)
+
+    with patch.object(exportarks, "_encode", fail_on_third_page):
+        with pytest.raises(OSError):
+            call_command("exportarks", str(path), *options)
+    assert json.loads(cursor.read_text())["rows"] == 4
+
+    call_command("exportarks", str(path), *options)
+    with gzip.open(path, "rt") as f:
+        assert f.read() == expected.read_text()
+    assert json.loads(cursor.read_text())["rows"] == 7
+
+    # Options must match the export being resumed
+    with pytest.raises(CommandError):
+        call_command("exportarks", str(path), "--format", "csv", *options)
+
+
+@pytest.mark.django_db
+def test_export_since(arks, tmp_path) -> None:
+    """--since only exports ARKs updated since then, interpreted as UTC."""
+    Ark.objects.filter(ark="1/t23").update(updated_at="2030-01-01T12:00Z")
+    path = tmp_path / "arks.csv"
+    call_command("exportarks", str(path), "--since", "2030-01-01T11:00")
+    with open(path, newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert [row["ark"] for row in rows] == ["1/t23"]
+    assert rows[0]["updated_at"] == "2030-01-01T12:00:00Z"
+    with pytest.raises(CommandError):
+        call_command("exportarks", str(path), "--since", "soon")
@@ -0,0 +1,183 @@
+"""Tests for ark/minting.py and the replenishpool and mintarks management commands."""
+
+import json
+from unittest.mock import patch
+
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+from ark.minting import claim_pooled_arks, existing_arks, mint_arks, replenish_pool
+from ark.models import Ark, PoolArk, Shoulder
+from ark.utils import noid_check_digit
+
+
+@pytest.fixture
+def pool_shoulder(shoulder) -> Shoulder:
+    """Switch the initial shoulder to pool minting."""
+    shoulder.minting_mode = Shoulder.POOL
+    shoulder.save()
+    return shoulder
+
+
+def mint_request(naan, shoulder) -> dict:
+    """A cleaned mint request for the given NAAN and shoulder."""
+    return {
+        "naan": naan.naan,
+        "shoulder": shoulder.shoulder,
+        "url": "",
+        "metadata": {},
+        "commitment": "",
+    }
+
+
+class TestArkPool:
+    """Test minting from pools of pre-minted ARKs."""
+
+    @pytest.mark.django_db
+    def test_replenish_fills_pool_to_target(self, pool_shoulder) -> None:
+        """replenish_pool adds unique, check-digited ARKs up to the target."""
+        assert replenish_pool(pool_shoulder, 50) == 50
+        assert replenish_pool(pool_shoulder, 50) == 0
+        pool_arks = PoolArk.objects.all()
+        assert len({pool_ark.ark for pool_ark in pool_arks}) == 50
+        for pool_ark in pool_arks:
+            assert pool_ark.ark == f"1/t2{pool_ark.assigned_name}"
+
+    @pytest.mark.django_db
+    def test_replenish_counts_only_inserted_arks(self, pool_shoulder) -> None:
+        """ARKs that another replenisher pooled first aren't counted as added."""
+        replenish_pool(pool_shoulder, 1)
+        pooled = PoolArk.objects.get().ark
+        with patch("ark.minting._new_ark_strings", return_value=[pooled, "1/t2new"]):
+            assert replenish_pool(pool_shoulder, 3) == 1
+        assert PoolArk.objects.count() == 2
+
+    @pytest.mark.django_db
+    def test_mint_claims_from_pool(self, naan, pool_shoulder) -> None:
+        """Minting on a pool shoulder takes ARKs out of the pool."""
+        replenish_pool(pool_shoulder, 5)
+        pooled = set(PoolArk.objects.values_list("ark", flat=True))
+        arks = mint_arks(naan, [mint_request(naan, pool_shoulder)] * 3)
+        assert {ark.ark for ark in arks} <= pooled
+        assert PoolArk.objects.count() == 2
+        assert Ark.objects.filter(ark__in=pooled).count() == 3
+
+    @pytest.mark.django_db
+    def test_pooled_arks_are_not_checked_again(self, naan, pool_shoulder) -> None:
+        """replenish_pool already checked pooled ARKs against the Ark table."""
+        replenish_pool(pool_shoulder, 1)
+        with patch("ark.minting.existing_arks", wraps=existing_arks) as check:
+            mint_arks(naan, [mint_request(naan, pool_shoulder)] * 2)
+        [(unchecked,)] = [call[0] for call in check.call_args_list]
+        assert len(unchecked) == 1  # the one minted randomly once the pool ran dry
+        assert not PoolArk.objects.exists()
+
+    @pytest.mark.django_db
+    def test_claims_are_not_reused(self, naan, pool_shoulder) -> None:
+        """Claimed ARKs leave the pool even if they're never created."""
+        replenish_pool(pool_shoulder, 2)
+        first = claim_pooled_arks(pool_shoulder, 1)
+        second = claim_pooled_arks(pool_shoulder, 5)
+        assert len(first) == 1 and len(second) == 1
+        assert first != second
+
+    @pytest.mark.django_db
+    def test_empty_pool_falls_back_to_random(self, naan, pool_shoulder) -> None:
+        """Minting still succeeds when the pool has run dry."""
+        [ark] = mint_arks(naan, [mint_request(naan, pool_shoulder)])
+        assert ark.ark.startswith("1/t2")
+
+
+class TestReplenishPoolCommand:
+    """Test the replenishpool management command."""
+
+    @pytest.mark.django_db
+    def test_refills_pools_below_low_water(self, capsys, pool_shoulder) -> None:
+        """replenishpool tops up pools that are below the low-water mark."""
+        call_command("replenishpool", "--low-water", "5", "--target", "10")
+        assert PoolArk.objects.count() == 10
+
+    @pytest.mark.django_db
+    def test_status_reports_depth(self, capsys, pool_shoulder) -> None:
+        """replenishpool --status prints depths and fails below low water."""
+        replenish_pool(pool_shoulder, 3)
+        with pytest.raises(CommandError):
+            call_command("replenishpool", "--status", "--low-water", "5")
+        [line] = capsys.readouterr().out.splitlines()
+        assert json.loads(line) == {
+            "naan": 1,
+            "shoulder": "/t2",
+            "depth": 3,
+            "low_water": 5,
+        }
+        call_command("replenishpool", "--status", "--low-water", "3")
+
+
+class TestMintArksCommand:
+    """Test the mintarks management command."""
+
+    @pytest.mark.django_db
+    def test_mints_check_digited_arks_in_batches(self, capsys, naan) -> None:
+        """mintarks mints the requested number of ARKs with check digits and URLs."""
+        call_command(
+            "mintarks",
+            "25",
+            "1",
+            "/x1",
+            "--batch-size",
+            "10",
+            "--url-template",
+            "https://example.org/{assigned_name}",
+        )
+        arks = Ark.objects.filter(shoulder="/x1")
+        assert arks.count() == 25
+        for ark in arks:
+            assert ark.ark == f"1/x1{ark.assigned_name}"
+            assert len(ark.assigned_name) == 9
+            assert noid_check_digit(ark.ark[:-1]) == ark.ark[-1]
+            assert ark.url == f"https://example.org/{ark.assigned_name}"
+        assert "Successfully minted 25 ARKs" in capsys.readouterr().out
+
+    @pytest.mark.django_db
+    def test_tops_up_collisions(self, capsys, naan) -> None:
+        """ARKs lost to collisions are minted again until the count is reached."""
+        with patch(
+            "ark.management.commands.mintarks.generate_noids",
+            side_effect=[["00000000", "00000000"], ["00000001"]],
+        ):
+            call_command("mintarks", "2", "1", "/x1")
+        assert Ark.objects.filter(shoulder="/x1").count() == 2
+        assert "after 1 collision(s)" in capsys.readouterr().out
+
+    @pytest.mark.django_db
+    def test_counts_only_inserted_arks(self, capsys, naan) -> None:
+        """ARKs another minter created after the existing check aren't counted."""
+        taken = f"1/x100000000{noid_check_digit('1/x100000000')}"
+        Ark.objects.create(ark=taken, naan=naan, shoulder="/x1", assigned_name="x")
+        checks = []
+
+        def racing_existing_arks(ark_strings):
+            # The first check runs before the other minter created its ARK
+            checks.append(ark_strings)
+            return [] if len(checks) == 1 else existing_arks(ark_strings)
+
+        with patch(
+            "ark.management.commands.mintarks.generate_noids",
+            side_effect=[["00000000", "00000001"], ["00000002"]],
+        ), patch(
+            "ark.management.commands.mintarks.existing_arks",
+            side_effect=racing_existing_arks,
+        ):
+            call_command("mintarks", "2", "1", "/x1")
+        assert Ark.objects.filter(shoulder="/x1").count() == 3
+        assert "Successfully minted 2 ARKs" in capsys.readouterr().out
+
+    @pytest.mark.django_db
+    def test_gives_up_when_shoulder_is_full(self, capsys, naan) -> None:
+        # All zero random bytes make every NOID "00000000"
+        with patch("secrets.token_bytes", side_effect=bytes):
+            call_command("mintarks", "1", "1", "/x1")
+            with pytest.raises(CommandError, match="Gave up"):
+                call_command("mintarks", "1", "1", "/x1")
+        assert Ark.objects.filter(shoulder="/x1").count() == 1
@@ -0,0 +1,73 @@
+"""Tests for ark/naan_registry.py, the in-memory NAAN registry used by the resolver."""
+
+import pytest
+
+from ark.models import Naan
+from ark.naan_registry import load_snapshot, naan_registry, parse_naan_registry
+
+REGISTRY = """\
+# NAAN registry excerpt
+naa:
+who:    Internet Archive (=) IA
+what:   13960
+when:   2007.10.15
+where:  https://archive.org/
+how:    NP | (:unkn) unknown | 2007 |
+
+naa:
+who:    No Resolver
+what:   99998
+where:  (:unkn)
+
+naa:
+who:    Example
+what:   99999
+where:  https://example.org
+  continued: lines are ignored
+"""
+
+
+def test_parse_naan_registry() -> None:
+    """Only NAA records with a resolver URL are kept."""
+    urls = parse_naan_registry(REGISTRY.splitlines())
+    assert urls == {13960: "https://archive.org", 99999: "https://example.org"}
+
+
+class TestNaanFallback:
+    """Test resolver fallback redirects through the NAAN registry."""
+
+    @pytest.mark.django_db
+    def test_fallback_skips_naan_query(
+        self, client, django_assert_num_queries, naan
+    ) -> None:
+        """Once loaded, the registry answers NAAN fallbacks without a query."""
+        naan_registry.get(naan.naan)
+        with django_assert_num_queries(1):  # the Ark lookup
+            res = client.get(f"/ark:/{naan.naan}/t2unknown")
+        assert res["Location"] == f"{naan.url}/ark:/{naan.naan}/t2unknown"
+
+    @pytest.mark.django_db
+    def test_naan_changes_reload_registry(self, client, naan) -> None:
+        """Saving a Naan takes effect on the next fallback redirect."""
+        client.get(f"/ark:/{naan.naan}/t2unknown")
+        naan.url = "https://example.net"
+        naan.save()
+        res = client.get(f"/ark:/{naan.naan}/t2unknown")
+        assert res["Location"] == f"https://example.net/ark:/{naan.naan}/t2unknown"
+        Naan.objects.create(
+            naan=2, name="New", description="Another NAAN", url="https://new.example"
+        )
+        res = client.get("/ark:/2/t2unknown")
+        assert res["Location"] == "https://new.example/ark:/2/t2unknown"
+
+    @pytest.mark.django_db
+    def test_snapshot_skips_n2t(self, client, settings, tmp_path, naan) -> None:
+        """NAANs from the registry snapshot redirect to their own resolver."""
+        snapshot = tmp_path / "main_naans"
+        snapshot.write_text(REGISTRY)
+        settings.ARKLET_NAAN_REGISTRY_SNAPSHOT = str(snapshot)
+        load_snapshot.cache_clear()
+        res = client.get("/ark:/13960/t00000018")
+        assert res["Location"] == "https://archive.org/ark:/13960/t00000018"
+        res = client.get("/ark:/12345/t00000018")
+        assert res["Location"] == "https://n2t.net/ark:/12345/t00000018"
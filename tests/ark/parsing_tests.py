@@ -0,0 +1,74 @@
+"""Tests for ark/parsing.py, the ARK parser and normalizer."""
+
+import pytest
+
+from ark.parsing import ArkParser, ParsedArk, parse, split_ark
+
+
+@pytest.mark.parametrize(
+    "ark,expected",
+    [
+        ("ark:/13960/t2abc", ParsedArk("", 13960, "t2abc")),
+        ("ark:13960/t2abc", ParsedArk("", 13960, "t2abc")),
+        ("ARK://13960/t2abc ", ParsedArk("", 13960, "t2abc")),
+        (
+            "https://n2t.net/ark:/13960/t2-ab-c/page-5/x.jp2",
+            ParsedArk("https://n2t.net/", 13960, "t2abc", "/page-5/x.jp2"),
+        ),
+        ("ark:/13960/t2abc.pdf", ParsedArk("", 13960, "t2abc", ".pdf")),
+    ],
+)
+def test_parse(ark, expected) -> None:
+    """Both ARK forms and NMAs parse, hyphens go and qualifiers are split off."""
+    assert parse(ark) == expected
+
+
+@pytest.mark.parametrize(
+    "ark", ["13960/t2abc", "ark:/13960", "ark:/13960/", "ark:/x/t2abc", "ark:/1/--/a"]
+)
+def test_invalid(ark) -> None:
+    with pytest.raises(ValueError):
+        parse(ark)
+
+
+def test_parsed_ark() -> None:
+    parsed = parse("ark:/13960/t2abc/page/5")
+    assert parsed.key == "13960/t2abc"
+    assert str(parsed) == "ark:/13960/t2abc/page/5"
+    assert parsed.blade is None
+    with pytest.raises(AttributeError):
+        parsed.extra = 1  # __slots__, no instance dict
+
+
+def test_shoulders() -> None:
+    """The longest known shoulder of the ARK's NAAN is split off."""
+    parser = ArkParser([(13960, "/f"), (13960, "/fk"), (1, "/t2")])
+    parsed = parser.parse("ark:/13960/fk4abc")
+    assert (parsed.shoulder, parsed.blade) == ("/fk", "4abc")
+    assert parser.parse("ark:/13960/f4abc").shoulder == "/f"
+    assert parser.parse("ark:/13960/t2abc").shoulder is None
+    assert parser.parse("ark:/1/t2abc").blade == "abc"
+
+
+@pytest.mark.parametrize(
+    "ark",
+    [
+        "ark:/13960/t2abc",
+        "ark:13960/t2abc/page/5.jp2",
+        "https://n2t.net/ark:/13960/t2-ab-c/page-5/x.jp2",
+        "ark:/13960/t2-abc.pdf",
+        "ARK://13960/t2abc ",
+    ],
+)
+def test_split_ark(ark) -> None:
+    """split_ark gives the same NAAN and qualified name as parse."""
+    parsed = parse(ark)
+    assert split_ark(ark) == (parsed.naan, parsed.name + parsed.qualifier)
+
+
+@pytest.mark.parametrize(
+    "ark", ["13960/t2abc", "ark:/13960/", "ark:/x/t2abc", "ark:/1/--/a", "ark:/1/.a"]
+)
+def test_split_ark_invalid(ark) -> None:
+    with pytest.raises(ValueError):
+        split_ark(ark)
@@ -0,0 +1,158 @@
+"""Tests for ark/purge.py and the purges fired when ARKs are rebound."""
+
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from unittest.mock import patch
+
+import pytest
+
+from ark.models import Ark
+from ark.purge import HTTPPurger, get_purger, purge, purge_queue
+
+
+@pytest.fixture
+def purger():
+    """A purger that records the batches of ARKs purges are sent for."""
+    with patch("ark.purge.get_purger") as get_purger_mock:
+        yield get_purger_mock.return_value
+
+
+@pytest.fixture
+def purged(purger):
+    """Wait for queued purges, then list the ARKs they were sent for."""
+
+    def sent():
+        assert purge_queue.flush(timeout=5)
+        return [ark for call in purger.purge.call_args_list for ark in call[0][0]]
+
+    return sent
+
+
+@pytest.fixture
+def proxy():
+    """A caching proxy stand-in that records the PURGE requests it receives."""
+    requests = []
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_PURGE(self):  # pylint: disable=invalid-name
+            requests.append((self.path, self.headers["Host"]))
+            self.send_response(404 if "resolve" in self.path else 200)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}", requests
+    server.shutdown()
+    server.server_close()
+
+
+def test_http_purger(settings, proxy) -> None:
+    """HTTPPurger purges every URL an ARK resolves at, over one connection."""
+    url, requests = proxy
+    settings.ARKLET_PURGE_URL = url
+    settings.ARKLET_PURGE_HOST = "arks.example.org"
+    HTTPPurger().purge(["1/t212346"])
+    assert requests == [
+        ("/ark:/1/t212346", "arks.example.org"),
+        ("/ark:1/t212346", "arks.example.org"),
+        ("/resolve/ark:/1/t212346", "arks.example.org"),
+        ("/resolve/ark:1/t212346", "arks.example.org"),
+    ]
+
+
+def test_purge_failures_are_logged(settings, caplog) -> None:
+    settings.ARKLET_PURGE_URL = "http://127.0.0.1:1"
+    with patch("ark.purge.get_purger", return_value=HTTPPurger()):
+        purge(["1/t212346"])
+        assert purge_queue.flush(timeout=5)
+    assert "Couldn't purge 1 ARK(s)" in caplog.text
+
+
+def test_default_purger_does_nothing() -> None:
+    get_purger.cache_clear()
+    get_purger().purge(["1/t212346"])
+
+
+@pytest.mark.django_db
+def test_rebinding_purges_on_commit(
+    purged, ark, django_capture_on_commit_callbacks
+) -> None:
+    """Saves purge an ARK once committed, and only if its URL changed."""
+    ark = Ark.objects.get(pk=ark.pk)
+    with django_capture_on_commit_callbacks(execute=True):
+        ark.commitment = "Forever"
+        ark.save()
+    assert purged() == []
+    with django_capture_on_commit_callbacks(execute=False) as callbacks:
+        ark.url = "https://example.com/new"
+        ark.save()
+    assert purged() == []
+    for callback in callbacks:
+        callback()
+    assert purged() == [ark.ark]
+    key = ark.ark
+    with django_capture_on_commit_callbacks(execute=True):
+        ark.save()
+        ark.delete()
+    assert purged() == [key, key]
+
+
+@pytest.mark.django_db
+def test_new_arks_are_not_purged(
+    purged, naan, django_capture_on_commit_callbacks
+) -> None:
+    with django_capture_on_commit_callbacks(execute=True):
+        Ark.objects.create(
+            ark="1/t2new", naan=naan, shoulder="/t2", assigned_name="new", url="x"
+        )
+    assert purged() == []
+
+
+def test_purges_are_sent_in_batches(purger, purged) -> None:
+    """Purges queued while one is being sent go out together, once per ARK."""
+    release = threading.Event()
+    purger.purge.side_effect = lambda arks: release.wait(5)
+    purge(["1/t2a"])
+    purge(["1/t2b", "1/t2c"])
+    purge(["1/t2b"])
+    release.set()
+    purged()
+    batches = [call[0][0] for call in purger.purge.call_args_list]
+    assert batches in (
+        [["1/t2a"], ["1/t2b", "1/t2c"]],
+        [["1/t2a", "1/t2b", "1/t2c"]],
+    )
+
+
+@pytest.mark.django_db
+def test_batch_update_purges_rebound_arks(
+    purged, client, auth, ark, django_capture_on_commit_callbacks
+) -> None:
+    Ark.objects.create(
+        ark="1/t212347",
+        naan=ark.naan,
+        shoulder="/t2",
+        assigned_name="12347",
+        url="https://example.com/same",
+    )
+    with django_capture_on_commit_callbacks(execute=True):
+        res = client.put(
+            "/update/batch",
+            data={
+                "arks": [
+                    {"ark": f"ark:/{ark.ark}", "url": "https://example.com/new"},
+                    {"ark": "ark:/1/t212347", "url": "https://example.com/same"},
+                ]
+            },
+            content_type="application/json",
+            HTTP_AUTHORIZATION=auth,
+        )
+    assert res.status_code == 200
+    assert purged() == [ark.ark]
@@ -0,0 +1,206 @@
+"""Tests for ark/replicas.py, routing reads made while serving requests to replicas.
+
+The router tests only look at which database alias queries would use. To also
+resolve ARKs through a second database, configure one, e.g. with
+ARKLET_POSTGRES_REPLICA_HOSTS=127.0.0.1 which mirrors the default database in tests.
+"""
+
+import json
+from unittest.mock import patch
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.conf import settings as django_settings
+from django.db import connections
+from django.http import HttpResponse
+from django.test.utils import CaptureQueriesContext
+
+from ark.auth import authenticate
+from ark.cache import resolve_cache
+from ark.models import Ark
+from ark.replicas import (
+    PIN_COOKIE,
+    DelayedCalls,
+    ReplicaRouter,
+    check_replica,
+    replica_pin_middleware,
+)
+from ark.resolver import BOUND
+from ark.views import update_ark_batch
+
+
+@pytest.fixture
+def check():
+    with patch("ark.replicas.check_replica", return_value=True) as check:
+        yield check
+
+
+@pytest.fixture
+def router(check):
+    return ReplicaRouter(["replica1", "replica2"])
+
+
+def serve(request, view):
+    """Serve a request with view behind replica_pin_middleware."""
+    return replica_pin_middleware(lambda request: view())(request)
+
+
+def reads(router, count=1):
+    return [router.db_for_read(Ark) for _ in range(count)]
+
+
+def test_round_robin(rf, router) -> None:
+    """Reads while serving a safe request alternate between replicas."""
+    aliases = []
+    serve(rf.get("/"), lambda: aliases.extend(reads(router, 3)) or HttpResponse())
+    assert aliases == ["replica1", "replica2", "replica1"]
+
+
+def test_outside_requests(router) -> None:
+    assert reads(router) == ["default"]
+    assert router.db_for_write(Ark) == "default"
+
+
+def test_unhealthy_replicas_are_skipped(rf, router, check) -> None:
+    aliases = []
+    check.side_effect = lambda alias: alias == "replica2"
+    serve(rf.get("/"), lambda: aliases.extend(reads(router, 2)) or HttpResponse())
+    assert aliases == ["replica2", "replica2"]
+    # Health checks are cached for ARKLET_REPLICA_CHECK_INTERVAL
+    assert check.call_count == 2
+    check.side_effect = lambda alias: False
+    router.check_interval = 0
+    serve(rf.get("/"), lambda: aliases.extend(reads(router)) or HttpResponse())
+    assert aliases[-1] == "default"
+
+
+def test_unsafe_methods_use_primary(rf, router) -> None:
+    aliases = []
+    serve(rf.post("/"), lambda: aliases.extend(reads(router)) or HttpResponse())
+    assert aliases == ["default"]
+
+
+def test_read_after_write(rf, router) -> None:
+    """Requests read from the primary after writing, and so do the next ones."""
+    aliases = []
+
+    def view():
+        aliases.extend(reads(router))
+        router.db_for_write(Ark)
+        aliases.extend(reads(router))
+        return HttpResponse()
+
+    auth = {"HTTP_AUTHORIZATION": "Bearer key"}
+    res = serve(rf.get("/", **auth), view)
+    assert aliases == ["replica1", "default"]
+    assert res.cookies[PIN_COOKIE]["max-age"] == 10
+
+    def read_view():
+        aliases.extend(reads(router))
+        return HttpResponse()
+
+    request = rf.get("/")
+    request.COOKIES[PIN_COOKIE] = "1"
+    serve(request, read_view)
+    serve(rf.get("/", **auth), read_view)
+    serve(rf.get("/", HTTP_AUTHORIZATION="Bearer other"), read_view)
+    assert aliases[2:] == ["default", "default", "replica2"]
+
+
+@pytest.mark.django_db
+def test_read_after_streamed_write(rf, router, settings, auth, ark) -> None:
+    """Streamed batch updates write after the middleware returns, and still pin."""
+    settings.DATABASE_ROUTERS = [router]
+    line = {"ark": f"ark:/{ark.ark}", "url": "https://example.com/new"}
+    request = rf.put(
+        "/update/batch",
+        data=json.dumps(line),
+        content_type="application/x-ndjson",
+        HTTP_AUTHORIZATION=auth,
+    )
+    res = replica_pin_middleware(update_ark_batch)(request)
+    assert res.cookies[PIN_COOKIE]["max-age"] == 10
+    assert json.loads(b"".join(res.streaming_content))["status"] == "updated"
+
+    aliases = []
+    read_request = rf.get("/", HTTP_AUTHORIZATION=auth)
+    serve(read_request, lambda: aliases.extend(reads(router)) or HttpResponse())
+    assert aliases == ["default"]
+
+
+def test_async_requests(rf, router) -> None:
+    aliases = []
+
+    async def view(request):
+        aliases.extend(reads(router))
+        return HttpResponse()
+
+    async_to_sync(replica_pin_middleware(view))(rf.get("/"))
+    assert aliases == ["replica1"]
+
+
+def test_delayed_calls() -> None:
+    calls = []
+    delayed_calls = DelayedCalls()
+    delayed_calls.call_later(0.05, lambda: calls.append("later"))
+    delayed_calls.call_later(0, lambda: 1 / 0)  # logged, and doesn't stop the thread
+    delayed_calls.call_later(0, lambda: calls.append("now"))
+    assert delayed_calls.flush(timeout=5)
+    assert calls == ["now", "later"]
+
+
+@pytest.mark.django_db
+def test_changes_are_invalidated_after_replica_lag(
+    settings, ark, django_capture_on_commit_callbacks
+) -> None:
+    """Resolves re-cached from a lagging replica are dropped after the lag bound."""
+    settings.ARKLET_DATABASE_REPLICAS = ["replica1"]
+    with patch("ark.replicas.delayed_calls") as delayed_calls:
+        with django_capture_on_commit_callbacks(execute=True):
+            ark.url = "https://example.com/new"
+            ark.save()
+        resolve_cache.set(ark.ark, (BOUND, "https://example.com/old"))
+        [(delay, invalidate)] = [c[0] for c in delayed_calls.call_later.call_args_list]
+        assert delay == settings.ARKLET_REPLICA_PIN_SECONDS
+        invalidate()
+    assert resolve_cache.get(ark.ark) is None
+
+
+@pytest.mark.django_db
+def test_keys_are_read_from_the_primary(rf, router, settings, auth, naan) -> None:
+    """New keys work right away, even if replicas haven't replayed them yet."""
+    settings.DATABASE_ROUTERS = [router]
+    authenticated = []
+
+    def view():
+        authenticated.append(authenticate(auth.split()[1]))
+        return HttpResponse()
+
+    serve(rf.get("/"), view)
+    assert authenticated == [(naan, True)]
+
+
+def test_migrations_only_run_on_the_primary(router) -> None:
+    assert router.allow_migrate("replica1", "ark") is False
+    assert router.allow_migrate("default", "ark") is None
+
+
+@pytest.mark.django_db
+def test_check_replica() -> None:
+    assert check_replica("default")
+
+
+@pytest.mark.skipif(
+    not getattr(django_settings, "ARKLET_DATABASE_REPLICAS", []),
+    reason="No read replica configured",
+)
+@pytest.mark.django_db(transaction=True, databases="__all__")
+def test_resolves_read_from_replica(client, settings, ark) -> None:
+    """With a real second database, resolves read from it and mints don't."""
+    settings.DATABASE_ROUTERS = ["ark.replicas.ReplicaRouter"]
+    Ark.objects.filter(pk=ark.pk).update(url="https://example.com/bound")
+    replica = connections[settings.ARKLET_DATABASE_REPLICAS[0]]
+    with CaptureQueriesContext(replica) as queries:
+        res = client.get(f"/ark:/{ark.ark}")
+    assert res["Location"] == "https://example.com/bound"
+    assert any("ark_ark" in query["sql"] for query in queries)
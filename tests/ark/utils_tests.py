@@ -0,0 +1,80 @@
+"""Tests for ark/utils.py, NOID generation and ARK parsing helpers."""
+
+import pytest
+
+from ark.utils import (
+    BETANUMERIC,
+    generate_noids,
+    metadata_from_text,
+    noid_check_digit,
+    noid_from_counter,
+    noid_template_capacity,
+    validate_noid_template,
+)
+
+
+class TestNoidTemplates:
+    """Test mapping sequence numbers through Noid-style templates."""
+
+    def test_counter_maps_mixed_radix(self) -> None:
+        """Each template position counts in its own radix, rightmost fastest."""
+        assert noid_from_counter(0, "eedk") == "000"
+        assert noid_from_counter(9, "eedk") == "009"
+        assert noid_from_counter(10, "eedk") == "010"
+        assert noid_from_counter(10 * 29, "eedk") == "100"
+        assert noid_from_counter(10 * 29 * 29 - 1, "eedk") == "zz9"
+
+    def test_sequential_noids_are_unique(self) -> None:
+        """Every counter value below the capacity maps to a distinct NOID."""
+        capacity = noid_template_capacity("ded")
+        assert capacity == 10 * 29 * 10
+        assert len({noid_from_counter(i, "ded") for i in range(capacity)}) == capacity
+
+    def test_counter_out_of_range(self) -> None:
+        """A template can't produce more NOIDs than its capacity."""
+        with pytest.raises(ValueError):
+            noid_from_counter(noid_template_capacity("eedk"), "eedk")
+
+    @pytest.mark.parametrize("template", ["", "k", "eekd", "r.eedk", "eedkk"])
+    def test_unsupported_templates(self, template) -> None:
+        """Only d and e masks with an optional trailing k are supported."""
+        with pytest.raises(ValueError):
+            validate_noid_template(template)
+
+
+def test_noid_check_digit() -> None:
+    """Check digits match those of ARKs minted by Noid."""
+    assert noid_check_digit("13960/t0000001") == "8"
+    assert noid_check_digit("13960/fk3ws8hp6") == "7"
+    # Characters outside BETANUMERIC score 0, also in ARKs that aren't ASCII
+    assert noid_check_digit("13960/fk3-ws8hp6") == noid_check_digit("13960/fk3éws8hp6")
+
+
+def test_generate_noids() -> None:
+    """Batches of NOIDs are betanumeric, with first characters from first_chars."""
+    noids = generate_noids(1000, 8, first_chars="bc")
+    assert len(noids) == 1000
+    assert all(len(noid) == 8 and noid[0] in "bc" for noid in noids)
+    assert set("".join(noids)) <= set(BETANUMERIC)
+    assert len(set(noids)) == 1000
+    assert generate_noids(3, 1, first_chars="x") == ["x", "x", "x"]
+
+
+@pytest.mark.parametrize(
+    "text,metadata",
+    [
+        ("", {}),
+        ('{"who": "Smith", "when": 1999}', {"who": "Smith", "when": 1999}),
+        (
+            "erc:\nwho: Smith, J.\nwhat: A Title",
+            {"who": "Smith, J.", "what": "A Title"},
+        ),
+        ("Where: https://example.com", {"where": "https://example.com"}),
+        ("a title: with a colon", {"what": "a title: with a colon"}),
+        ("who: A\nwho: B", {"what": "who: A\nwho: B"}),
+        ("[1, 2]", {"what": "[1, 2]"}),
+    ],
+)
+def test_metadata_from_text(text, metadata) -> None:
+    """JSON objects and ERC records are structured, other text becomes "what"."""
+    assert metadata_from_text(text) == metadata
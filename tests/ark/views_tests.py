@@ -1,14 +1,21 @@
 """Tests for ark/views.py, comprising the main endpoints for arklet."""
 
+import json
 import uuid
 from dataclasses import asdict, dataclass
 from itertools import chain, count
 from unittest.mock import patch
 
 import pytest
+from asgiref.sync import async_to_sync
 
+from ark import views
+from ark.cache import resolve_cache
+from ark.minting import _reserve_block
 from ark.models import Ark, Key, Naan, Shoulder
-from ark.utils import parse_ark
+from ark.naan_registry import naan_registry
+from ark.utils import noid_check_digit, parse_ark
+from arklet import resolver_settings
 
 
 @dataclass
@@ -24,40 +31,6 @@ class MintArkArgs:
     HTTP_AUTHORIZATION: str  # pylint: disable=invalid-name
 
 
-@pytest.fixture
-def naan(db):
-    """Create the initial NAAN used for most tests."""
-    return Naan.objects.create(
-        naan=1, name="Archive", description="A NAAN", url="https://example.com"
-    )
-
-
-@pytest.fixture
-def shoulder(db, naan):
-    """Create an initial shoulder used for most tests."""
-    return Shoulder.objects.create(
-        shoulder="/t2", naan=naan, name="Test", description="A Shoulder"
-    )
-
-
-@pytest.fixture
-def auth(db, naan):
-    """Create an access key for the initial naan."""
-    key = Key.objects.create(naan=naan, active=True)
-    return f"Bearer {key.key}"
-
-
-@pytest.fixture
-def ark(db, naan, shoulder):
-    """Create an ARK for tests."""
-    return Ark.objects.create(
-        ark=f"{naan.naan}{shoulder.shoulder}12346",
-        naan=naan,
-        shoulder=shoulder,
-        assigned_name="12346",
-    )
-
-
 @pytest.fixture
 def mint_ark_args(naan, shoulder, auth) -> MintArkArgs:
     """Create the happy path arguments for mint_ark in Django test client."""
@@ -204,3 +177,807 @@ class TestMintArk:
         msg = "Ark created after %d collision(s)"
         assert any(record for record in caplog.records if record.msg == msg)
         self._validate_success(mint_ark_args, res)
+
+
+class TestResolveArk:
+    """Test the arklet resolve_ark endpoint.
+
+    resolve_ark redirects to the URL bound to an ARK, or falls back to the NAAN's
+    resolver or n2t.net for ARKs we don't have.
+    """
+
+    @pytest.mark.django_db
+    def test_redirects_to_bound_url(self, client, ark) -> None:
+        """resolve_ark redirects to the URL bound to the ARK."""
+        ark.url = "https://example.com/bound"
+        ark.save()
+        res = client.get(f"/ark:/{ark.ark}")
+        assert res.status_code == 302
+        assert res["Location"] == "https://example.com/bound"
+
+    @pytest.mark.django_db
+    def test_unbound_ark_is_not_found(self, client, ark) -> None:
+        """resolve_ark returns a 404 for an ARK without a URL."""
+        res = client.get(f"/ark:/{ark.ark}")
+        assert res.status_code == 404
+
+    @pytest.mark.django_db
+    def test_naan_fallback(self, client, naan) -> None:
+        """resolve_ark sends unknown ARKs under a known NAAN to the NAAN's URL."""
+        res = client.get(f"/ark:/{naan.naan}/unknown")
+        assert res["Location"] == f"{naan.url}/ark:/{naan.naan}/unknown"
+
+    @pytest.mark.django_db
+    def test_n2t_fallback(self, client) -> None:
+        """resolve_ark sends ARKs under unknown NAANs to n2t.net."""
+        res = client.get("/ark:/99999/unknown")
+        assert res["Location"] == "https://n2t.net/ark:/99999/unknown"
+
+    @pytest.mark.django_db
+    def test_cached_resolve_skips_database(
+        self, client, django_assert_num_queries, ark
+    ) -> None:
+        """A repeat resolve of the same ARK is served from the resolve cache."""
+        client.get(f"/ark:/{ark.ark}")
+        with django_assert_num_queries(0):
+            res = client.get(f"/ark:/{ark.ark}")
+        assert res.status_code == 404
+        assert resolve_cache.stats()["hits"] == 1
+
+    @pytest.mark.django_db
+    def test_qualifiers_pass_through(
+        self, client, django_assert_num_queries, ark
+    ) -> None:
+        """Qualified ARKs resolve by their longest ARK prefix here, in one query."""
+        Ark.objects.filter(pk=ark.pk).update(url="https://example.com/book")
+        naan_registry.get(ark.naan_id)  # loaded once per worker
+        with django_assert_num_queries(1):
+            res = client.get(f"/ark:/{ark.ark}/page/5.jp2")
+        assert res["Location"] == "https://example.com/book/page/5.jp2"
+        with django_assert_num_queries(0):
+            res = client.get(f"/ark:/{ark.ark}/page/5.jp2")
+        assert res["Location"] == "https://example.com/book/page/5.jp2"
+        res = client.get(f"/ark:/{ark.ark}.pdf")
+        assert res["Location"] == "https://example.com/book.pdf"
+
+        # A bound component takes over once it exists, cached or not
+        Ark.objects.create(
+            ark=f"{ark.ark}/page",
+            naan=ark.naan,
+            shoulder=ark.shoulder,
+            assigned_name=f"{ark.assigned_name}/page",
+            url="https://images.example.com/pages",
+        )
+        res = client.get(f"/ark:/{ark.ark}/page/5.jp2")
+        assert res["Location"] == "https://images.example.com/pages/5.jp2"
+
+    @pytest.mark.django_db
+    def test_qualified_fallbacks(self, client, naan, ark) -> None:
+        """Unbound ARKs stay 404s and ARKs that aren't here keep their qualifier."""
+        assert client.get(f"/ark:/{ark.ark}/page/5").status_code == 404
+        res = client.get("/ark:/1/elsewhere/page/5")
+        assert res["Location"] == "https://example.com/ark:/1/elsewhere/page/5"
+
+    @pytest.mark.django_db
+    def test_cache_control(self, client, settings, naan, ark) -> None:
+        """Each kind of resolve gets its own shared cache max age."""
+        settings.ARKLET_CACHE_BOUND_MAX_AGE = 86_400
+        settings.ARKLET_CACHE_NAAN_MAX_AGE = 600
+        settings.ARKLET_CACHE_N2T_MAX_AGE = 0
+        settings.ARKLET_CACHE_NOT_FOUND_MAX_AGE = 30
+        settings.ARKLET_CACHE_BROWSER_MAX_AGE = 120
+        Ark.objects.filter(pk=ark.pk).update(url="https://example.com/bound")
+        expected = {
+            f"/ark:/{ark.ark}": "public, max-age=120, s-maxage=86400",
+            "/ark:/1/elsewhere": "public, max-age=120, s-maxage=600",
+            "/ark:/99/x": "public, max-age=0, s-maxage=0",
+            f"/ark:/{ark.ark}?info": "public, no-cache",
+        }
+        for path, cache_control in expected.items():
+            assert client.get(path)["Cache-Control"] == cache_control
+        Ark.objects.filter(pk=ark.pk).update(url="")
+        resolve_cache.clear()
+        res = client.get(f"/ark:/{ark.ark}")
+        assert res.status_code == 404
+        assert res["Cache-Control"] == "public, max-age=30, s-maxage=30"
+
+    @pytest.mark.django_db
+    def test_update_invalidates_cache(self, client, auth, ark) -> None:
+        """Binding a new URL with update_ark takes effect on the next resolve."""
+        assert client.get(f"/ark:/{ark.ark}").status_code == 404
+        client.put(
+            "/update",
+            data={"ark": f"ark:/{ark.ark}", "url": "https://example.com/new"},
+            content_type="application/json",
+            HTTP_AUTHORIZATION=auth,
+        )
+        res = client.get(f"/ark:/{ark.ark}")
+        assert res["Location"] == "https://example.com/new"
+
+    @pytest.mark.django_db
+    def test_update_qualified_ark(self, client, auth, ark) -> None:
+        """Updates only touch the exact ARK given, never the one it qualifies."""
+        component = Ark.objects.create(
+            ark=f"{ark.ark}/page",
+            naan=ark.naan,
+            shoulder=ark.shoulder,
+            assigned_name=f"{ark.assigned_name}/page",
+        )
+        for qualified, status in [(f"{ark.ark}.v2", 404), (component.ark, 200)]:
+            res = client.put(
+                "/update",
+                data={"ark": f"ark:/{qualified}", "url": "https://example.com/new"},
+                content_type="application/json",
+                HTTP_AUTHORIZATION=auth,
+            )
+            assert res.status_code == status
+        ark.refresh_from_db()
+        component.refresh_from_db()
+        assert (ark.url, component.url) == ("", "https://example.com/new")
+
+    @pytest.mark.django_db
+    def test_minting_invalidates_naan_fallback(self, client, naan, shoulder) -> None:
+        """A cached NAAN fallback is dropped once the ARK is created here."""
+        client.get(f"/ark:/{naan.naan}/t2new")
+        Ark.objects.create(
+            ark=f"{naan.naan}/t2new",
+            naan=naan,
+            shoulder=shoulder.shoulder,
+            assigned_name="new",
+            url="https://example.com/minted",
+        )
+        res = client.get(f"/ark:/{naan.naan}/t2new")
+        assert res["Location"] == "https://example.com/minted"
+
+
+class TestMintArkBatch:
+    """Test the arklet mint_ark_batch endpoint.
+
+    mint_ark_batch mints many ARKs with a few multi-row INSERTs.
+    """
+
+    @pytest.fixture
+    def batch_args(self, mint_ark_args) -> MintArkArgs:
+        """Happy path arguments to mint three ARKs with the count form."""
+        mint_ark_args.path = "/mint/batch"
+        mint_ark_args.data["count"] = 3
+        return mint_ark_args
+
+    @pytest.mark.django_db
+    def test_count_form(self, client, batch_args) -> None:
+        """mint_ark_batch mints count ARKs sharing the same fields."""
+        batch_args.data["url"] = "https://example.com/shared"
+        res = client.post(**asdict(batch_args))
+        assert res.status_code == 200
+        arks = res.json()["arks"]
+        assert len(set(arks)) == 3
+        for minted_ark in arks:
+            _, minted_naan, minted_assigned_name = parse_ark(minted_ark)
+            assert minted_naan == batch_args.data["naan"]
+            assert minted_assigned_name.startswith("t2")
+            ark = Ark.objects.get(ark=minted_ark[len("ark:/") :])
+            assert ark.url == "https://example.com/shared"
+            assert ark.assigned_name == ark.ark[len("1/t2") :]
+
+    @pytest.mark.django_db
+    def test_list_form_keeps_order(self, client, naan, batch_args) -> None:
+        """mint_ark_batch returns ARKs in the order of the requests."""
+        urls = [f"https://example.com/{i}" for i in range(5)]
+        batch_args.data = {
+            "arks": [{"naan": naan.naan, "shoulder": "/t2", "url": u} for u in urls]
+        }
+        res = client.post(**asdict(batch_args))
+        arks = res.json()["arks"]
+        bound_urls = [Ark.objects.get(ark=a[len("ark:/") :]).url for a in arks]
+        assert bound_urls == urls
+
+    def test_invalid_item_is_bad_request(self, client, naan, batch_args) -> None:
+        """mint_ark_batch reports which items failed validation."""
+        batch_args.data = {"arks": [{"naan": naan.naan, "shoulder": "/t2"}, {}]}
+        res = client.post(**asdict(batch_args))
+        assert res.status_code == 400
+        assert list(res.json()["arks"]) == ["1"]
+
+    @pytest.mark.parametrize("body", [[1, 2], "x", 1, None])
+    def test_non_object_is_bad_request(self, client, batch_args, body) -> None:
+        """mint_ark_batch rejects JSON bodies that aren't objects."""
+        batch_args.data = body
+        assert client.post(**asdict(batch_args)).status_code == 400
+
+    def test_authorized_naan_matches_every_item(self, client, batch_args) -> None:
+        """mint_ark_batch refuses to mint ARKs for other NAANs."""
+        batch_args.data["naan"] += 1
+        res = client.post(**asdict(batch_args))
+        assert res.status_code == 403
+
+    def test_batch_size_is_limited(self, client, settings, batch_args) -> None:
+        """mint_ark_batch refuses batches over ARKLET_MINT_BATCH_MAX."""
+        settings.ARKLET_MINT_BATCH_MAX = 2
+        res = client.post(**asdict(batch_args))
+        assert res.status_code == 400
+
+    @patch("ark.views.MintArkForm")
+    def test_oversized_list_is_refused_before_validation(
+        self, mock_form, client, settings, batch_args
+    ) -> None:
+        """mint_ark_batch doesn't validate items of lists it will refuse anyway."""
+        settings.ARKLET_MINT_BATCH_MAX = 2
+        batch_args.data = {"arks": [{}] * 3}
+        assert client.post(**asdict(batch_args)).status_code == 400
+        batch_args.data = {"arks": [{}] * 2}
+        batch_args.HTTP_AUTHORIZATION = ""
+        assert client.post(**asdict(batch_args)).status_code == 403
+        mock_form.assert_not_called()
+
+    @pytest.mark.django_db
+    @patch("ark.minting.generate_noids")
+    def test_only_collided_rows_are_retried(
+        self, mock_noid_gen, client, batch_args, ark
+    ) -> None:
+        """mint_ark_batch regenerates NOIDs only for the ARKs that collided."""
+        existing_noid = ark.assigned_name[:-1]
+        return_values = chain(["10000000", existing_noid, "20000000", "30000000"])
+        mock_noid_gen.side_effect = lambda count, noid_length: [
+            next(return_values) for _ in range(count)
+        ]
+        res = client.post(**asdict(batch_args))
+        assert res.status_code == 200
+        assert [call[0][0] for call in mock_noid_gen.call_args_list] == [3, 1]
+        assert ark.ark not in [a[len("ark:/") :] for a in res.json()["arks"]]
+
+
+class TestUpdateArkBatch:
+    """Test the arklet update_ark_batch endpoint.
+
+    update_ark_batch rebinds many ARKs with bulk UPDATEs.
+    """
+
+    @pytest.mark.django_db
+    def test_reports_each_item(self, client, auth, ark) -> None:
+        """update_ark_batch updates existing ARKs and reports missing ones."""
+        res = client.put(
+            "/update/batch",
+            data={
+                "arks": [
+                    {"ark": f"ark:/{ark.ark}", "url": "https://example.com/new"},
+                    {"ark": "ark:/1/t2missing", "url": "https://example.com/x"},
+                    {"ark": "ark:/2/t2other", "url": "https://example.com/y"},
+                    {"url": "https://example.com/z"},
+                ]
+            },
+            content_type="application/json",
+            HTTP_AUTHORIZATION=auth,
+        )
+        assert res.status_code == 200
+        statuses = [result["status"] for result in res.json()["results"]]
+        assert statuses == ["updated", "not_found", "forbidden", "invalid"]
+        updated_at = ark.updated_at
+        ark.refresh_from_db()
+        assert ark.url == "https://example.com/new"
+        assert ark.updated_at > updated_at
+
+    @pytest.mark.django_db
+    def test_qualified_arks(self, client, auth, ark) -> None:
+        """Qualified ARKs are only updated if they exist as component ARKs."""
+        component = Ark.objects.create(
+            ark=f"{ark.ark}/page",
+            naan=ark.naan,
+            shoulder=ark.shoulder,
+            assigned_name=f"{ark.assigned_name}/page",
+        )
+        res = client.put(
+            "/update/batch",
+            data={
+                "arks": [
+                    {"ark": f"ark:/{ark.ark}/page/5", "url": "https://example.com/x"},
+                    {"ark": f"ark:/{component.ark}", "url": "https://example.com/y"},
+                ]
+            },
+            content_type="application/json",
+            HTTP_AUTHORIZATION=auth,
+        )
+        statuses = [result["status"] for result in res.json()["results"]]
+        assert statuses == ["not_found", "updated"]
+        ark.refresh_from_db()
+        component.refresh_from_db()
+        assert (ark.url, component.url) == ("", "https://example.com/y")
+
+    @pytest.mark.django_db
+    def test_streams_ndjson(self, client, auth, ark) -> None:
+        """update_ark_batch accepts and returns one JSON object per line."""
+        lines = [
+            {"ark": f"ark:/{ark.ark}", "url": "https://example.com/first"},
+            {"ark": f"ark:/{ark.ark}", "url": "https://example.com/second"},
+        ]
+        res = client.put(
+            "/update/batch",
+            data="\n".join(json.dumps(line) for line in lines) + "\nnot json\n",
+            content_type="application/x-ndjson",
+            HTTP_AUTHORIZATION=auth,
+        )
+        results = [
+            json.loads(line) for line in b"".join(res.streaming_content).splitlines()
+        ]
+        assert [r["status"] for r in results] == ["updated", "updated", "invalid"]
+        ark.refresh_from_db()
+        assert ark.url == "https://example.com/second"
+
+    @pytest.mark.django_db
+    def test_invalidates_resolve_cache(self, client, auth, ark) -> None:
+        """Rebinding in bulk takes effect on the next resolve."""
+        client.get(f"/ark:/{ark.ark}")
+        client.put(
+            "/update/batch",
+            data={"arks": [{"ark": f"ark:/{ark.ark}", "url": "https://example.com/"}]},
+            content_type="application/json",
+            HTTP_AUTHORIZATION=auth,
+        )
+        assert client.get(f"/ark:/{ark.ark}")["Location"] == "https://example.com/"
+
+    def test_http_authorization_header_required(self, client) -> None:
+        """update_ark_batch requires an HTTP_AUTHORIZATION header."""
+        res = client.put(
+            "/update/batch", data={"arks": []}, content_type="application/json"
+        )
+        assert res.status_code == 403
+
+
+class TestSequentialMinting:
+    """Test minting on shoulders that hand out sequential NOIDs."""
+
+    @pytest.fixture
+    def sequential_shoulder(self, shoulder) -> Shoulder:
+        """Switch the initial shoulder to sequential minting."""
+        shoulder.minting_mode = Shoulder.SEQUENTIAL
+        shoulder.template = "eedk"
+        shoulder.save()
+        return shoulder
+
+    @pytest.mark.django_db
+    def test_mints_in_sequence(self, client, mint_ark_args, sequential_shoulder):
+        """mint_ark follows the shoulder's template from the shoulder's counter."""
+        first = client.post(**asdict(mint_ark_args)).json()["ark"]
+        second = client.post(**asdict(mint_ark_args)).json()["ark"]
+        assert first == f"ark:/1/t2000{noid_check_digit('1/t2000')}"
+        assert second == f"ark:/1/t2001{noid_check_digit('1/t2001')}"
+
+    @pytest.mark.django_db
+    def test_reserves_blocks(
+        self, client, settings, mint_ark_args, sequential_shoulder
+    ) -> None:
+        """Each worker reserves a block of counter values with one UPDATE."""
+        settings.ARKLET_MINT_BLOCK_SIZE = 10
+        mint_ark_args.path = "/mint/batch"
+        mint_ark_args.data["count"] = 5
+        client.post(**asdict(mint_ark_args))
+        sequential_shoulder.refresh_from_db()
+        assert sequential_shoulder.counter == 10
+
+        # Batches larger than what's left reserve enough for all of them at once
+        mint_ark_args.data["count"] = 15
+        with patch("ark.minting._reserve_block", wraps=_reserve_block) as reserve:
+            res = client.post(**asdict(mint_ark_args))
+        reserve.assert_called_once_with(sequential_shoulder, 10)
+        arks = res.json()["arks"]
+        assert arks[0] == f"ark:/1/t2005{noid_check_digit('1/t2005')}"
+        assert arks[-1] == f"ark:/1/t2019{noid_check_digit('1/t2019')}"
+        sequential_shoulder.refresh_from_db()
+        assert sequential_shoulder.counter == 20
+
+    @pytest.mark.django_db
+    def test_skips_existing_arks(
+        self, client, naan, mint_ark_args, sequential_shoulder
+    ) -> None:
+        """Sequence values that collide with imported ARKs are skipped."""
+        existing = f"1/t2000{noid_check_digit('1/t2000')}"
+        Ark.objects.create(
+            ark=existing, naan=naan, shoulder="/t2", assigned_name=existing[4:]
+        )
+        res = client.post(**asdict(mint_ark_args))
+        assert res.json()["ark"] == f"ark:/1/t2001{noid_check_digit('1/t2001')}"
+
+
+class TestAccessKeys:
+    """Test authorizing mint and update requests by their hashed access keys."""
+
+    @pytest.mark.django_db
+    def test_keys_are_stored_hashed(self, naan) -> None:
+        """Only a hash and a lookup prefix of a new key are stored."""
+        key = Key.objects.create(naan=naan, active=True)
+        stored = Key.objects.get(pk=key.pk)
+        assert stored.key is None
+        assert key.key not in (str(stored.pk), stored.key_hash)
+        assert stored.prefix == key.key[:8]
+
+    @pytest.mark.django_db
+    def test_inactive_key_is_forbidden(self, client, mint_ark_args) -> None:
+        """mint_ark refuses keys that have been deactivated."""
+        Key.objects.update(active=False)
+        res = client.post(**asdict(mint_ark_args))
+        assert res.status_code == 403
+
+    @pytest.mark.django_db
+    def test_key_lookups_are_cached(
+        self, client, django_assert_num_queries, auth, ark
+    ) -> None:
+        """A repeat request with the same key doesn't query the Key table."""
+        update = {
+            "path": "/update",
+            "data": {"ark": f"ark:/{ark.ark}", "url": "https://example.com/"},
+            "content_type": "application/json",
+            "HTTP_AUTHORIZATION": auth,
+        }
+        client.put(**update)
+        with django_assert_num_queries(2):  # SELECT and UPDATE the ARK
+            res = client.put(**update)
+        assert res.status_code == 200
+
+    @pytest.mark.django_db
+    def test_saving_key_invalidates_cache(self, client, mint_ark_args) -> None:
+        """Deactivating a key takes effect on the next request."""
+        assert client.post(**asdict(mint_ark_args)).status_code == 200
+        key = Key.objects.get()
+        key.active = False
+        key.save()
+        assert client.post(**asdict(mint_ark_args)).status_code == 403
+
+
+class TestResolveArkAsync:
+    """Test resolve_ark_async, the native async resolver for ASGI servers."""
+
+    @staticmethod
+    def _resolve(rf, ark_string):
+        """Run resolve_ark_async to completion like an ASGI handler would."""
+        path = f"/ark:/{ark_string}"
+        return async_to_sync(views.resolve_ark_async)(rf.get(path), path[1:])
+
+    @pytest.mark.django_db
+    def test_redirects_to_bound_url(self, rf, ark) -> None:
+        """resolve_ark_async redirects to the URL bound to the ARK."""
+        Ark.objects.filter(pk=ark.pk).update(url="https://example.com/bound")
+        res = self._resolve(rf, ark.ark)
+        assert res["Location"] == "https://example.com/bound"
+
+    @pytest.mark.django_db
+    def test_unbound_ark_is_not_found(self, rf, ark) -> None:
+        """resolve_ark_async returns a cacheable 404 for an ARK without a URL."""
+        res = self._resolve(rf, ark.ark)
+        assert res.status_code == 404
+        assert res["Cache-Control"] == "public, max-age=60, s-maxage=60"
+
+    @pytest.mark.django_db
+    def test_qualifiers_pass_through(self, rf, ark) -> None:
+        Ark.objects.filter(pk=ark.pk).update(url="https://example.com/book")
+        res = self._resolve(rf, f"{ark.ark}/page/5.jp2")
+        assert res["Location"] == "https://example.com/book/page/5.jp2"
+
+    @pytest.mark.django_db
+    def test_fallbacks(self, rf, naan) -> None:
+        """resolve_ark_async falls back to the NAAN registry and n2t.net."""
+        res = self._resolve(rf, f"{naan.naan}/unknown")
+        assert res["Location"] == f"{naan.url}/ark:/{naan.naan}/unknown"
+        res = self._resolve(rf, "99999/unknown")
+        assert res["Location"] == "https://n2t.net/ark:/99999/unknown"
+
+    def test_invalid_ark_is_bad_request(self, rf) -> None:
+        """resolve_ark_async rejects ARKs it can't parse."""
+        assert self._resolve(rf, "not-a-naan/x").status_code == 400
+
+
+class TestResolverProfile:
+    """Test the resolve-only URLs and middleware of arklet.resolver_settings."""
+
+    @pytest.fixture(autouse=True)
+    def resolver_settings(self, settings):
+        settings.ROOT_URLCONF = resolver_settings.ROOT_URLCONF
+        settings.MIDDLEWARE = resolver_settings.MIDDLEWARE
+
+    @pytest.mark.django_db
+    def test_resolves(self, client, ark) -> None:
+        Ark.objects.filter(pk=ark.pk).update(url="https://example.com/bound")
+        res = client.get(f"/ark:/{ark.ark}")
+        assert res["Location"] == "https://example.com/bound"
+        assert "Cache-Control" in res
+        assert "sessionid" not in res.cookies
+
+    @pytest.mark.django_db
+    def test_only_resolves(self, client, ark) -> None:
+        """The API and admin aren't served by resolver-only nodes."""
+        assert client.get("/admin/").status_code == 404
+        assert client.get("/search?q=x").status_code == 404
+
+
+class TestExportArks:
+    """Test the arklet export_arks endpoint."""
+
+    @pytest.fixture
+    def arks(self, naan, shoulder, ark):
+        """Add two more ARKs to the initial one, and one under another NAAN."""
+        for assigned_name in ["12347", "12348"]:
+            Ark.objects.create(
+                ark=f"1/t2{assigned_name}",
+                naan=naan,
+                shoulder="/t2",
+                assigned_name=assigned_name,
+            )
+        other = Naan.objects.create(
+            naan=2, name="Other", description="", url="https://example.org"
+        )
+        Ark.objects.create(ark="2/t212346", naan=other, shoulder="/t2")
+
+    @staticmethod
+    def exported(res) -> list:
+        assert res.status_code == 200
+        assert res["Content-Type"] == "application/x-ndjson"
+        lines = b"".join(res.streaming_content).decode().splitlines()
+        return [json.loads(line)["ark"] for line in lines]
+
+    @pytest.mark.django_db
+    def test_streams_own_naan(self, client, auth, arks) -> None:
+        """export_arks streams the caller's ARKs in order and no others."""
+        res = client.get("/export", HTTP_AUTHORIZATION=auth)
+        assert self.exported(res) == ["1/t212346", "1/t212347", "1/t212348"]
+
+    @pytest.mark.django_db
+    def test_filters(self, client, auth, arks) -> None:
+        res = client.get(
+            "/export", {"after": "ark:/1/t212346"}, HTTP_AUTHORIZATION=auth
+        )
+        assert self.exported(res) == ["1/t212347", "1/t212348"]
+        res = client.get("/export", {"shoulder": "/x"}, HTTP_AUTHORIZATION=auth)
+        assert self.exported(res) == []
+
+    @pytest.mark.django_db
+    def test_since(self, client, auth, arks) -> None:
+        """?since= only exports ARKs updated at or after the given time."""
+        Ark.objects.filter(ark="1/t212347").update(updated_at="2030-01-02T00:00Z")
+        res = client.get("/export", {"since": "2030-01-02"}, HTTP_AUTHORIZATION=auth)
+        [row] = [
+            json.loads(line) for line in b"".join(res.streaming_content).splitlines()
+        ]
+        assert row["ark"] == "1/t212347"
+        assert row["updated_at"] == "2030-01-02T00:00:00Z"
+        res = client.get("/export", {"since": "yesterday"}, HTTP_AUTHORIZATION=auth)
+        assert res.status_code == 400
+
+    @pytest.mark.django_db
+    def test_http_authorization_header_required(self, client, arks) -> None:
+        assert client.get("/export").status_code == 403
+        assert client.post("/export").status_code == 405
+
+
+class TestSearchArks:
+    """Test the arklet search_arks endpoint."""
+
+    @pytest.fixture
+    def arks(self, naan, ark):
+        for assigned_name in ["12347", "12348", "22349"]:
+            Ark.objects.create(
+                ark=f"1/t2{assigned_name}",
+                naan=naan,
+                shoulder="/t2",
+                assigned_name=assigned_name,
+                url=f"https://archive.org/details/{assigned_name}",
+            )
+        other = Naan.objects.create(
+            naan=2, name="Other", description="", url="https://example.org"
+        )
+        Ark.objects.create(
+            ark="2/t212349", naan=other, shoulder="/t2", url="https://archive.org/"
+        )
+
+    @staticmethod
+    def found(res) -> list:
+        assert res.status_code == 200
+        return [row["ark"] for row in res.json()["arks"]]
+
+    @pytest.mark.django_db
+    def test_search_by_ark_prefix(self, client, auth, arks) -> None:
+        res = client.get("/search", {"q": "ark:/1/t21"}, HTTP_AUTHORIZATION=auth)
+        assert self.found(res) == ["1/t212346", "1/t212347", "1/t212348"]
+        res = client.get("/search", {"q": "2/t2"}, HTTP_AUTHORIZATION=auth)
+        assert self.found(res) == []
+
+    @pytest.mark.django_db
+    def test_search_by_url(self, client, auth, arks) -> None:
+        res = client.get("/search", {"q": "ARCHIVE.org"}, HTTP_AUTHORIZATION=auth)
+        assert self.found(res) == ["1/t212347", "1/t212348", "1/t222349"]
+        res = client.get("/search", {"q": "details/1234"}, HTTP_AUTHORIZATION=auth)
+        assert self.found(res) == ["1/t212347", "1/t212348"]
+
+    @pytest.mark.django_db
+    def test_pages(self, client, auth, arks) -> None:
+        query = {"q": "archive.org", "limit": 2}
+        res = client.get("/search", query, HTTP_AUTHORIZATION=auth)
+        assert self.found(res) == ["1/t212347", "1/t212348"]
+        assert res.json()["next"] == "1/t212348"
+        query["after"] = res.json()["next"]
+        res = client.get("/search", query, HTTP_AUTHORIZATION=auth)
+        assert self.found(res) == ["1/t222349"]
+        assert res.json()["next"] is None
+
+    @pytest.mark.django_db
+    def test_bad_requests(self, client, auth, arks) -> None:
+        assert client.get("/search", HTTP_AUTHORIZATION=auth).status_code == 400
+        res = client.get("/search", {"q": "x", "limit": 0}, HTTP_AUTHORIZATION=auth)
+        assert res.status_code == 400
+        assert client.get("/search", {"q": "x"}).status_code == 403
+        assert client.post("/search", {"q": "x"}).status_code == 405
+
+
+class TestQueryArks:
+    """Test the arklet query_arks endpoint and structured metadata."""
+
+    @pytest.fixture
+    def arks(self, naan, ark):
+        for assigned_name, who in [
+            ("12347", "Smith"),
+            ("12348", "Smith"),
+            ("12349", "Jones"),
+        ]:
+            Ark.objects.create(
+                ark=f"1/t2{assigned_name}",
+                naan=naan,
+                shoulder="/t2",
+                assigned_name=assigned_name,
+                metadata={"who": who, "what": "a__b"},
+            )
+        other = Naan.objects.create(
+            naan=2, name="Other", description="", url="https://example.org"
+        )
+        Ark.objects.create(
+            ark="2/t212349", naan=other, shoulder="/t2", metadata={"who": "Smith"}
+        )
+
+    @staticmethod
+    def found(res) -> list:
+        assert res.status_code == 200
+        return [row["ark"] for row in res.json()["arks"]]
+
+    @pytest.mark.django_db
+    def test_query_by_key_and_value(self, client, auth, arks) -> None:
+        query = {"key": "who", "value": "Smith"}
+        res = client.get("/query", query, HTTP_AUTHORIZATION=auth)
+        assert self.found(res) == ["1/t212347", "1/t212348"]
+        assert res.json()["arks"][0]["metadata"] == {"who": "Smith", "what": "a__b"}
+        res = client.get("/query", {**query, "limit": 1}, HTTP_AUTHORIZATION=auth)
+        assert self.found(res) == ["1/t212347"]
+        assert res.json()["next"] == "1/t212347"
+        res = client.get(
+            "/query", {"key": "a__b", "value": "x"}, HTTP_AUTHORIZATION=auth
+        )
+        assert self.found(res) == []
+
+    @pytest.mark.django_db
+    def test_bad_requests(self, client, auth, arks) -> None:
+        res = client.get("/query", {"key": "who"}, HTTP_AUTHORIZATION=auth)
+        assert res.status_code == 400
+        assert client.get("/query", {"key": "who", "value": "x"}).status_code == 403
+
+    @pytest.mark.django_db
+    def test_text_metadata_is_structured(self, client, auth, ark) -> None:
+        """Metadata sent as text is stored as JSON, JSON objects as they are."""
+        for metadata, stored in [
+            ("who: Smith\nwhat: A Title", {"who": "Smith", "what": "A Title"}),
+            ({"who": ["Smith", "Jones"]}, {"who": ["Smith", "Jones"]}),
+        ]:
+            res = client.put(
+                "/update",
+                data={"ark": f"ark:/{ark.ark}", "metadata": metadata},
+                content_type="application/json",
+                HTTP_AUTHORIZATION=auth,
+            )
+            assert res.status_code == 200
+            ark.refresh_from_db()
+            assert ark.metadata == stored
+        res = client.put(
+            "/update",
+            data={"ark": f"ark:/{ark.ark}", "metadata": [1]},
+            content_type="application/json",
+            HTTP_AUTHORIZATION=auth,
+        )
+        assert res.status_code == 400
+
+
+class TestInflections:
+    """Test describing ARKs with the ?, ?? and ?info inflections."""
+
+    @pytest.fixture
+    def described(self, ark):
+        ark.url = "https://example.com/target"
+        ark.metadata = {"who": "Smith", "what": "A Title", "extent": "2\nvolumes"}
+        ark.commitment = "Kept forever"
+        ark.save()
+        return ark
+
+    @pytest.mark.django_db
+    def test_brief_erc(self, client, described) -> None:
+        """A lone ? returns the ERC kernel, if the server passes on the raw URI."""
+        res = client.get(f"/ark:/{described.ark}", RAW_URI=f"/ark:/{described.ark}?")
+        assert res.status_code == 200
+        assert res["Content-Type"] == "text/plain; charset=utf-8"
+        assert res.content.decode() == (
+            "erc:\nwho: Smith\nwhat: A Title\nwhen: (:unav)\nwhere: ark:/1/t212346\n"
+        )
+
+    @pytest.mark.django_db
+    @pytest.mark.parametrize("query", ["info", "?"])
+    def test_full_erc(self, client, described, query) -> None:
+        res = client.get(f"/ark:/{described.ark}?{query}")
+        assert res.status_code == 200
+        assert res.content.decode().splitlines()[5:] == [
+            "extent: 2",
+            " volumes",
+            "target: https://example.com/target",
+            "erc-support:",
+            "what: Kept forever",
+        ]
+
+    @pytest.mark.django_db
+    def test_json(self, client, described) -> None:
+        res = client.get(f"/ark:/{described.ark}?info", HTTP_ACCEPT="application/json")
+        assert res["Content-Type"] == "application/json"
+        assert res["Vary"] == "Accept"
+        assert res.json() == {
+            "ark": "ark:/1/t212346",
+            "target": "https://example.com/target",
+            "metadata": {"who": "Smith", "what": "A Title", "extent": "2\nvolumes"},
+            "commitment": "Kept forever",
+        }
+
+    @pytest.mark.django_db
+    def test_conditional_requests(
+        self, client, described, django_assert_num_queries
+    ) -> None:
+        """Revalidating with the ETag or Last-Modified gets a 304 until the ARK changes."""
+        path = f"/ark:/{described.ark}?info"
+        res = client.get(path)
+        etag, last_modified = res["ETag"], res["Last-Modified"]
+        assert etag.startswith('"') and not etag.startswith("W/")
+        with django_assert_num_queries(1):
+            res = client.get(path, HTTP_IF_NONE_MATCH=etag)
+        assert res.status_code == 304
+        assert res["ETag"] == etag
+        assert res.content == b""
+        res = client.get(path, HTTP_IF_MODIFIED_SINCE=last_modified)
+        assert res.status_code == 304
+        assert client.get(path, HTTP_IF_NONE_MATCH='"other"').status_code == 200
+        # Each representation has its own ETag
+        res = client.get(path, HTTP_IF_NONE_MATCH=etag, HTTP_ACCEPT="application/json")
+        assert res.status_code == 200
+
+        described.commitment = "Kept for a while"
+        described.save()
+        res = client.get(path, HTTP_IF_NONE_MATCH=etag)
+        assert res.status_code == 200
+        assert res["ETag"] != etag
+
+    @pytest.mark.django_db
+    def test_qualified_arks(self, client, described) -> None:
+        """Qualified ARKs are described by the ARK they resolve through."""
+        res = client.get(f"/ark:/{described.ark}/page/5.jp2?info")
+        assert res.status_code == 200
+        lines = res.content.decode().splitlines()
+        assert lines[4:6] == ["where: ark:/1/t212346", "qualifier: /page/5.jp2"]
+        res = client.get(
+            f"/ark:/{described.ark}.pdf?info", HTTP_ACCEPT="application/json"
+        )
+        assert res.json()["ark"] == "ark:/1/t212346"
+        assert res.json()["qualifier"] == ".pdf"
+
+    @pytest.mark.django_db
+    def test_arks_elsewhere_are_redirected(self, client, naan) -> None:
+        res = client.get("/ark:/1/elsewhere??")
+        assert res.status_code == 302
+        assert res["Location"] == "https://example.com/ark:/1/elsewhere??"
+        assert (
+            client.get("/ark:/99/x?info")["Location"]
+            == "https://n2t.net/ark:/99/x?info"
+        )
+
+    @pytest.mark.django_db
+    def test_async_view(self, rf, described) -> None:
+        request = rf.get(f"/ark:/{described.ark}?info")
+        res = async_to_sync(views.resolve_ark_async)(request, f"ark:/{described.ark}")
+        assert res.status_code == 200
+        assert res.content.decode().startswith("erc:\nwho: Smith\n")
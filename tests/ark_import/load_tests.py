@@ -0,0 +1,66 @@
+"""Tests for ark_import, loading a Noid/Egg dump straight into the Ark table."""
+
+from pathlib import Path
+
+import pytest
+
+import ark_import
+from ark.models import Ark, Naan
+from ark_import.load import copy_text, load_records, read_checkpoint
+from ark_import.noid_dump import ark_records
+
+SAMPLE = Path(ark_import.__file__).parent / "sample_noid_output.txt"
+
+
+@pytest.fixture
+def naan(db):
+    return Naan.objects.create(
+        naan=13960, name="Internet Archive", description="", url="https://archive.org"
+    )
+
+
+def test_copy_text_escapes_separators() -> None:
+    assert copy_text("a\tb\nc\\d\re") == "a\\tb\\nc\\\\d\\re"
+
+
+@pytest.mark.django_db
+def test_load_records_checkpoints_and_resumes(naan, tmp_path) -> None:
+    """Each chunk is committed with a checkpoint, and resuming skips loaded ARKs."""
+    checkpoint = str(tmp_path / "checkpoint")
+    with open(SAMPLE, "rb") as f:
+        records = list(ark_records(f))
+    state = load_records(
+        records[:5], checkpoint_path=checkpoint, commit_every=2, progress=None
+    )
+    assert state == {"offset": records[4][0], "read": 5, "written": 5}
+    assert read_checkpoint(checkpoint) == state
+
+    state = load_records(records, start=state, commit_every=2, progress=None)
+    assert state["read"] == 13
+    assert state["written"] == 8  # the first 5 ARKs were skipped
+    ark = Ark.objects.get(ark="13960/t00000018")
+    assert (ark.shoulder, ark.assigned_name) == ("/t", "00000018")
+
+
+@pytest.mark.django_db
+def test_load_records_updates_on_conflict(naan) -> None:
+    with open(SAMPLE, "rb") as f:
+        records = list(ark_records(f))
+    load_records(records, progress=None)
+    offset, record = records[0]
+    moved = [(offset, record._replace(url="https://example.org/moved"))]
+
+    load_records(moved, progress=None)
+    assert Ark.objects.get(ark=record.ark).url == record.url
+
+    state = load_records(moved, on_conflict="update", progress=None)
+    assert state["written"] == 1
+    assert Ark.objects.get(ark=record.ark).url == "https://example.org/moved"
+
+
+@pytest.mark.django_db
+def test_load_records_requires_naan() -> None:
+    with open(SAMPLE, "rb") as f:
+        with pytest.raises(ValueError, match="13960"):
+            load_records(ark_records(f), progress=None)
+    assert not Ark.objects.exists()
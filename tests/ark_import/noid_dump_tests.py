@@ -0,0 +1,77 @@
+"""Tests for ark_import/noid_dump.py, parsing Noid/Egg dumps."""
+
+from pathlib import Path
+
+import pytest
+
+import ark_import
+from ark_import.noid_dump import (
+    DumpConfig,
+    ark_records,
+    extract_ark,
+    parallel_ark_records,
+    split_ranges,
+)
+
+SAMPLE = Path(ark_import.__file__).parent / "sample_noid_output.txt"
+
+
+@pytest.fixture
+def large_dump(tmp_path) -> str:
+    path = tmp_path / "dump.txt"
+    with open(path, "w") as f:
+        f.write(SAMPLE.read_text())
+        for i in range(2000):
+            f.write(
+                f" ark:/13960/t{i:08d}|__mc\n 1435680779\n"
+                f" ark:/13960/t{i:08d}|_t\n http://www.archive.org/details/item{i}\n"
+            )
+    return str(path)
+
+
+def test_ark_records_resume_from_offset() -> None:
+    """Reading from a record's end offset continues with the next record."""
+    with open(SAMPLE, "rb") as f:
+        records = list(ark_records(f))
+        assert len(records) == 8
+        assert records[0][1].ark == "13960/fk3ws8hp67"
+        assert records[0][1].url.endswith("thereefanovel00wharrich")
+        resumed = list(ark_records(f, records[2][0]))
+    assert resumed == records[3:]
+
+
+def test_extract_ark_config() -> None:
+    config = DumpConfig(
+        naans=frozenset({12345}), shoulders=("/f", "/fk"), noid_length=None
+    )
+    assert extract_ark("ark:/12345/fk123|_t", config) == (12345, "/fk", "123")
+    assert extract_ark("ark:/12345/f9|_t", config) == (12345, "/f", "9")
+    with pytest.raises(ValueError, match="bad naan"):
+        extract_ark("ark:/13960/fk123|_t", config)
+    with pytest.raises(ValueError, match="unexpected shoulder"):
+        extract_ark("ark:/12345/x123|_t", config)
+
+
+def test_split_ranges_start_on_bindings(large_dump) -> None:
+    ranges = split_ranges(large_dump, 0, 4096)
+    assert len(ranges) > 10
+    with open(large_dump, "rb") as f:
+        data = f.read()
+    for start, end in ranges[1:]:
+        assert data[start:].startswith(b" ark:/13960/")
+        assert data[start:].split(b"\n", 1)[0].endswith(b"|_t")
+    assert ranges[-1][1] == len(data)
+
+
+def test_parallel_ark_records_match_sequential(large_dump) -> None:
+    """Records parsed across processes come back complete and in file order."""
+    with open(large_dump, "rb") as f:
+        records = list(ark_records(f))
+    assert len(records) == 2008
+    parallel = list(parallel_ark_records(large_dump, workers=2, chunk_bytes=4096))
+    assert parallel == records
+    offset = records[100][0]
+    resumed = list(
+        parallel_ark_records(large_dump, offset, workers=2, chunk_bytes=4096)
+    )
+    assert resumed == records[101:]